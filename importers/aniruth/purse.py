@@ -1,14 +1,35 @@
 """Importer for Google sheets maintained by Aniruth
 In v0.1 Based on icici Importer
+In v0.2 extract reads only the rows appended since the last import.
+
+The sheet is append-only and purse.csv is exported again every day.
+Each transaction carries a purse_row metadata of its line number, the
+byte offset of its row and a checksum of the row. extract finds the
+last row already in the ledger given with -e and, when the row is
+still at that offset, parses only the rows after it, and the whole file
+otherwise, e.g. when that row has been edited. Nothing is kept outside
+the ledger, so an extract that is previewed or thrown away changes
+nothing.
 """
 __copyright__ = "Copyright (C) 2025  Prabu Anand K"
 __license__ = "GNU GPLv3"
-__Version__ = "0.1"
+__Version__ = "0.2"
 
+import csv
+import hashlib
 import os
 import re
+import sys
+from beancount.core import data
 from beangulp.importers.csvbase import Importer, Date, Amount, Column
 
+# Metadata locating the row of a transaction, "lineno:offset:checksum".
+ROW_KEY = "purse_row"
+
+
+def _checksum(raw):
+    return hashlib.sha256(raw).hexdigest()[:16]
+
 
 class AniruthPurseImporter(Importer):
     """An importer for Aniruth Purse a google sheets based CSV file."""
@@ -19,9 +40,12 @@ class AniruthPurseImporter(Importer):
     amount = Amount("(Income) / Expense")
     # balance = Amount("Balance (INR )")
 
-    def __init__(self, account, currency="INR"):
+    def __init__(self, account, currency="INR", incremental=True):
         super().__init__(account, currency)
         self.account_root = account
+        self.incremental = incremental
+        # (offset, line number) of the last row in the ledger, see extract().
+        self._resume = None
 
     def identify(self, filepath):
         # Skip files based on file name matching
@@ -30,9 +54,77 @@ class AniruthPurseImporter(Importer):
     def account(self, filepath):
         return self.account_root
 
+    def _last_row(self, existing):
+        """(line number, offset, checksum) of the last row in the ledger."""
+        last = None
+        for entry in existing:
+            if not isinstance(entry, data.Transaction) or ROW_KEY not in entry.meta:
+                continue
+            if not any(posting.account == self.account_root for posting in entry.postings):
+                continue
+            try:
+                lineno, offset, checksum = str(entry.meta[ROW_KEY]).split(":")
+                row = (int(lineno), int(offset), checksum)
+            except ValueError:
+                continue
+            if last is None or row[1] > last[1]:
+                last = row
+        return last
+
+    def _resume_point(self, filepath, existing):
+        """(offset, line number) after the last row in the ledger, if unchanged."""
+        last = self._last_row(existing)
+        if last is None:
+            return None
+        lineno, offset, checksum = last
+        for _, _, start, end, raw in self._records(filepath, offset):
+            if start == offset and _checksum(raw) == checksum:
+                return end, lineno
+            break
+        return None
+
+    def _records(self, filepath, offset):
+        """Parse the CSV from a byte offset, tracking where each record ends.
+
+        Yields:
+          (header names, fields, start offset, end offset, raw bytes) per record.
+        """
+        with open(filepath, "rb") as fd:
+            header = fd.readline()
+            names = {name.strip(): index
+                     for index, name in enumerate(next(csv.reader([header.decode(self.encoding)])))}
+            position = [max(offset, len(header))]
+            fd.seek(position[0])
+            raw = []
+
+            def lines():
+                for line in fd:
+                    position[0] += len(line)
+                    raw.append(line)
+                    yield line.decode(self.encoding)
+
+            start = position[0]
+            for fields in csv.reader(lines(), dialect=self.dialect):
+                yield names, fields, start, position[0], b"".join(raw)
+                start = position[0]
+                raw.clear()
+
     def read(self, filepath):
-        """Override the read method to skip rows with empty dates or amounts."""
-        for row in super().read(filepath):
+        """Override the read method to skip rows with empty dates or amounts.
+
+        During extract, only the rows after the last one in the ledger
+        are read.
+        """
+        row_class = None
+        for names, row, start, _, raw in self._records(filepath, self._resume[0] if self._resume else 0):
+            if row_class is None:
+                # Same accessors as csvbase.CSVReader.read() builds.
+                attrs = {name: property(column.getter(names)) for name, column in self.columns.items()}
+                row_class = type('Row', (tuple, ), attrs)
+
+            if not row:
+                continue
+
             # Check if the date field is empty
             if not row[0].strip():  # Assuming the date is in the first column
                 print("Skipping row with empty date:", row)
@@ -43,8 +135,30 @@ class AniruthPurseImporter(Importer):
                 print("Skipping row with empty amount:", row)
                 continue
 
+            row = row_class(row)
+            row.offset = start
+            row.checksum = _checksum(raw)
             yield row
 
+    def metadata(self, filepath, lineno, row):
+        # The rows up to the one in the ledger still count for the line numbers.
+        if self._resume:
+            lineno += self._resume[1] - 1
+        meta = data.new_metadata(filepath, lineno)
+        meta[ROW_KEY] = f"{lineno}:{row.offset}:{row.checksum}"
+        return meta
+
+    def extract(self, filepath, existing):
+        """Extract the rows appended since the last row in the ledger."""
+        self._resume = self._resume_point(filepath, existing or []) if self.incremental else None
+        try:
+            entries = super().extract(filepath, existing)
+            if self._resume is not None and not entries:
+                print("No rows appended to", filepath, "since the last import", file=sys.stderr)
+        finally:
+            self._resume = None
+        return entries
+
 # if __name__ == '__main__':
 #     importer = AniruthPurseImporter(
 #         "Assets:Household:Cash:Aniruth")
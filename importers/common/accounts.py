@@ -0,0 +1,118 @@
+"""Open directives for accounts first seen in an extraction.
+
+The importers create per symbol accounts such as Assets:IN:Zerodha:INFY
+or Assets:SG:SRS:<code> on the fly and the ledger fails validation until
+an Open directive is written for each new one. AccountIndex keeps the set
+of accounts opened in the ledger, cached next to it and rebuilt only
+when the ledger or one of its include files has been modified. As an
+extract hook it emits Open directives, dated at the first transaction,
+for the accounts not in the index.
+
+Usage as an extract hook in import_XXX.py:
+  hooks = [accounts.AccountIndex("prabu.beancount"), ...]
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import json
+import os
+from beancount.core import data
+
+DUPLICATE = "__duplicate__"
+
+
+class AccountIndex:
+    """Set of the accounts opened in a ledger, cached by file mtimes.
+
+    Args:
+      ledger: Path to the main beancount file.
+      cache: Path to the cache file. Defaults to a hidden file next to
+        the ledger.
+    """
+
+    def __init__(self, ledger, cache=None):
+        self.ledger = os.path.abspath(ledger)
+        if cache is None:
+            dirname, basename = os.path.split(self.ledger)
+            cache = os.path.join(dirname, "." + basename + ".accounts.json")
+        self.cache = cache
+        self._accounts = None
+
+    @staticmethod
+    def _mtimes(paths):
+        return {path: os.stat(path).st_mtime_ns for path in paths}
+
+    def _read_cache(self):
+        try:
+            with open(self.cache) as infile:
+                cached = json.load(infile)
+            if self._mtimes(cached["mtimes"]) == cached["mtimes"]:
+                return set(cached["accounts"])
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _build(self):
+        from importers.common import ledger_cache
+        entries, _, options_map = ledger_cache.LedgerCache(self.ledger).load()
+        accounts = {entry.account for entry in entries if isinstance(entry, data.Open)}
+        files = options_map.get("include") or [self.ledger]
+        cached = {"mtimes": self._mtimes(files), "accounts": sorted(accounts)}
+        tmp = self.cache + ".tmp"
+        with open(tmp, "w") as outfile:
+            json.dump(cached, outfile)
+        os.replace(tmp, self.cache)
+        return accounts
+
+    @property
+    def accounts(self):
+        if self._accounts is None:
+            self._accounts = self._read_cache()
+            if self._accounts is None:
+                self._accounts = self._build()
+        return self._accounts
+
+    def new_accounts(self, extracted_entries_list):
+        """Find the accounts of the extracted entries not in the index.
+
+        Returns:
+          A dict mapping each new account to its earliest transaction date
+          and the position of the first document it appears in.
+        """
+        known = self.accounts
+        first_seen = {}
+        for index, (_, entries, _, _) in enumerate(extracted_entries_list):
+            for entry in entries:
+                if not isinstance(entry, data.Transaction) or DUPLICATE in entry.meta:
+                    continue
+                for posting in entry.postings:
+                    if posting.account in known:
+                        continue
+                    seen = first_seen.get(posting.account)
+                    if seen is None:
+                        first_seen[posting.account] = (entry.date, index)
+                    elif entry.date < seen[0]:
+                        first_seen[posting.account] = (entry.date, seen[1])
+        return first_seen
+
+    def __call__(self, extracted_entries_list, ledger_entries):
+        """Extract hook prepending Open directives for new accounts.
+
+        Each Open goes to the section of the first document the account
+        appears in, so it is written out with that document's entries.
+        """
+        opens = {}
+        for account_name, (date, index) in self.new_accounts(extracted_entries_list).items():
+            filename = extracted_entries_list[index][0]
+            meta = data.new_metadata(filename, 0)
+            opens.setdefault(index, []).append(data.Open(meta, date, account_name, None, None))
+            # Accounts opened by this run are known to later runs in the same process.
+            self.accounts.add(account_name)
+
+        result = []
+        for index, (filename, entries, account, importer) in enumerate(extracted_entries_list):
+            if index in opens:
+                entries = sorted(opens[index], key=lambda entry: (entry.date, entry.account)) + list(entries)
+            result.append((filename, entries, account, importer))
+        return result
@@ -0,0 +1,137 @@
+"""Content addressed filing of documents for the archive command.
+
+The same monthly statement downloaded again under another name used to
+be archived once per download, and moving the contract note XMLs
+across filesystems copies hundreds of MB each time. With the --dedup
+option of the archive command every document is hashed in chunks and
+looked up in an index of the archive kept in .archive-index.json at its
+root, so the archive tree is never rescanned. A document whose contents
+are already archived is hard linked to the archived copy under its new
+filing name, costing no space, and the download is removed. New
+documents are renamed into place when on the same filesystem and copied
+otherwise.
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import json
+import os
+import shutil
+from importers.common.ledger_cache import file_hash
+
+INDEX_FILENAME = ".archive-index.json"
+
+
+class ArchiveIndex:
+    """sha256 of every archived document to its path in the archive.
+
+    Args:
+      root: Root directory of the archive.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, INDEX_FILENAME)
+        try:
+            with open(self.path) as infile:
+                self.paths = json.load(infile)
+        except (OSError, ValueError):
+            self.paths = {}
+        self.changed = False
+
+    def lookup(self, digest):
+        """Absolute path of the archived copy of a digest, or None.
+
+        Entries whose file has been removed from the archive are dropped.
+        """
+        relpath = self.paths.get(digest)
+        if relpath is None:
+            return None
+        path = os.path.join(self.root, relpath)
+        if not os.path.exists(path):
+            del self.paths[digest]
+            self.changed = True
+            return None
+        return path
+
+    def add(self, digest, path):
+        self.paths[digest] = os.path.relpath(path, self.root)
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as outfile:
+            json.dump(self.paths, outfile, indent=0, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.changed = False
+
+
+def _same_device(src, dst_dir):
+    try:
+        return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+
+def file_document(src, dst, digest, index, overwrite=False):
+    """Move a document into the archive, deduplicating by contents.
+
+    Returns:
+      "linked" when the contents were already archived, "renamed" or
+      "copied" otherwise.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if overwrite and os.path.exists(dst):
+        os.unlink(dst)
+
+    archived = index.lookup(digest)
+    if archived is not None:
+        # dst may already be a copy of the same contents, see plan().
+        if not os.path.exists(dst):
+            os.link(archived, dst)
+        os.unlink(src)
+        return "linked"
+
+    if _same_device(src, os.path.dirname(dst)):
+        os.rename(src, dst)
+        how = "renamed"
+    else:
+        shutil.move(src, dst)
+        how = "copied"
+    index.add(digest, dst)
+    return how
+
+
+def plan(documents, index, overwrite=False):
+    """Hash the documents and check their filing paths.
+
+    Args:
+      documents: A list of (source path, destination path).
+    Returns:
+      A list of (source, destination, digest) and a list of error
+      messages. Destinations already holding the same contents are not
+      errors; the source is then only removed.
+    """
+    planned = []
+    problems = []
+    destinations = {}
+    for src, dst in documents:
+        digest = file_hash(src)
+        other = destinations.get(dst)
+        if other is not None and other != digest:
+            problems.append(f"Collision in destination file path: {dst}")
+            continue
+        if not overwrite and other is None and os.path.exists(dst):
+            if file_hash(dst) != digest:
+                problems.append(f"Destination file already exists: {dst}")
+                continue
+            if index.lookup(digest) is None:
+                # Archived before the index existed.
+                index.add(digest, dst)
+        destinations[dst] = digest
+        planned.append((src, dst, digest))
+    return planned, problems
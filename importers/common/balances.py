@@ -0,0 +1,100 @@
+"""Running balance checks and sparse balance assertions for bank statements.
+
+The bank statements carry the balance after every row. check_chain()
+verifies previous balance + amount == balance over a whole statement in
+one vectorized pass on integer paise and returns the rows where the
+chain breaks, which points straight at a missing or garbled row instead
+of a ledger-wide reconciliation later. period_ends() picks the
+last balance of each period, e.g. month, so the ledger gets a balance
+directive per period and bean-check can bisect an error to a month.
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import sys
+import numpy as np
+
+# Period key of a date for each supported assertion frequency.
+PERIODS = {
+    "day": lambda date: date.toordinal(),
+    "week": lambda date: date.toordinal() // 7,
+    "month": lambda date: date.year * 12 + date.month,
+    "year": lambda date: date.year,
+}
+
+
+def to_paise(numbers):
+    """Array of int64 hundredths of the given Decimal numbers."""
+    return np.fromiter((int((number * 100).to_integral_value()) for number in numbers),
+                       dtype=np.int64, count=len(numbers))
+
+
+def fill_missing(amounts, balances):
+    """Balances with the missing ones, None, computed from their neighbours.
+
+    A missing balance is the previous balance plus the amount of its
+    row, or before the first known balance, the next balance less the
+    amount of the next row.
+
+    Returns:
+      A list of balances, or None when no balance is known.
+    """
+    known = [index for index, balance in enumerate(balances) if balance is not None]
+    if not known:
+        return None
+    if len(known) == len(balances):
+        return balances
+    filled = list(balances)
+    for index in range(known[0] - 1, -1, -1):
+        filled[index] = filled[index + 1] - amounts[index + 1]
+    for index in range(known[0] + 1, len(filled)):
+        if filled[index] is None:
+            filled[index] = filled[index - 1] + amounts[index]
+    return filled
+
+
+def check_chain(amounts, balances):
+    """Indices of the rows whose balance does not follow from the previous row.
+
+    Args:
+      amounts: Signed amounts of the rows in chronological order.
+      balances: Balances after each row.
+    Returns:
+      A numpy array of the indices i >= 1 where
+      balances[i - 1] + amounts[i] != balances[i].
+    """
+    if len(amounts) < 2:
+        return np.empty(0, dtype=np.intp)
+    amounts = to_paise(amounts)
+    balances = to_paise(balances)
+    return np.flatnonzero(balances[:-1] + amounts[1:] != balances[1:]) + 1
+
+
+def period_ends(dates, every):
+    """Indices of the last row of each period, in chronological order.
+
+    Args:
+      dates: Dates of the rows in chronological order.
+      every: One of PERIODS, or None for the last row only.
+    """
+    if not dates:
+        return np.empty(0, dtype=np.intp)
+    if every is None:
+        return np.array([len(dates) - 1])
+    period = PERIODS[every]
+    keys = np.fromiter((period(date) for date in dates), dtype=np.int64, count=len(dates))
+    return np.append(np.flatnonzero(keys[:-1] != keys[1:]), len(dates) - 1)
+
+
+def report_breaks(filepath, rows, breaks, amounts, balances):
+    """Print the rows where the balance chain breaks, on stderr.
+
+    Args:
+      rows: Line numbers of the rows, for the messages.
+    """
+    for index in breaks:
+        expected = balances[index - 1] + amounts[index]
+        print(f"{filepath}:{rows[index]}: balance {balances[index]} does not follow "
+              f"from {balances[index - 1]} + {amounts[index]} = {expected}, "
+              f"rows missing or changed before this one", file=sys.stderr)
@@ -0,0 +1,412 @@
+"""Closing prices of NSE and BSE listed shares from bhavcopy files.
+
+The daily bhavcopy csv files downloaded from the exchanges, plain or
+zipped, are ingested into a sqlite store holding one row per symbol,
+exchange and year, with the trading days and closes of that year packed
+as numpy arrays. A decade of bhavcopies is a few tens of thousands of
+rows instead of millions, and the closes of a symbol are found with one
+index seek and a binary search. Files are parsed on a pool of forked
+processes and merged into the store in batches.
+
+Ingesting is incremental: files already ingested are skipped by name
+and size without being opened, and days already in the store by their
+trading date, so the whole download folder can be passed every time.
+
+Both the old NSE format (SYMBOL, SERIES, CLOSE, TIMESTAMP) and the
+common UDiFF format of NSE and BSE (TckrSymb, SctySrs, ClsPric, TradDt)
+are read. The old BSE format has no ticker symbol and is skipped. NSE
+closes are preferred over BSE ones for the same symbol and day.
+
+Price directives are emitted only for the commodities held under the
+given accounts of the ledger, on the last trading day of each month or
+on the dates given, skipping prices already in the ledger.
+
+Usage:
+  python -m importers.common.bhavcopy ingest prices.sqlite ~/Downloads/bhavcopy
+  python -m importers.common.bhavcopy prices prices.sqlite prabu.beancount Assets:IN:Zerodha --start 2024-04-01
+  python -m importers.common.bhavcopy prices prices.sqlite prabu.beancount Assets:IN:Zerodha --date 2025-03-31
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import calendar
+import concurrent.futures
+import csv
+import datetime
+import io
+import multiprocessing
+import os
+import sqlite3
+import sys
+import zipfile
+from decimal import Decimal
+import click
+import numpy as np
+from beancount.core import data
+from beancount.core.number import ZERO
+from importers.common import parallel
+
+# NSE series of shares traded in the normal market and trade for trade.
+SERIES = ("EQ", "BE", "BZ")
+
+# Exchanges in order of preference when both have a close.
+EXCHANGES = ("NSE", "BSE")
+
+# Calendar days looked back from a date for the last close.
+LOOKBACK_DAYS = 10
+
+# Closes are stored as integers of this fraction of a rupee.
+SCALE = 10000
+
+# Bhavcopy files parsed before their closes are merged into the store.
+BATCH_FILES = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, size INTEGER);
+CREATE TABLE IF NOT EXISTS days (exchange TEXT, date TEXT,
+                                 PRIMARY KEY (exchange, date)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS closes (symbol TEXT, exchange TEXT, year INTEGER,
+                                   days BLOB, closes BLOB,
+                                   PRIMARY KEY (symbol, exchange, year)) WITHOUT ROWID;
+"""
+
+
+def _to_units(closes):
+    return np.rint(np.array(closes, dtype=np.float64) * SCALE).astype(np.int64)
+
+
+def _old_nse(header, rows, series):
+    symbol, kind, close, timestamp = (header.index(name) for name in
+                                      ("SYMBOL", "SERIES", "CLOSE", "TIMESTAMP"))
+    rows = [row for row in rows if len(row) > timestamp and row[kind] in series and row[close]]
+    if not rows:
+        return "NSE", None, [], _to_units([])
+    date = datetime.datetime.strptime(rows[0][timestamp].strip(), "%d-%b-%Y").date()
+    return "NSE", date, [row[symbol] for row in rows], _to_units([row[close] for row in rows])
+
+
+def _udiff(header, rows, series):
+    symbol, kind, close, trade_date, source, instrument = (header.index(name) for name in (
+        "TckrSymb", "SctySrs", "ClsPric", "TradDt", "Src", "FinInstrmTp"))
+    rows = [row for row in rows if len(row) > close and row[instrument] == "STK" and row[close]]
+    if not rows:
+        return None, None, [], _to_units([])
+    exchange = rows[0][source]
+    date = datetime.date.fromisoformat(rows[0][trade_date].strip())
+    if exchange == "NSE":
+        # BSE reports its groups A, B, T... in the series column.
+        rows = [row for row in rows if row[kind] in series]
+    return exchange, date, [row[symbol] for row in rows], _to_units([row[close] for row in rows])
+
+
+def _rows(text):
+    # Bhavcopies are never quoted, splitting is much faster than csv.
+    if '"' in text:
+        return list(csv.reader(io.StringIO(text)))
+    return [line.split(",") for line in text.splitlines()]
+
+
+def parse(text, series=SERIES):
+    """Exchange, trading date, symbols and closes of a bhavcopy.
+
+    The closes are an int64 array in 1/SCALE of a rupee.
+
+    Returns:
+      None if the text is not a bhavcopy in a known format.
+    """
+    rows = _rows(text)
+    header = [name.strip() for name in rows[0]] if rows else []
+    if "TckrSymb" in header:
+        return _udiff(header, rows[1:], series)
+    if "SYMBOL" in header and "TIMESTAMP" in header:
+        return _old_nse(header, rows[1:], series)
+    return None
+
+
+def _documents(path):
+    """(name, text) of a csv file or of each csv in a zip file."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.lower().endswith(".csv"):
+                    yield name, archive.read(name).decode("utf-8-sig")
+    else:
+        with open(path, encoding="utf-8-sig") as infile:
+            yield os.path.basename(path), infile.read()
+
+
+def _parse_path(path, series=SERIES):
+    return [(member, parse(text, series)) for member, text in _documents(path)]
+
+
+def _walk(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith((".csv", ".zip")):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def format_close(units):
+    """The close as a decimal string with at least two decimals."""
+    close = Decimal(int(units)) / SCALE
+    cents = close.quantize(Decimal("0.01"))
+    return str(cents if cents == close else close)
+
+
+class PriceStore:
+    """Daily closes per symbol in a sqlite file.
+
+    Args:
+      path: The sqlite file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._years = {}
+
+    def close(self):
+        self.db.close()
+
+    def _merge(self, batch):
+        """Add a batch of (exchange, date, symbols, closes) to the store."""
+        names = {}
+        for exchange in {item[0] for item in batch}:
+            parts = [item for item in batch if item[0] == exchange]
+            for _, _, symbols, _ in parts:
+                for symbol in set(symbols).difference(names):
+                    names[symbol] = len(names)
+            sids = np.concatenate([np.fromiter(map(names.__getitem__, symbols), dtype=np.int64,
+                                               count=len(symbols))
+                                   for _, _, symbols, _ in parts])
+            days = np.concatenate([np.full(len(symbols), date.toordinal(), dtype=np.int32)
+                                   for _, date, symbols, _ in parts])
+            years = np.concatenate([np.full(len(symbols), date.year, dtype=np.int32)
+                                    for _, date, symbols, _ in parts])
+            closes = np.concatenate([units for _, _, _, units in parts])
+
+            # Sort by symbol, year and day and cut into one group per row.
+            order = np.lexsort((days, years, sids))
+            sids, years, days, closes = sids[order], years[order], days[order], closes[order]
+            starts = np.flatnonzero(np.r_[True, (sids[1:] != sids[:-1]) | (years[1:] != years[:-1])])
+            ends = np.r_[starts[1:], len(sids)]
+            symbols = list(names)
+            for start, end in zip(starts, ends):
+                key = (symbols[sids[start]], exchange, int(years[start]))
+                group_days, group_closes = days[start:end], closes[start:end]
+                row = self.db.execute("SELECT days, closes FROM closes"
+                                      " WHERE symbol = ? AND exchange = ? AND year = ?",
+                                      key).fetchone()
+                if row is not None:
+                    group_days = np.concatenate([np.frombuffer(row[0], dtype=np.int32), group_days])
+                    group_closes = np.concatenate([np.frombuffer(row[1], dtype=np.int64),
+                                                   group_closes])
+                    order = np.argsort(group_days, kind="stable")
+                    group_days, group_closes = group_days[order], group_closes[order]
+                self.db.execute("INSERT OR REPLACE INTO closes VALUES (?, ?, ?, ?, ?)",
+                                key + (group_days.tobytes(), group_closes.tobytes()))
+        self._years.clear()
+
+    def ingest(self, paths, series=SERIES, jobs=None):
+        """Add the closes of the bhavcopies not ingested yet.
+
+        Args:
+          paths: Bhavcopy files, zip files or directories holding them.
+          jobs: Number of processes parsing the files, default one per CPU.
+        Returns:
+          The number of days and of closes added.
+        """
+        db = self.db
+        seen = dict(db.execute("SELECT name, size FROM files"))
+        known = set(db.execute("SELECT exchange, date FROM days"))
+        todo = [path for path in _walk(paths)
+                if seen.get(os.path.basename(path)) != os.path.getsize(path)]
+        jobs = jobs or parallel.default_jobs()
+        pool = None
+        if jobs > 1 and len(todo) > 1 and parallel.can_fork():
+            pool = concurrent.futures.ProcessPoolExecutor(
+                jobs, mp_context=multiprocessing.get_context("fork"))
+            parsed = pool.map(_parse_path, todo, [series] * len(todo), chunksize=16)
+        else:
+            parsed = (_parse_path(path, series) for path in todo)
+
+        days = closes = 0
+        batch = []
+        # One transaction for the whole run, the store is only
+        # consistent again once it commits.
+        db.execute("PRAGMA synchronous = OFF")
+        try:
+            with db:
+                for path, documents in zip(todo, parsed):
+                    for member, document in documents:
+                        if document is None:
+                            print(f"{path}: {member} is not a bhavcopy, skipped", file=sys.stderr)
+                            continue
+                        exchange, date, symbols, units = document
+                        if date is None or (exchange, date.isoformat()) in known:
+                            continue
+                        known.add((exchange, date.isoformat()))
+                        db.execute("INSERT INTO days VALUES (?, ?)", (exchange, date.isoformat()))
+                        batch.append(document)
+                        days += 1
+                        closes += len(symbols)
+                    db.execute("INSERT OR REPLACE INTO files VALUES (?, ?)",
+                               (os.path.basename(path), os.path.getsize(path)))
+                    if len(batch) >= BATCH_FILES:
+                        self._merge(batch)
+                        batch = []
+                if batch:
+                    self._merge(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return days, closes
+
+    def _year(self, symbol, exchange, year):
+        key = (symbol, exchange, year)
+        if key not in self._years:
+            row = self.db.execute("SELECT days, closes FROM closes"
+                                  " WHERE symbol = ? AND exchange = ? AND year = ?",
+                                  key).fetchone()
+            self._years[key] = (None if row is None else
+                                (np.frombuffer(row[0], dtype=np.int32),
+                                 np.frombuffer(row[1], dtype=np.int64)))
+        return self._years[key]
+
+    def close_on(self, symbol, date):
+        """The last close of a symbol on or before date.
+
+        Returns:
+          The date of the close and the close as a decimal string, or
+          None when the symbol has no close in the LOOKBACK_DAYS before.
+        """
+        ordinal = date.toordinal()
+        best = None
+        for exchange in EXCHANGES:
+            for year in (date.year, date.year - 1):
+                found = self._year(symbol, exchange, year)
+                if found is None:
+                    continue
+                days, closes = found
+                index = np.searchsorted(days, ordinal, side="right") - 1
+                if index < 0:
+                    continue
+                day = int(days[index])
+                if ordinal - day < LOOKBACK_DAYS and (best is None or day > best[0]):
+                    best = (day, int(closes[index]))
+                break
+        if best is None:
+            return None
+        return datetime.date.fromordinal(best[0]).isoformat(), format_close(best[1])
+
+
+def month_ends(start, end):
+    """Last day of every month from start to end, end included."""
+    dates = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        dates.append(datetime.date(year, month, calendar.monthrange(year, month)[1]))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return [min(date, end) for date in dates]
+
+
+def holdings(entries, roots, dates):
+    """Commodities held under the root accounts at the end of each date.
+
+    Returns:
+      A list with the set of commodities of each date.
+    """
+    prefixes = tuple(root + ":" for root in roots)
+    units = {}
+    held = []
+    postings = ((entry.date, posting) for entry in entries
+                if isinstance(entry, data.Transaction) for posting in entry.postings)
+    postings = sorted(postings, key=lambda item: item[0])
+    index = 0
+    for date in sorted(dates):
+        while index < len(postings) and postings[index][0] <= date:
+            posting = postings[index][1]
+            index += 1
+            if posting.units is None or not isinstance(posting.units.number, Decimal):
+                continue
+            if posting.account in roots or posting.account.startswith(prefixes):
+                currency = posting.units.currency
+                units[currency] = units.get(currency, ZERO) + posting.units.number
+        held.append({currency for currency, number in units.items() if number != ZERO})
+    return held
+
+
+def price_directives(store, entries, roots, dates, currency="INR"):
+    """Price directive lines of the commodities held on each date."""
+    existing = {(entry.date.isoformat(), entry.currency) for entry in entries
+                if isinstance(entry, data.Price)}
+    lines = []
+    written = set()
+    for date, symbols in zip(sorted(dates), holdings(entries, roots, dates)):
+        for symbol in sorted(symbols):
+            found = store.close_on(symbol, date)
+            if found is None:
+                continue
+            day, close = found
+            if (day, symbol) in existing or (day, symbol) in written:
+                continue
+            written.add((day, symbol))
+            lines.append(f"{day} price {symbol} {close} {currency}")
+    return lines
+
+
+@click.group()
+def main():
+    """NSE and BSE bhavcopy closing prices."""
+
+
+@main.command("ingest")
+@click.argument("store", type=click.Path(dir_okay=False))
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+def _ingest(store, paths):
+    """Add the bhavcopies under PATHS to the STORE."""
+    prices = PriceStore(store)
+    try:
+        days, closes = prices.ingest(paths)
+    finally:
+        prices.close()
+    print(f"{days} days, {closes} closes added to {store}", file=sys.stderr)
+
+
+@main.command("prices")
+@click.argument("store", type=click.Path(exists=True, dir_okay=False))
+@click.argument("ledger", type=click.Path(exists=True, dir_okay=False))
+@click.argument("roots", nargs=-1, required=True)
+@click.option("--date", "dates", multiple=True, type=click.DateTime(["%Y-%m-%d"]),
+              help="Date to price the holdings on, repeatable. Default month ends.")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]),
+              help="First month end, default the first ledger transaction.")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]),
+              help="Last month end, default today.")
+def _prices(store, ledger, roots, dates, start, end):
+    """Price directives for the commodities held under ROOTS of the LEDGER."""
+    from importers.common.ledger_cache import LedgerCache
+
+    entries = LedgerCache(ledger).load()[0]
+    if dates:
+        dates = [date.date() for date in dates]
+    else:
+        first = next((entry.date for entry in entries if isinstance(entry, data.Transaction)),
+                     datetime.date.today())
+        dates = month_ends(start.date() if start else first,
+                           end.date() if end else datetime.date.today())
+    prices = PriceStore(store)
+    try:
+        for line in price_directives(prices, entries, roots, dates):
+            print(line)
+    finally:
+        prices.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Read very large CSV files in chunks on a pool of processes.
+
+A multi-year statement or tradebook can have a million rows and csvbase
+reads it on one core. ChunkedFile memory-maps the file, reads the
+skipped lines and the header in this process, and cuts the rows after
+it into chunks of about equal size. The cuts are at newlines outside
+quoted fields: the number of quote characters before a newline is
+counted on the mapped bytes, and a newline after an odd number of them
+is inside a field, so quoted fields with embedded newlines stay whole.
+The chunks are parsed, and decoded by an optional function, on forked
+worker processes and the rows come back in file order.
+
+Files smaller than MIN_BYTES, dialects with an escape character and
+systems without fork are read in this process. Comment lines are
+filtered as csvbase does, and must not hold unbalanced quotes.
+
+ChunkedReader is a mixin for csvbase importers, and CompiledImporter
+reads through ChunkedFile with its compiled decoder.
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import concurrent.futures
+import csv
+import io
+import mmap
+import multiprocessing
+import os
+from importers.common import parallel
+
+# Smaller files are read in this process.
+MIN_BYTES = 8 << 20
+
+# Chunks per worker, so a slow chunk does not hold up the others.
+CHUNKS_PER_JOB = 4
+
+# Set in each worker process by _init().
+_state = None
+
+
+def _lines(text, comments):
+    # Universal newlines, as csvbase opens the file, so "\r\n" inside
+    # quoted fields is read as "\n".
+    lines = io.StringIO(text, newline=None)
+    if comments:
+        return (line for line in lines if not line.startswith(comments))
+    return lines
+
+
+def _parse(mm, start, end, encoding, dialect, comments, decode):
+    reader = csv.reader(_lines(mm[start:end].decode(encoding), comments), dialect=dialect)
+    if decode is None:
+        return list(reader)
+    return [row for row in map(decode, reader) if row is not None]
+
+
+def _init(path, encoding, dialect, comments, decode):
+    global _state
+    infile = open(path, "rb")
+    _state = (mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ),
+              encoding, dialect, comments, decode)
+
+
+def _parse_chunk(bounds):
+    mm, encoding, dialect, comments, decode = _state
+    return _parse(mm, bounds[0], bounds[1], encoding, dialect, comments, decode)
+
+
+class ChunkedFile:
+    """A CSV file memory-mapped for reading in chunks.
+
+    Args:
+      path: The CSV file.
+      skiplines: Lines before the header, as csvbase skiplines.
+      names: Whether the first row after them is a header.
+      encoding, dialect, comments: As the csvbase attributes.
+    """
+
+    def __init__(self, path, skiplines=0, names=True, encoding="utf-8", dialect="excel",
+                 comments=None):
+        self.path = path
+        self.encoding = encoding
+        self.dialect = dialect
+        self.comments = comments
+        params = csv.get_dialect(dialect) if isinstance(dialect, str) else dialect or csv.excel
+        self.quotechar = (params.quotechar or '"').encode(encoding)
+        self.splittable = not params.escapechar
+        with open(path, "rb") as infile:
+            size = os.fstat(infile.fileno()).st_size
+            self.mm = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.size = len(self.mm)
+
+        position = 0
+        for _ in range(skiplines):
+            position = self._next_line(position)
+        self.headers = None
+        if names:
+            # The header is the first record that is not a comment.
+            while position < self.size:
+                end = self._record_end(position)
+                text = self.mm[position:end].decode(encoding)
+                position = end
+                if not (comments and text.startswith(comments)):
+                    self.headers = next(csv.reader(_lines(text, None), dialect=dialect), None)
+                    break
+        self.start = position
+
+    def _next_line(self, position):
+        newline = self.mm.find(b"\n", position)
+        return self.size if newline < 0 else newline + 1
+
+    def _record_end(self, position):
+        """Offset just after the record starting at position."""
+        quotes = 0
+        while position < self.size:
+            end = self._next_line(position)
+            quotes += self.mm[position:end].count(self.quotechar)
+            position = end
+            if quotes % 2 == 0:
+                break
+        return position
+
+    def bounds(self, chunks):
+        """(start, end) offsets of about equal chunks of whole records."""
+        step = max(1, (self.size - self.start) // max(1, chunks))
+        bounds = []
+        start = self.start
+        while start < self.size:
+            end = min(self.size, start + step)
+            if end < self.size:
+                # Move to the end of the line, then on while inside quotes.
+                end = self._next_line(end)
+                quotes = self.mm[start:end].count(self.quotechar)
+                while quotes % 2 and end < self.size:
+                    line_end = self._next_line(end)
+                    quotes += self.mm[end:line_end].count(self.quotechar)
+                    end = line_end
+            bounds.append((start, end))
+            start = end
+        return bounds
+
+    def rows(self, decode=None, jobs=None):
+        """The rows after the header, in file order.
+
+        Args:
+          decode: Function mapping the fields of a row to a picklable
+            value, or None to skip the row. Rows are lists of fields
+            without it.
+          jobs: Number of worker processes, default one per CPU.
+        """
+        jobs = jobs or parallel.default_jobs()
+        if (jobs < 2 or self.size - self.start < MIN_BYTES or not self.splittable
+                or not parallel.can_fork()):
+            yield from _parse(self.mm, self.start, self.size, self.encoding, self.dialect,
+                              self.comments, decode)
+            return
+        bounds = self.bounds(jobs * CHUNKS_PER_JOB)
+        with concurrent.futures.ProcessPoolExecutor(
+                jobs, mp_context=multiprocessing.get_context("fork"), initializer=_init,
+                initargs=(self.path, self.encoding, self.dialect, self.comments,
+                          decode)) as pool:
+            for chunk in pool.map(_parse_chunk, bounds):
+                yield from chunk
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+
+
+class ChunkedReader:
+    """csvbase importer mixin reading large files with ChunkedFile.
+
+    Put it before csvbase.Importer in the bases. Rows are the same as
+    csvbase makes, with the fields parsed on worker processes.
+    """
+    # Worker processes for files of MIN_BYTES or more, None for one per CPU.
+    read_jobs = None
+
+    def read(self, filepath):
+        if os.path.getsize(filepath) < MIN_BYTES or self.read_jobs == 1:
+            yield from super().read(filepath)
+            return
+        chunked = ChunkedFile(filepath, self.skiplines, self.names, self.encoding,
+                              self.dialect, self.comments)
+        try:
+            if self.names and chunked.headers is None:
+                raise IndexError('The input file does not contain an header line')
+            names = None
+            if self.names:
+                names = {name.strip(): index for index, name in enumerate(chunked.headers)}
+            attrs = {}
+            for name, column in self.columns.items():
+                attrs[name] = property(column.getter(names))
+            row = type('Row', (tuple, ), attrs)
+            for fields in chunked.rows(jobs=self.read_jobs):
+                yield row(fields)
+        finally:
+            chunked.close()
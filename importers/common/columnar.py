@@ -0,0 +1,160 @@
+"""Columnar export of the extracted postings for analysis.
+
+Every extract run given a directory appends one file to it, one per
+document with --stream, holding a row per posting of the new, non
+duplicate transactions, so the postings of many years can be scanned
+with pandas or numpy without parsing the ledger text again. The files are Arrow IPC (.arrow) when
+pyarrow is installed, memory-mapped on reading, and uncompressed numpy
+.npz otherwise. read() returns the columns of all the files of a
+directory concatenated.
+
+Amounts are float64, NaN where a posting has none, e.g. the
+interpolated gains leg of a sell. Strings are empty when missing.
+
+Usage:
+  python import_XXX.py extract -e prabu.beancount --columnar postings ~/Downloads
+  columns = columnar.read("postings")
+  pandas.DataFrame(columns)
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import datetime
+import glob
+import os
+from decimal import Decimal
+import numpy as np
+from beancount.core import data
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+DUPLICATE = "__duplicate__"
+
+# Column name and numpy type, in file order.
+COLUMNS = (
+    ("date", "datetime64[D]"),
+    ("flag", "U"),
+    ("payee", "U"),
+    ("narration", "U"),
+    ("account", "U"),
+    ("units", "float64"),
+    ("currency", "U"),
+    ("cost", "float64"),
+    ("cost_currency", "U"),
+    ("price", "float64"),
+    ("price_currency", "U"),
+    ("importer", "U"),
+    ("filename", "U"),
+    ("lineno", "int64"),
+)
+
+
+def _number(value):
+    number = getattr(value, "number", None)
+    return float(number) if isinstance(number, Decimal) else np.nan
+
+
+def _currency(value):
+    currency = getattr(value, "currency", None)
+    return currency if isinstance(currency, str) else ""
+
+
+def posting_rows(filename, entries, importer):
+    """One tuple per posting of the non duplicate transactions, in COLUMNS order."""
+    name = importer.name if importer is not None else ""
+    for entry in entries:
+        if not isinstance(entry, data.Transaction) or entry.meta.get(DUPLICATE):
+            continue
+        lineno = entry.meta.get("lineno") or 0
+        for posting in entry.postings:
+            yield (entry.date, entry.flag or "", entry.payee or "", entry.narration or "",
+                   posting.account,
+                   _number(posting.units), _currency(posting.units),
+                   _number(posting.cost), _currency(posting.cost),
+                   _number(posting.price), _currency(posting.price),
+                   name, filename, lineno)
+
+
+def _arrays(rows):
+    columns = list(zip(*rows))
+    return {name: np.array(values, dtype=dtype)
+            for (name, dtype), values in zip(COLUMNS, columns)}
+
+
+class PostingsExport:
+    """Collects the postings of an extract run and writes them as one file.
+
+    Args:
+      directory: Where the files of all the runs are kept.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.rows = []
+        # Files written by this run, told apart in their names.
+        self.files = 0
+
+    def add(self, extracted):
+        """Add the postings of a list of (filename, entries, account, importer).
+
+        The entries are iterated, pass lists when they are written later.
+        """
+        for filename, entries, _, importer in extracted:
+            self.rows.extend(posting_rows(filename, entries, importer))
+
+    def write(self):
+        """Write the collected postings to a new file of the directory.
+
+        Returns:
+          The path of the file and the number of postings, or None when
+          there was nothing to write.
+        """
+        if not self.rows:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        self.files += 1
+        path = os.path.join(self.directory, f"postings-{stamp}-{self.files:04d}")
+        arrays = _arrays(self.rows)
+        if pa is not None:
+            path += ".arrow"
+            table = pa.table({name: pa.array(values) for name, values in arrays.items()})
+            with pa.OSFile(path + ".tmp", "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            path += ".npz"
+            with open(path + ".tmp", "wb") as outfile:
+                np.savez(outfile, **arrays)
+        os.replace(path + ".tmp", path)
+        count = len(self.rows)
+        self.rows = []
+        return path, count
+
+
+def read(directory):
+    """Columns of all the exported files of a directory, oldest first.
+
+    Returns:
+      A dict of column name to numpy array.
+    """
+    parts = {name: [] for name, _ in COLUMNS}
+    for path in sorted(glob.glob(os.path.join(directory, "postings-*"))):
+        if path.endswith(".arrow"):
+            if pa is None:
+                raise ValueError(f"{path}: reading Arrow files needs pyarrow")
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            for name, _ in COLUMNS:
+                parts[name].append(table.column(name).to_numpy())
+        elif path.endswith(".npz"):
+            with np.load(path, allow_pickle=False) as arrays:
+                for name, _ in COLUMNS:
+                    parts[name].append(arrays[name])
+    return {name: np.concatenate(parts[name]) if parts[name] else np.array([], dtype=dtype)
+            for name, dtype in COLUMNS}
@@ -0,0 +1,321 @@
+"""Opt-in csvbase importer base class with compiled row decoding.
+
+beangulp.importers.csvbase resolves each declared Column through a
+property on every attribute access, re-parsing the field each time, and
+the bank importers then recompute row.amount from the withdrawal and
+deposit columns in their read() overrides. CompiledImporter turns the
+column declaration of an importer into the source of a single decoding
+function, executed once per file, which filters the row, parses every
+field exactly once and applies the shared withdrawal/deposit sign logic.
+The decoded rows are plain tuples with attribute accessors, so the rest
+of csvbase, metadata() and finalize() work unchanged.
+
+Subclasses declare columns as with csvbase.Importer plus:
+  min_columns: rows with fewer fields are skipped.
+  key_column: index of a field that must be non empty, usually the date.
+  optional_columns: names of columns decoded to None when blank or
+    unparsable, e.g. a balance printed as "-", instead of failing the
+    import. Defaults to the balance column.
+  signed_amount: (withdrawal, deposit) column names; amount is then
+    -withdrawal, deposit or 0 like the read() overrides used to compute.
+  balance_every: with a balance column, emit a balance assertion for
+    the last row of every "day", "week", "month" or "year"; None keeps
+    the single assertion for the last row of csvbase.
+  check_balances: with a balance column, report the rows where the
+    running balance does not follow from the previous row.
+  overlap: with a balance column, an overlap.StatementTails; the rows
+    at the start of the statement already in the existing entries are
+    then dropped.
+  read_jobs: processes parsing files of chunked.MIN_BYTES or more, see
+    chunked.py; None for one per CPU, 1 to always read in this process.
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import csv
+import datetime
+import decimal
+import operator
+import os
+import sys
+from collections import defaultdict
+from itertools import islice
+from beancount.core import data
+from beangulp.importers.csvbase import Importer, Column, Date, Amount, Order, _resolve
+from importers.common import balances as balance_chain
+from importers.common import chunked
+from importers.common import overlap as statement_tails
+
+EMPTY = frozenset()
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class CleanAmount(Amount):
+    """Amount column ignoring thousands separators, 0 when empty."""
+    def parse(self, value):
+        if value:
+            cleaned = value.replace(',', '')
+            return super().parse(cleaned)
+        return 0  # Or any other default handling for empty values
+
+
+def _lenient(decode):
+    """decode returning None instead of failing on a missing or bad field."""
+    def parse(x, idxs):
+        try:
+            if not any(x[i].strip() for i in idxs):
+                return None
+            return decode(x)
+        except (ValueError, ArithmeticError, IndexError):
+            return None
+    return parse
+
+
+def _date_parser(frmt):
+    """strptime parser memoized per distinct string; statements repeat dates."""
+    cache = {}
+    strptime = datetime.datetime.strptime
+
+    def parse(value):
+        try:
+            return cache[value]
+        except KeyError:
+            date = cache[value] = strptime(value.strip(), frmt).date()
+            return date
+    return parse
+
+
+class CompiledImporter(Importer):
+    """csvbase Importer decoding rows with a function compiled per file."""
+
+    min_columns = 0
+    key_column = None
+    optional_columns = ('balance', )
+    signed_amount = None
+    balance_every = None
+    check_balances = True
+    overlap = None
+    read_jobs = None
+
+    def _all_columns(self):
+        """Columns declared on this class and its bases, subclasses winning."""
+        columns = {}
+        for klass in reversed(type(self).__mro__):
+            columns.update(getattr(klass, 'columns', None) or {})
+        return columns
+
+    def row_fields(self):
+        """Names of the attributes of the decoded rows."""
+        fields = list(self._all_columns())
+        if self.signed_amount and 'amount' not in fields:
+            fields.append('amount')
+        return fields
+
+    def compile_decoder(self, names, plain=False):
+        """Generate the decoding function and row class for a header.
+
+        Args:
+          plain: Decode to plain tuples, which can be pickled, instead
+            of rows; the row class is then the Row attribute of the
+            function.
+        Returns:
+          A function mapping a list of fields to a row, or to None for
+          rows to be skipped.
+        """
+        columns = self._all_columns()
+        fields = list(columns)
+        env = {'Decimal': decimal.Decimal}
+        lines = ['def decode(x):']
+        checks = ['not x']
+        if self.min_columns:
+            checks.append(f'len(x) < {int(self.min_columns)}')
+        if self.key_column is not None:
+            checks.append(f'not x[{int(self.key_column)}]')
+        lines.append(f"    if {' or '.join(checks)}: return None")
+
+        for number, (name, column) in enumerate(columns.items()):
+            idxs = [_resolve(spec, names) for spec in column.names]
+            args = ', '.join(f'x[{i}]' for i in idxs)
+            kind = type(column)
+            if kind is Column and len(idxs) == 1:
+                expr = f'x[{idxs[0]}].strip()'
+            elif kind is Date:
+                env[f'parse{number}'] = _date_parser(column.frmt)
+                expr = f'parse{number}({args})'
+            elif kind is Amount and not column.subs:
+                expr = f'Decimal({args})'
+            elif kind is CleanAmount and not column.subs:
+                expr = f"(Decimal(x[{idxs[0]}].replace(',', '')) if x[{idxs[0]}] else 0)"
+            else:
+                env[f'parse{number}'] = column.parse
+                expr = f'parse{number}({args})'
+            if column.default:
+                env[f'default{number}'] = column.default
+                empty = ' or '.join(f'not x[{i}]' for i in idxs)
+                expr = f'default{number} if {empty} else {expr}'
+            if name in self.optional_columns:
+                env[f'optional{number}'] = _lenient(eval(f'lambda x: {expr}', env))
+                expr = f'optional{number}(x, {tuple(idxs)})'
+            lines.append(f'    v{number} = {expr}')
+
+        values = [f'v{number}' for number in range(len(fields))]
+        if self.signed_amount and 'amount' not in columns:
+            withdrawal, deposit = (f'v{fields.index(name)}' for name in self.signed_amount)
+            # Negative for withdrawals, positive for deposits, zero otherwise
+            lines.append(f'    amount = -{withdrawal} if {withdrawal} != 0 else '
+                         f'({deposit} if {deposit} != 0 else 0)')
+            fields.append('amount')
+            values.append('amount')
+        if plain:
+            lines.append(f"    return ({', '.join(values)},)")
+        else:
+            lines.append(f"    return Row(({', '.join(values)},))")
+
+        attrs = {'__slots__': ()}
+        for index, name in enumerate(fields):
+            attrs[name] = property(operator.itemgetter(index))
+        env['Row'] = type('Row', (tuple, ), attrs)
+        exec('\n'.join(lines), env)
+        env['decode'].Row = env['Row']
+        return env['decode']
+
+    def read(self, filepath):
+        """Read the CSV file, yielding rows decoded by the compiled function."""
+        if self.read_jobs != 1 and os.path.getsize(filepath) >= chunked.MIN_BYTES:
+            yield from self._read_chunked(filepath)
+            return
+        with open(filepath, encoding=self.encoding) as fd:
+            # Skip header lines.
+            lines = islice(fd, self.skiplines, None)
+
+            # Filter out comment lines.
+            if self.comments:
+                lines = filter(lambda x: not x.startswith(self.comments), lines)
+
+            reader = csv.reader(lines, dialect=self.dialect)
+
+            # Map column names to column indices.
+            names = None
+            if self.names:
+                headers = next(reader, None)
+                if headers is None:
+                    raise IndexError('The input file does not contain an header line')
+                names = {name.strip(): index for index, name in enumerate(headers)}
+
+            decode = self.compile_decoder(names)
+            for row in map(decode, reader):
+                if row is not None:
+                    yield row
+
+    def _read_chunked(self, filepath):
+        """read() with the rows parsed and decoded on worker processes."""
+        reader = chunked.ChunkedFile(filepath, self.skiplines, self.names, self.encoding,
+                                     self.dialect, self.comments)
+        try:
+            names = None
+            if self.names:
+                if reader.headers is None:
+                    raise IndexError('The input file does not contain an header line')
+                names = {name.strip(): index for index, name in enumerate(reader.headers)}
+            decode = self.compile_decoder(names, plain=True)
+            yield from map(decode.Row, reader.rows(decode, self.read_jobs))
+        finally:
+            reader.close()
+
+    def extract(self, filepath, existing):
+        """Implement beangulp.Importer::extract()
+
+        Same as csvbase.Importer.extract() except that the optional tag,
+        link, flag, payee, account, currency and balance fields are looked
+        up once per file instead of with getattr() on every row, and
+        that balances are checked and asserted per balance_every.
+        """
+        entries = []
+        # Per currency line numbers, dates, amounts, balances and accounts.
+        chains = defaultdict(lambda: ([], [], [], [], []))
+        default_account = self.account(filepath)
+        fields = set(self.row_fields())
+        has_tag, has_link, has_flag, has_payee, has_account, has_currency, has_balance = (
+            name in fields for name in ('tag', 'link', 'flag', 'payee', 'account', 'currency', 'balance'))
+
+        # Compute the line number of the first data line.
+        offset = int(self.skiplines) + bool(self.names) + 1
+
+        for lineno, row in enumerate(self.read(filepath), offset):
+            tag = row.tag if has_tag else None
+            tags = {tag} if tag else EMPTY
+            link = row.link if has_link else None
+            links = {link} if link else EMPTY
+            flag = row.flag if has_flag else self.flag
+            payee = row.payee if has_payee else None
+            account = row.account if has_account else default_account
+            currency = row.currency if has_currency else self.currency
+            units = data.Amount(row.amount, currency)
+
+            # Create a transaction.
+            txn = data.Transaction(self.metadata(filepath, lineno, row),
+                                   row.date, flag, payee, row.narration, tags, links, [
+                                       data.Posting(account, units, None, None, None, None),
+                                   ])
+
+            # Every row moves the balance, even if finalize() drops it.
+            if has_balance:
+                for values, value in zip(chains[currency], (lineno, row.date, row.amount, row.balance, account)):
+                    values.append(value)
+
+            # Apply user processing to the transaction.
+            txn = self.finalize(txn, row)
+            if txn is None:
+                continue
+            entries.append(txn)
+
+        if not entries:
+            return []
+
+        if self.order is None:
+            self.order = Order.ASCENDING if entries[0].date <= entries[-1].date else Order.DESCENDING
+
+        # Reverse the list if the file is in descending order.
+        if self.order is Order.DESCENDING:
+            entries.reverse()
+
+        # Check the running balances and append the balance assertions.
+        for currency, chain in chains.items():
+            if self.order is Order.DESCENDING:
+                for values in chain:
+                    values.reverse()
+            linenos, dates, amounts, balances, accounts = chain
+            # Rows without a balance take the one following from their neighbours.
+            balances = balance_chain.fill_missing(amounts, balances)
+            if balances is None:
+                continue
+            if self.check_balances:
+                breaks = balance_chain.check_chain(amounts, balances)
+                balance_chain.report_breaks(filepath, linenos, breaks, amounts, balances)
+
+            # Drop the rows already in the ledger.
+            drop = 0
+            if self.overlap is not None and len(chains) == 1:
+                # Only the rows finalize() kept can be in the ledger.
+                by_lineno = {entry.meta['lineno']: entry for entry in entries}
+                kept = [index for index, lineno in enumerate(linenos) if lineno in by_lineno]
+                for index in kept:
+                    by_lineno[linenos[index]].meta[statement_tails.BALANCE_KEY] = balances[index]
+                joined = self.overlap.trim(
+                    default_account, [(dates[i], amounts[i], balances[i]) for i in kept], existing or [])
+                if joined:
+                    drop = kept[joined - 1] + 1
+                    imported = set(linenos[:drop])
+                    entries = [entry for entry in entries if entry.meta['lineno'] not in imported]
+                    print(f"{filepath}: {joined} rows up to {dates[drop - 1]} are in the ledger, dropped",
+                          file=sys.stderr)
+
+            for index in balance_chain.period_ends(dates, self.balance_every):
+                if index < drop:
+                    continue
+                meta = data.new_metadata(filepath, linenos[index])
+                units = data.Amount(balances[index], currency)
+                entries.append(data.Balance(meta, dates[index] + ONE_DAY, accounts[index], units, None, None))
+
+        return entries
@@ -0,0 +1,152 @@
+"""SBI telegraphic transfer (TT) buying rates for INR valuation at import time.
+
+The rates are the same ones used by prabu/import_rates.py, taken from
+https://github.com/sahilgupta/sbi-fx-ratekeeper. Each currency file is
+read once into a sorted date index, every lookup is a single bisection
+and results are memoized for the rest of the run.
+
+Downloaded files are kept in a cache directory and downloaded again
+once a day. When the download fails the cached file is used however
+old, and without one the currency has no rates: a warning is printed
+and the transactions are imported without inr_rate and inr_value.
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import bisect
+import csv
+import datetime
+import io
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from beancount.core.number import D
+
+SBI_RATES_URL = "https://raw.githubusercontent.com/sahilgupta/sbi-fx-ratekeeper/main/csv_files/SBI_REFERENCE_RATES_{}.csv"
+
+# Seconds to wait for the rates server.
+TIMEOUT = 30
+# Seconds before a cached download is refreshed.
+MAX_AGE = 24 * 60 * 60
+
+
+class SBIRates:
+    """Lookup of SBI TT buying rates (INR per unit of foreign currency).
+
+    Args:
+      source: URL or file path template with a {} placeholder for the
+        currency code. Defaults to the sbi-fx-ratekeeper csv files.
+      rule115: If True, use the rate of the last day of the month preceding
+        the transaction date, as required by Rule 115 of the Income Tax
+        Rules. Otherwise use the rate of the transaction date itself.
+      cache_dir: Directory keeping the downloaded files.
+    In both cases the latest rate published on or before the reference
+    date is used, so weekends and bank holidays fall back to the previous
+    working day.
+    """
+
+    def __init__(self, source=SBI_RATES_URL, rule115=True, base_currency="INR",
+                 cache_dir="fx_rates"):
+        self.source = source
+        self.rule115 = rule115
+        self.base_currency = base_currency
+        self.cache_dir = cache_dir
+        self._dates = {}
+        self._rates = {}
+        self._memo = {}
+
+    def _download(self, currency, location):
+        """Path of the cached download of location, or None."""
+        cached = os.path.join(self.cache_dir, os.path.basename(location))
+        try:
+            if time.time() - os.path.getmtime(cached) < MAX_AGE:
+                return cached
+        except OSError:
+            pass
+        try:
+            with urllib.request.urlopen(location, timeout=TIMEOUT) as response:
+                content = response.read()
+        except (urllib.error.URLError, OSError) as exc:
+            if os.path.exists(cached):
+                print(f"{currency} rates: download failed ({exc}), using {cached}",
+                      file=sys.stderr)
+                return cached
+            print(f"{currency} rates: download failed ({exc}), no INR values stamped",
+                  file=sys.stderr)
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(cached + ".tmp", "wb") as outfile:
+            outfile.write(content)
+        os.replace(cached + ".tmp", cached)
+        return cached
+
+    def _open(self, currency):
+        location = self.source.format(currency)
+        if "://" in location:
+            location = self._download(currency, location)
+            if location is None:
+                return io.StringIO("")
+        return open(location, newline="")
+
+    def _load(self, currency):
+        """Read the rate file of a currency into parallel sorted lists."""
+        # For THB, use column -2 (per 100 INR), for others use column 2 (TT BUY)
+        rate_column = -2 if currency == "THB" else 2
+        by_date = {}
+        with self._open(currency) as infile:
+            reader = csv.reader(infile)
+            next(reader, None)  # Header
+            for row in reader:
+                if len(row) < 3:
+                    continue
+                try:
+                    date = datetime.date.fromisoformat(row[0][:10])
+                    rate = D(row[rate_column])
+                except (ValueError, ArithmeticError):
+                    continue
+                if not rate:
+                    continue  # Days without a published rate are zero filled
+                if currency == "THB":
+                    rate = rate / 100
+                by_date[date] = rate
+        dates = sorted(by_date)
+        self._dates[currency] = dates
+        self._rates[currency] = [by_date[date] for date in dates]
+
+    def reference_date(self, date):
+        """Return the date whose rate applies to a transaction on date."""
+        if self.rule115:
+            return date.replace(day=1) - datetime.timedelta(days=1)
+        return date
+
+    def rate(self, currency, date):
+        """Return the TT buying rate for currency on date or None."""
+        key = (currency, date)
+        if key in self._memo:
+            return self._memo[key]
+        if currency not in self._dates:
+            self._load(currency)
+        dates = self._dates[currency]
+        index = bisect.bisect_right(dates, self.reference_date(date)) - 1
+        rate = self._rates[currency][index] if index >= 0 else None
+        self._memo[key] = rate
+        return rate
+
+    def stamp(self, txn, currency, number):
+        """Return txn with inr_rate and inr_value metadata added.
+
+        The transaction is returned unchanged for the base currency or
+        when no rate is available for its date.
+        """
+        if currency == self.base_currency or number is None:
+            return txn
+        rate = self.rate(currency, txn.date)
+        if rate is None:
+            return txn
+        meta = dict(txn.meta)
+        meta["inr_rate"] = rate
+        meta["inr_value"] = (abs(number) * rate).quantize(D("0.01"))
+        return txn._replace(meta=meta)
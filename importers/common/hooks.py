@@ -0,0 +1,74 @@
+"""Composable per entry extract hooks.
+
+A beangulp hook receives the whole list of (filename, entries, account,
+importer) tuples and typically rebuilds it, copying every entry even when
+only a few are changed. Pipeline takes instead plain functions mapping
+one entry to an entry, returning the same object when it has nothing to
+change, and fuses them into one lazy pass over the entries of each
+document. Untouched entries flow through as they are, and the time spent
+in each function and the number of entries it changed are recorded.
+
+Usage in import_XXX.py:
+  process_extracted_entries = hooks.Pipeline(clean_up_description, ...)
+  hooks = [process_extracted_entries]
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import time
+
+
+class EntryHook:
+    """A per entry transform with its statistics."""
+    __slots__ = ("func", "name", "seconds", "changed")
+
+    def __init__(self, func, name=None):
+        self.func = func
+        self.name = name or getattr(func, "__name__", repr(func))
+        self.seconds = 0.0
+        self.changed = 0
+
+
+class Pipeline:
+    """Extract hook applying per entry transforms in a single lazy pass.
+
+    Args:
+      transforms: Functions taking an entry and returning it, possibly
+        replaced. Returning None drops the entry.
+    """
+
+    def __init__(self, *transforms):
+        self.hooks = [EntryHook(func) for func in transforms]
+        self.entries = 0
+
+    def stream(self, entries):
+        """Yield entries passed through every transform in turn."""
+        clock = time.perf_counter
+        hooks = self.hooks
+        for entry in entries:
+            self.entries += 1
+            for hook in hooks:
+                start = clock()
+                new = hook.func(entry)
+                hook.seconds += clock() - start
+                if new is not entry:
+                    hook.changed += 1
+                    entry = new
+                    if entry is None:
+                        break
+            if entry is not None:
+                yield entry
+
+    def __call__(self, extracted_entries_list, ledger_entries):
+        return [(filename, self.stream(entries), account, importer)
+                for filename, entries, account, importer in extracted_entries_list]
+
+    def report(self, log):
+        """Log time and changed entries per transform.
+
+        Only meaningful once the entries have been consumed, i.e. written.
+        """
+        for hook in self.hooks:
+            log(f"{hook.name}: {hook.changed}/{self.entries} entries changed "
+                f"in {hook.seconds * 1000:.1f} ms")
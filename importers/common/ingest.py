@@ -0,0 +1,354 @@
+"""beangulp.Ingest with an extended extract command.
+
+The extract command behaves as the beangulp one and adds:
+  --stream: extract, run the hooks on and write out one document at a
+    time, so memory is bounded by the largest document instead of the
+    whole batch. Entries are deduplicated against the existing ledger
+    only, not against the other documents of the batch, and documents
+    are written in the order they are found.
+  --into DIR: merge the entries into per account, per year include
+    files under DIR instead of writing them out, see ledger_files.py.
+    New files are included from the ledger given with --existing.
+  --jobs N: identify the documents on a thread pool and extract them
+    on N worker processes, see parallel.py; output and error reports
+    stay in document order. The predictors of the identified importers
+    are trained on the same processes first. Defaults to 1, extracting
+    in this process as beangulp does.
+  --serial: identify and extract in this process, one document after
+    the other, whatever --jobs says.
+  --columnar DIR: also append the postings of the new transactions to
+    a columnar file under DIR for analysis, see columnar.py. With
+    --stream, one file per document.
+
+The archive command behaves as the beangulp one and adds:
+  --dedup: file documents by content, see archive_index.py.
+
+The existing ledger is loaded through ledger_cache.LedgerCache, so it
+is parsed again only when one of its files changed.
+
+Usage in import_XXX.py:
+  ingest = ingest.Ingest(importers, hooks)
+  ingest()
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import os
+import sys
+import textwrap
+import click
+import beangulp
+from beancount.parser import printer
+from beangulp import archive, exceptions, extract, identify, utils
+from importers.common import archive_index, columnar, ledger_cache, ledger_files, parallel
+
+
+def write_section(filepath, entries, output):
+    """Write the entries of one document as beangulp.extract does.
+
+    Entries marked as duplicates are written as comments.
+    """
+    output.write(extract.SECTION.format(filepath) + '\n\n')
+    for entry in entries:
+        duplicate = entry.meta.pop(extract.DUPLICATE, False)
+        string = printer.format_entry(entry)
+        if duplicate:
+            if isinstance(duplicate, type(entry)):
+                filename = duplicate.meta.get('filename')
+                lineno = duplicate.meta.get('lineno')
+                if filename and lineno:
+                    output.write(f'; duplicate of {filename}:{lineno}\n')
+            string = textwrap.indent(string, '; ')
+        output.write(string)
+        output.write('\n')
+    output.write('\n')
+
+
+def _extract_documents(ctx, src, existing_entries, log, errors, failfast):
+    """Identify and extract each document, yielding extracted tuples."""
+    for filename in beangulp._walk(src, log):
+        with errors:
+            importer = identify.identify(ctx.importers, filename)
+            if not importer:
+                log('')  # Newline.
+                continue
+
+            # Signal processing of this document.
+            log(' ...', nl=False)
+
+            # Extract entries.
+            entries = extract.extract_from_file(importer, filename, existing_entries)
+            account = importer.account(filename)
+            log(' OK', fg='green')
+            yield (filename, entries, account, importer)
+
+        if failfast and errors:
+            break
+
+
+def _write_tree(tree, extracted, log):
+    for path, count in tree.write(extracted):
+        log(f'{count} entries merged into {path}')
+
+
+def _walk(src, log):
+    """beangulp._walk() logging only the skipped files."""
+    for filename in utils.walk(src):
+        if os.path.getsize(filename) > identify.FILE_TOO_LARGE_THRESHOLD:
+            log(f'* {filename:} ... SKIP')
+            continue
+        yield filename
+
+
+def _extract_documents_parallel(ctx, src, existing_entries, log, errors, failfast, jobs):
+    """As _extract_documents(), identifying and extracting on pools."""
+    identified = parallel.identify_all(ctx.importers, list(_walk(src, log)))
+    documents = ((filename, importer) for filename, importer, error in identified if importer)
+    train = [importer for _, importer, _ in identified if importer]
+    results = parallel.extract_all(ctx.importers, documents, existing_entries, jobs, train)
+    try:
+        for filename, importer, error in identified:
+            log(f'* {filename:}', nl=False)
+            with errors:
+                if error is not None:
+                    raise exceptions.Error(error)
+                if not importer:
+                    log('')  # Newline.
+                    continue
+
+                log(' ...', nl=False)
+                _, entries, account, _, error = next(results)
+                if error is not None:
+                    raise exceptions.Error(error)
+                log(' OK', fg='green')
+                yield (filename, entries, account, importer)
+
+            if failfast and errors:
+                break
+    finally:
+        results.close()
+
+
+def _documents(ctx, src, existing_entries, log, errors, failfast, jobs):
+    if jobs > 1 and parallel.can_fork():
+        return _extract_documents_parallel(ctx, src, existing_entries, log, errors, failfast, jobs)
+    return _extract_documents(ctx, src, existing_entries, log, errors, failfast)
+
+
+def _write_export(export, log):
+    written = export.write()
+    if written is not None:
+        log(f'{written[1]} postings written to {written[0]}')
+
+
+def _extract_batch(ctx, src, output, existing_entries, log, errors, failfast, tree=None, jobs=1,
+                   export=None):
+    extracted = list(_documents(ctx, src, existing_entries, log, errors, failfast, jobs))
+
+    # Sort.
+    extract.sort_extracted_entries(extracted)
+
+    # Deduplicate.
+    for filename, entries, account, importer in extracted:
+        importer.deduplicate(entries, existing_entries)
+        existing_entries.extend(entries)
+
+    # Invoke hooks.
+    for func in ctx.hooks:
+        extracted = func(extracted, existing_entries)
+
+    # Before serializing, which drops the duplicate markers. Hooks may
+    # return entries that can be iterated only once.
+    if export is not None:
+        extracted = [(filename, list(entries), account, importer)
+                     for filename, entries, account, importer in extracted]
+        export.add(extracted)
+
+    # Serialize entries.
+    if tree is not None:
+        _write_tree(tree, extracted, log)
+    else:
+        extract.print_extracted_entries(extracted, output)
+
+
+def _extract_stream(ctx, src, output, existing_entries, log, errors, failfast, tree=None, jobs=1,
+                    export=None):
+    header = False
+    for document in _documents(ctx, src, existing_entries, log, errors, failfast, jobs):
+        filename, entries, account, importer = document
+        with errors:
+            importer.deduplicate(entries, existing_entries)
+
+            # Invoke hooks on this document alone.
+            extracted = [document]
+            for func in ctx.hooks:
+                extracted = func(extracted, existing_entries)
+            if export is not None:
+                extracted = [(filename, list(entries), account, importer)
+                             for filename, entries, account, importer in extracted]
+                export.add(extracted)
+                # One file per document, memory stays bounded.
+                _write_export(export, log)
+
+            # Serialize entries as soon as the document is done.
+            if tree is not None:
+                _write_tree(tree, extracted, log)
+                continue
+            if not header and extract.HEADER:
+                output.write(extract.HEADER + '\n')
+                header = True
+            for filepath, entries, _, _ in extracted:
+                write_section(filepath, entries, output)
+            output.flush()
+
+
+@click.command('extract')
+@click.argument('src', nargs=-1, type=click.Path(exists=True, resolve_path=True))
+@click.option('--output', '-o', type=click.File('w'), default='-',
+              help='Output file.')
+@click.option('--existing', '-e', type=click.Path(exists=True),
+              help='Existing Beancount ledger for de-duplication.')
+@click.option('--reverse', '-r', is_flag=True,
+              help='Sort entries in reverse order.')
+@click.option('--failfast', '-x', is_flag=True,
+              help='Stop processing at the first error.')
+@click.option('--quiet', '-q', count=True,
+              help='Suppress all output.')
+@click.option('--stream', is_flag=True,
+              help='Process and write out one document at a time.')
+@click.option('--into', type=click.Path(file_okay=False),
+              help='Merge entries into per account, per year files under this directory.')
+@click.option('--jobs', '-j', type=click.IntRange(1), default=1,
+              help='Number of processes extracting documents.')
+@click.option('--serial', is_flag=True,
+              help='Identify and extract one document at a time.')
+@click.option('--columnar', 'columnar_dir', type=click.Path(file_okay=False),
+              help='Append the extracted postings to a columnar file under this directory.')
+@click.pass_obj
+def _extract(ctx, src, output, existing, reverse, failfast, quiet, stream, into, jobs, serial,
+             columnar_dir):
+    """Extract transactions from documents.
+
+    Walk the SRC list of files or directories and extract the ledger
+    entries from each file identified by one of the configured
+    importers.  The entries are written to the specified output file
+    or to the standard output in Beancount ledger format in sections
+    associated to the source document.
+
+    """
+    verbosity = -quiet
+    log = utils.logger(verbosity, err=True)
+    errors = exceptions.ExceptionsTrap(log)
+
+    # Load the ledger, if one is specified.
+    existing_entries = ledger_cache.LedgerCache(existing).load()[0] if existing else []
+
+    tree = ledger_files.LedgerTree(into, existing) if into else None
+    export = columnar.PostingsExport(columnar_dir) if columnar_dir else None
+    jobs = 1 if serial else jobs
+    if stream:
+        _extract_stream(ctx, src, output, existing_entries, log, errors, failfast, tree, jobs,
+                        export)
+    else:
+        _extract_batch(ctx, src, output, existing_entries, log, errors, failfast, tree, jobs,
+                       export)
+
+    if export is not None:
+        _write_export(export, log)
+
+    # Hooks such as hooks.Pipeline report their statistics once written.
+    for func in ctx.hooks:
+        report = getattr(func, 'report', None)
+        if report is not None:
+            report(log)
+
+    if errors:
+        sys.exit(1)
+
+
+@click.command('archive')
+@click.argument('src', nargs=-1, type=click.Path(exists=True, resolve_path=True))
+@click.option('--destination', '-o', metavar='DIR',
+              type=click.Path(exists=True, file_okay=False, resolve_path=True),
+              help='The destination documents tree root directory.')
+@click.option('--dry-run', '-n', is_flag=True,
+              help='Just print where the files would be moved.')
+@click.option('--overwrite', '-f', is_flag=True,
+              help='Overwrite destination files with the same name.')
+@click.option('--failfast', '-x', is_flag=True,
+              help='Stop processing at the first error.')
+@click.option('--quiet', '-q', count=True,
+              help='Suppress all output.')
+@click.option('--dedup', is_flag=True,
+              help='Hard link documents already archived instead of storing them again.')
+@click.pass_obj
+def _archive(ctx, src, destination, dry_run, overwrite, failfast, quiet, dedup):
+    """Archive documents.
+
+    Walk the SRC list of files or directories and move each file
+    identified by one of the configured importers in a directory
+    hierarchy mirroring the structure of the accounts associated to
+    the documents and with a file name composed by the document date
+    and document name returned by the importer.
+
+    Documents are moved to their filing location only when no errors
+    are encountered processing all the input files.  With --dedup,
+    documents whose contents are already in the archive are hard
+    linked to the archived copy and removed from SRC.
+
+    """
+    if not dedup:
+        return click.get_current_context().invoke(
+            beangulp._archive, src=src, destination=destination, dry_run=dry_run,
+            overwrite=overwrite, failfast=failfast, quiet=quiet)
+
+    if destination is None:
+        import __main__
+        destination = os.path.dirname(os.path.abspath(__main__.__file__))
+
+    verbosity = -quiet
+    log = utils.logger(verbosity, err=True)
+    errors = exceptions.ExceptionsTrap(log)
+    documents = []
+
+    for filename in beangulp._walk(src, log):
+        with errors:
+            importer = identify.identify(ctx.importers, filename)
+            if not importer:
+                log('')  # Newline.
+                continue
+            log(' ...', nl=False)
+            destpath = os.path.join(destination, archive.filepath(importer, filename))
+            documents.append((filename, destpath))
+            log(' OK', fg='green')
+            log(f'  {destpath:}')
+
+        if failfast and errors:
+            break
+
+    index = archive_index.ArchiveIndex(destination)
+    planned, problems = archive_index.plan(documents, index, overwrite)
+    for problem in problems:
+        log(problem, fg='red')
+
+    if errors or problems:
+        log('# Errors detected: documents will not be filed.')
+        sys.exit(1)
+
+    if not dry_run:
+        try:
+            for filename, destpath, digest in planned:
+                how = archive_index.file_document(filename, destpath, digest, index, overwrite)
+                log(f'{how}: {destpath}')
+        finally:
+            index.save()
+
+
+class Ingest(beangulp.Ingest):
+    """beangulp.Ingest with the extract and archive commands of this module."""
+
+    def __init__(self, importers, hooks=None):
+        super().__init__(importers, hooks)
+        self.cli.add_command(_extract)
+        self.cli.add_command(_archive)
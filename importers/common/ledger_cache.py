@@ -0,0 +1,184 @@
+"""Cached loading of the existing ledger for the import commands.
+
+Deduplication, smart_importer training, the account index and the lot
+book all need the existing ledger, and every run used to parse
+prabu.beancount and all its include files from text. LedgerCache keeps
+two pickles next to the ledger:
+  - a snapshot of the booked, validated entries, keyed by the sha256 of
+    the contents of every file loaded, returned as they are when no
+    file changed;
+  - the parser output of each file, keyed by its own sha256, so that
+    when one include file changed only that file is parsed again before
+    booking, plugins and validation are re-run on the whole.
+
+Usage:
+  entries, errors, options_map = ledger_cache.LedgerCache("prabu.beancount").load()
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import gc
+import glob
+import hashlib
+import os
+import pickle
+import sys
+from beancount import loader
+from beancount.core import data
+from beancount.ops import validation
+from beancount.parser import booking, options, parser
+
+CHUNK = 1 << 20
+# Bump when the layout of the cache file changes.
+CACHE_VERSION = 1
+
+
+def file_hash(filepath):
+    """sha256 of the contents of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as infile:
+        for chunk in iter(lambda: infile.read(CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LedgerCache:
+    """Load a ledger, re-parsing only the files whose contents changed.
+
+    Args:
+      ledger: Path to the main beancount file.
+      cache: Path prefix of the cache files. Defaults to hidden files
+        next to the ledger.
+    """
+
+    def __init__(self, ledger, cache=None):
+        self.ledger = os.path.normpath(os.path.abspath(ledger))
+        if cache is None:
+            dirname, basename = os.path.split(self.ledger)
+            cache = os.path.join(dirname, "." + basename)
+        self.snapshot_cache = cache + ".snapshot.pickle"
+        self.files_cache = cache + ".parsed.pickle"
+        self.parsed_files = 0
+
+    @staticmethod
+    def _read(filepath, default):
+        # The collector only slows down unpickling the many small entries.
+        gc.disable()
+        try:
+            with open(filepath, "rb") as infile:
+                version, cached = pickle.load(infile)
+            if version == CACHE_VERSION:
+                return cached
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+        finally:
+            gc.enable()
+        return default
+
+    @staticmethod
+    def _write(filepath, cached):
+        tmp = filepath + ".tmp"
+        with open(tmp, "wb") as outfile:
+            pickle.dump((CACHE_VERSION, cached), outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filepath)
+
+    @staticmethod
+    def _current_hashes(hashes):
+        """Hashes of the files of the last load, None if one is gone."""
+        try:
+            return {path: file_hash(path) for path in hashes}
+        except OSError:
+            return None
+
+    def _parse_file(self, filename, files, hashes):
+        """Parser output of one file, from the cache when unchanged."""
+        digest = file_hash(filename)
+        hashes[filename] = digest
+        cached = files.get(filename)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        self.parsed_files += 1
+        parsed = parser.parse_file(filename)
+        files[filename] = (digest, parsed)
+        return parsed
+
+    def _parse(self, files):
+        """Same walk over the include files as beancount's loader.
+
+        Returns:
+          The parsed entries, errors and options, and the hash of every
+          file parsed.
+        """
+        entries = []
+        parse_errors = []
+        options_map = None
+        other_options_map = []
+        hashes = {}
+        stack = [self.ledger]
+        while stack:
+            filename = stack.pop(0)
+            if filename in hashes:
+                parse_errors.append(loader.LoadError(
+                    data.new_metadata("<load>", 0), f'Duplicate filename parsed: "{filename}"'))
+                continue
+            if not os.path.exists(filename):
+                parse_errors.append(loader.LoadError(
+                    data.new_metadata("<load>", 0), f'File "{filename}" does not exist'))
+                continue
+
+            src_entries, src_errors, src_options_map = self._parse_file(filename, files, hashes)
+            entries.extend(src_entries)
+            parse_errors.extend(src_errors)
+            if options_map is None:
+                # A copy, the cached parser output must stay as parsed.
+                options_map = dict(src_options_map)
+            else:
+                other_options_map.append(src_options_map)
+
+            cwd = os.path.dirname(filename)
+            for include in src_options_map["include"]:
+                matched = glob.glob(os.path.join(cwd, include), recursive=True)
+                if not matched:
+                    parse_errors.append(loader.LoadError(
+                        data.new_metadata("<load>", 0), f'File glob "{include}" does not match any files'))
+                stack.extend(os.path.normpath(os.path.join(cwd, path)) for path in matched)
+
+        if options_map is None:
+            options_map = options.OPTIONS_DEFAULTS.copy()
+        options_map["include"] = sorted(hashes)
+        options_map = loader.aggregate_options_map(options_map, other_options_map)
+        return entries, parse_errors, options_map, hashes
+
+    def _book(self, entries, parse_errors, options_map):
+        """Booking, plugins and validation, as loader._load() does."""
+        entries.sort(key=data.entry_sortkey)
+        entries, balance_errors = booking.book(entries, options_map)
+        parse_errors.extend(balance_errors)
+        saved_pythonpath = list(sys.path)
+        try:
+            sys.path[0:0] = options_map.get("pythonpath", [])
+            entries, errors = loader.run_transformations(entries, parse_errors, options_map, None)
+        finally:
+            sys.path[:] = saved_pythonpath
+        errors.extend(validation.validate(entries, options_map, None, None))
+        options_map["input_hash"] = loader.compute_input_hash(options_map["include"])
+        return entries, errors, options_map
+
+    def load(self):
+        """Load the ledger.
+
+        Returns:
+          A tuple of (entries, errors, options_map) as loader.load_file().
+        """
+        hashes, result = self._read(self.snapshot_cache, ({}, None))
+        if result is not None and self._current_hashes(hashes) == hashes:
+            return result
+
+        files = self._read(self.files_cache, {})
+        entries, parse_errors, options_map, hashes = self._parse(files)
+        # Forget the files no longer included.
+        self._write(self.files_cache, {path: files[path] for path in hashes})
+        result = self._book(entries, parse_errors, options_map)
+        self._write(self.snapshot_cache, (hashes, result))
+        return result
@@ -0,0 +1,180 @@
+"""Merge imported entries into per account, per year include files.
+
+Instead of moving the extract output into one ever growing ledger by
+hand, LedgerTree writes the entries of each document into
+<root>/<account path>/<year>.beancount, for example
+ledger/Assets/IN/ICICIBank/Savings/2024.beancount, and adds an include
+line for every new file to the main ledger.
+
+Existing files are merged with the new entries by date in a single
+streaming pass: the file is read line by line, every new entry is
+written before the first existing entry with a later date, and the
+result replaces the file atomically, keeping its permissions. The main
+ledger only holds include lines, added the same way, and the files
+stay small, one per account and year.
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import collections
+import os
+import re
+import tempfile
+from beancount.parser import printer
+
+DUPLICATE = "__duplicate__"
+
+# A directive starts with its date at the beginning of a line.
+DATED_LINE = re.compile(r"(\d{4})-(\d{2})-(\d{2})\s")
+INCLUDE_LINE = re.compile(r'include\s+"([^"]+)"')
+
+
+def _blocks(lines):
+    """Split lines into (date, lines) blocks, one per dated directive.
+
+    Lines before the first directive form a block with date None.
+    Comments and blank lines stay with the directive they follow.
+    """
+    date = None
+    block = []
+    for line in lines:
+        match = DATED_LINE.match(line)
+        if match:
+            if block:
+                yield date, block
+            date = match.group(0)[:10]
+            block = []
+        block.append(line)
+    if block:
+        yield date, block
+
+
+def _file_mode(filepath):
+    """Permissions of filepath, or those of a new file under the umask."""
+    try:
+        return os.stat(filepath).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def replace_file(filepath, write):
+    """Replace filepath atomically with what write(output) writes.
+
+    The new file keeps the permissions of the one it replaces.
+    """
+    dirname = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(dirname, exist_ok=True)
+    mode = _file_mode(filepath)
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".merge-", suffix=".beancount")
+    try:
+        with os.fdopen(fd, "w") as output:
+            write(output)
+        os.chmod(tmp, mode)
+        os.replace(tmp, filepath)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def merge_into_file(filepath, entries):
+    """Merge date sorted entries into filepath, atomically.
+
+    New entries go after existing entries of the same date.
+    """
+    pending = collections.deque(entries)
+
+    def write(output):
+        if os.path.exists(filepath):
+            with open(filepath) as infile:
+                for date, block in _blocks(infile):
+                    while pending and date is not None and pending[0].date.isoformat() < date:
+                        _write_entry(pending.popleft(), output)
+                    output.writelines(block)
+                    if block and not block[-1].endswith("\n"):
+                        output.write("\n")
+        while pending:
+            _write_entry(pending.popleft(), output)
+
+    replace_file(filepath, write)
+
+
+def _write_entry(entry, output):
+    output.write(printer.format_entry(entry))
+    output.write("\n")
+
+
+class LedgerTree:
+    """Per account, per year include files under a root directory.
+
+    Args:
+      root: Directory of the include files.
+      main_ledger: Optional main beancount file that gets an include
+        line for each file created.
+    """
+
+    def __init__(self, root, main_ledger=None):
+        self.root = os.path.abspath(root)
+        self.main_ledger = main_ledger
+
+    def path(self, account, year):
+        return os.path.join(self.root, *account.split(":"), f"{year}.beancount")
+
+    def _included(self):
+        included = set()
+        if self.main_ledger and os.path.exists(self.main_ledger):
+            base = os.path.dirname(os.path.abspath(self.main_ledger))
+            with open(self.main_ledger) as infile:
+                for line in infile:
+                    match = INCLUDE_LINE.match(line)
+                    if match:
+                        included.add(os.path.normpath(os.path.join(base, match.group(1))))
+        return included
+
+    def _add_includes(self, paths):
+        if not self.main_ledger:
+            return
+        included = self._included()
+        base = os.path.dirname(os.path.abspath(self.main_ledger))
+        missing = [path for path in sorted(paths) if os.path.normpath(path) not in included]
+        if not missing:
+            return
+
+        def write(output):
+            text = ""
+            if os.path.exists(self.main_ledger):
+                with open(self.main_ledger) as infile:
+                    text = infile.read()
+            output.write(text)
+            if text and not text.endswith("\n"):
+                output.write("\n")
+            for path in missing:
+                output.write(f'include "{os.path.relpath(path, base)}"\n')
+
+        replace_file(self.main_ledger, write)
+
+    def write(self, extracted_entries_list):
+        """Merge the extracted entries into their include files.
+
+        Entries marked as duplicates are not written.
+
+        Returns:
+          A list of (path, number of entries) written.
+        """
+        groups = collections.defaultdict(list)
+        for _, entries, account, _ in extracted_entries_list:
+            for entry in entries:
+                if entry.meta and entry.meta.get(DUPLICATE):
+                    continue
+                groups[self.path(account, entry.date.year)].append(entry)
+
+        written = []
+        for path, entries in sorted(groups.items()):
+            # Stable, so the importers' order within a date is kept.
+            entries.sort(key=lambda entry: entry.date)
+            merge_into_file(path, entries)
+            written.append((path, len(entries)))
+        self._add_includes(path for path, _ in written)
+        return written
@@ -0,0 +1,380 @@
+"""FIFO lot matching and Indian capital gains for imported trades.
+
+The broker importers write sells with an empty cost, {}, and a gains
+posting without an amount, leaving beancount to book every sell again
+on each load. LotBook keeps a deque of open lots per holding account
+and resolves each imported sell to explicit lots as the trades are
+imported.
+
+The book follows the ledger only: it is built from the trades of the
+ledger and cached with their keys, and a later run applies just the
+ledger trades added since. The hook applies the imported trades to the
+book in memory and replaces their sells in the extracted entries with
+the resolved ones, but the book is never saved with them, so
+extracting the same statement again gives the same result. The book is rebuilt from the whole ledger when
+a cached trade is no longer in it or a newly added one is older than
+the cached ones.
+
+The gains of each sell are split into short and long term following
+the Indian holding period rules, with the 31-Jan-2018 grandfathering
+of section 112A for listed equity, and recorded in INR as stcg and
+ltcg metadata on the transaction. Lots bought in another currency are
+converted at the rates of the buy and sell dates when a rates object,
+e.g. fxrates.SBIRates, is given, and get no stcg and ltcg otherwise.
+
+Usage as an extract hook in import_XXX.py:
+  lot_book = lots.LotBook("lots.pickle", {"Assets:IN:Zerodha": lots.EQUITY})
+  hooks = [lot_book, ...]
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import calendar
+import collections
+import datetime
+import os
+import pickle
+import sys
+from beancount.core import data, amount, position
+from beancount.core.number import D, ZERO
+from importers.common.trade_ids import entry_id
+
+# Asset classes for the holding period rules.
+EQUITY = "equity"    # Listed Indian equity and equity funds, STT paid
+FOREIGN = "foreign"  # Foreign or unlisted shares
+
+GRANDFATHERING_DATE = datetime.date(2018, 1, 31)
+# Finance (No. 2) Act 2024 reduced the period for unlisted and foreign shares.
+FOREIGN_24_MONTHS_FROM = datetime.date(2024, 7, 23)
+
+DUPLICATE = "__duplicate__"
+
+# Bump when the layout of the cache file changes.
+CACHE_VERSION = 3
+
+
+class Lot:
+    """An open lot of a holding."""
+    __slots__ = ("date", "units", "cost", "currency")
+
+    def __init__(self, date, units, cost, currency):
+        self.date = date
+        self.units = units
+        self.cost = cost
+        self.currency = currency
+
+    def __getstate__(self):
+        return (self.date, self.units, self.cost, self.currency)
+
+    def __setstate__(self, state):
+        self.date, self.units, self.cost, self.currency = state
+
+
+def add_months(date, months):
+    """Return date moved forward by months, clamped to the month end."""
+    month = date.month - 1 + months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
+
+
+def holding_months(asset_class, sell_date):
+    """Return the holding period in months above which a gain is long term."""
+    if asset_class == EQUITY:
+        return 12
+    return 24 if sell_date >= FOREIGN_24_MONTHS_FROM else 36
+
+
+def is_long_term(asset_class, buy_date, sell_date):
+    return sell_date > add_months(buy_date, holding_months(asset_class, sell_date))
+
+
+def is_trade(entry):
+    return isinstance(entry, data.Transaction) and any(
+        posting.cost is not None and posting.units is not None for posting in entry.postings)
+
+
+def trade_key(entry):
+    """Return a key identifying a trade across runs.
+
+    The trade identifier when the importer stamped one, with the
+    accounts of the holdings so the numbering of one broker does not
+    clash with another's, otherwise the date, narration and units summed
+    per account, so that a sell gives the same key before and after it
+    is split into lots.
+    """
+    legs = collections.Counter()
+    for posting in entry.postings:
+        if posting.cost is not None and posting.units is not None:
+            legs[(posting.account, posting.units.currency)] += posting.units.number
+    identifier = entry_id(entry)
+    if identifier is not None:
+        return (identifier, tuple(sorted({leg_account for leg_account, _ in legs})))
+    return (entry.date, entry.narration, tuple(sorted(legs.items())))
+
+
+def trade_keys(entries):
+    """trade_key of each entry, identical trades told apart by occurrence."""
+    seen = collections.Counter()
+    keys = []
+    for entry in entries:
+        key = trade_key(entry)
+        seen[key] += 1
+        keys.append((key, seen[key]))
+    return keys
+
+
+class LotBook:
+    """Per account FIFO book of open lots, cached between runs.
+
+    Args:
+      path: Pickle file caching the book built from the ledger, or None
+        to build it from the ledger on every run.
+      asset_classes: Dict mapping account roots to EQUITY or FOREIGN.
+        Holdings under other roots are treated as FOREIGN.
+      fmv_2018: Optional dict mapping symbols to their fair market value
+        on 31-Jan-2018, used for grandfathering of listed equity.
+      rates: Optional fxrates.SBIRates, to compute the gains of lots
+        held in a foreign currency in INR.
+    """
+
+    def __init__(self, path=None, asset_classes=None, fmv_2018=None, rates=None):
+        self.path = path
+        self.asset_classes = asset_classes or {}
+        self.fmv_2018 = fmv_2018 or {}
+        self.rates = rates
+        self.base_currency = rates.base_currency if rates is not None else "INR"
+        self.books = collections.defaultdict(collections.deque)
+        # Keys of the ledger trades in the book and the date of the last.
+        self.seen = set()
+        self.last_date = None
+        self.synced = False
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as infile:
+                cached = pickle.load(infile)
+            if cached["version"] == CACHE_VERSION:
+                self.books.update(cached["books"])
+                self.seen = cached["seen"]
+                self.last_date = cached["last_date"]
+                return True
+        except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError):
+            pass
+        return False
+
+    def save(self):
+        if not self.path:
+            return
+        cached = {"version": CACHE_VERSION, "books": dict(self.books), "seen": self.seen,
+                  "last_date": self.last_date}
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as outfile:
+            pickle.dump(cached, outfile, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def asset_class(self, account_name):
+        for root, asset_class in self.asset_classes.items():
+            if account_name == root or account_name.startswith(root + ":"):
+                return asset_class
+        return FOREIGN
+
+    def _reduce(self, account_name, units):
+        """Consume units FIFO from the lots of account_name.
+
+        Returns:
+          A list of (lot, units) pairs and the units left unmatched.
+        """
+        lots = self.books[account_name]
+        matched = []
+        remaining = units
+        while remaining > ZERO and lots:
+            lot = lots[0]
+            take = min(lot.units, remaining)
+            matched.append((lot, take))
+            remaining -= take
+            if take == lot.units:
+                lots.popleft()
+            else:
+                lot.units -= take
+        return matched, remaining
+
+    def _taxable_cost(self, asset_class, symbol, lot, sale_price):
+        """Return the cost per unit of a lot, grandfathered when applicable."""
+        if asset_class == EQUITY and lot.date <= GRANDFATHERING_DATE and symbol in self.fmv_2018:
+            fmv = self.fmv_2018[symbol]
+            return max(lot.cost, min(fmv, sale_price))
+        return lot.cost
+
+    def _to_base(self, number, currency, date):
+        """number in currency converted to INR on date, or None without a rate."""
+        if currency == self.base_currency:
+            return number
+        rate = self.rates.rate(currency, date) if self.rates is not None else None
+        return None if rate is None else number * rate
+
+    def apply(self, entry):
+        """Record buys and resolve sells of a transaction to explicit lots.
+
+        Returns:
+          The transaction, with sells at an empty cost replaced by one
+          posting per matched lot and the gains posting and metadata
+          filled in when the lots cover the whole sale.
+        """
+        postings = []
+        stcg = ltcg = ZERO
+        sells = unmatched = 0
+        converted = True
+        for posting in entry.postings:
+            cost = posting.cost
+            if cost is None or posting.units is None or posting.units.number is None:
+                postings.append(posting)
+                continue
+            units = posting.units
+            if units.number > ZERO:
+                if cost.number is not None:
+                    self.books[posting.account].append(
+                        Lot(entry.date, units.number, cost.number, cost.currency))
+                postings.append(posting)
+                continue
+
+            matched, remaining = self._reduce(posting.account, -units.number)
+            if cost.number is not None:
+                # Lots chosen in the ledger itself, keep the book in step.
+                postings.append(posting)
+                continue
+
+            sells += 1
+            asset_class = self.asset_class(posting.account)
+            sale_price = posting.price.number if posting.price is not None else None
+            for lot, take in matched:
+                lot_cost = position.Cost(lot.cost, lot.currency, lot.date, None)
+                postings.append(posting._replace(
+                    units=amount.Amount(-take, units.currency), cost=lot_cost))
+                if sale_price is None:
+                    continue
+                sale = self._to_base(sale_price, posting.price.currency, entry.date)
+                cost = self._to_base(self._taxable_cost(asset_class, units.currency, lot, sale_price),
+                                     lot.currency, lot.date)
+                if sale is None or cost is None:
+                    converted = False
+                    continue
+                gain = (sale - cost) * take
+                if is_long_term(asset_class, lot.date, entry.date):
+                    ltcg += gain
+                else:
+                    stcg += gain
+            if remaining > ZERO:
+                print(f"Only {-units.number - remaining} of {-units.number} {units.currency} "
+                      f"matched to open lots in {posting.account} on {entry.date}",
+                      file=sys.stderr)
+                postings.append(posting._replace(
+                    units=amount.Amount(-remaining, units.currency)))
+                unmatched += 1
+
+        # Gains are only known when every sell is matched in full.
+        if not sells or unmatched:
+            return entry._replace(postings=postings)
+        if not converted:
+            print(f"No {self.base_currency} rate for the lots sold on {entry.date}, "
+                  f"stcg and ltcg left out", file=sys.stderr)
+            return entry._replace(postings=self._balance_gains(postings))
+        meta = dict(entry.meta)
+        meta["stcg"] = stcg.quantize(D("0.01"))
+        meta["ltcg"] = ltcg.quantize(D("0.01"))
+        return entry._replace(meta=meta, postings=self._balance_gains(postings))
+
+    @staticmethod
+    def _balance_gains(postings):
+        """Give the single amount-less posting the balancing amount.
+
+        Left untouched when the other legs are not all in one currency,
+        in which case beancount interpolates it as before.
+        """
+        missing = [index for index, posting in enumerate(postings) if posting.units is None]
+        if len(missing) != 1:
+            return postings
+        residual = ZERO
+        exponent = -2
+        currencies = set()
+        for posting in postings:
+            if posting.units is None:
+                continue
+            if posting.cost is not None and posting.cost.number is not None:
+                residual += posting.units.number * posting.cost.number
+                currencies.add(posting.cost.currency)
+            else:
+                residual += posting.units.number
+                currencies.add(posting.units.currency)
+                exponent = min(exponent, posting.units.number.as_tuple().exponent)
+        if len(currencies) != 1:
+            return postings
+        # Round to the precision of the cash legs
+        residual = residual.quantize(D(1).scaleb(exponent))
+        index = missing[0]
+        postings = list(postings)
+        postings[index] = postings[index]._replace(
+            units=amount.Amount(-residual, currencies.pop()))
+        return postings
+
+    def replay(self, entries):
+        """Build the book from existing ledger entries, oldest first."""
+        trades = sorted((entry for entry in entries if is_trade(entry)),
+                        key=lambda entry: entry.date)
+        for entry, key in zip(trades, trade_keys(trades)):
+            self.seen.add(key)
+            self.apply(entry)
+            self.last_date = entry.date
+
+    def sync(self, ledger_entries):
+        """Bring the book in step with the trades of the ledger and cache it."""
+        trades = sorted((entry for entry in ledger_entries if is_trade(entry)),
+                        key=lambda entry: entry.date)
+        keys = trade_keys(trades)
+        cached = self.path is not None and self._load()
+        if cached and self.seen <= set(keys):
+            added = [(entry, key) for entry, key in zip(trades, keys) if key not in self.seen]
+            if not added or self.last_date is None or added[0][0].date >= self.last_date:
+                for entry, key in added:
+                    self.seen.add(key)
+                    self.apply(entry)
+                    self.last_date = entry.date
+                if added:
+                    self.save()
+                return
+        self.books.clear()
+        self.seen = set()
+        self.last_date = None
+        self.replay(trades)
+        self.save()
+
+    def __call__(self, extracted_entries_list, ledger_entries):
+        """Extract hook resolving the sells of the newly imported trades."""
+        if not self.synced:
+            if ledger_entries:
+                # beangulp has already appended the entries being imported
+                # to the ledger entries, leave them out.
+                extracted_ids = {id(entry) for _, entries, _, _ in extracted_entries_list
+                                 for entry in entries}
+                self.sync(entry for entry in ledger_entries if id(entry) not in extracted_ids)
+            elif self.path is not None:
+                # No ledger given, use the cached book as it is.
+                self._load()
+            self.synced = True
+
+        new = [(entry.date, index, offset, entry)
+               for index, (_, entries, _, _) in enumerate(extracted_entries_list)
+               for offset, entry in enumerate(entries)
+               if isinstance(entry, data.Transaction) and DUPLICATE not in entry.meta]
+        replaced = {}
+        for _, index, offset, entry in sorted(new, key=lambda item: (item[0], item[1], item[2])):
+            replaced[(index, offset)] = self.apply(entry)
+
+        result = []
+        for index, (filename, entries, account, importer) in enumerate(extracted_entries_list):
+            entries = [replaced.get((index, offset), entry)
+                       for offset, entry in enumerate(entries)]
+            result.append((filename, entries, account, importer))
+        return result
@@ -0,0 +1,125 @@
+"""Trim the part of a bank statement that overlaps the last import.
+
+Statements downloaded for overlapping date ranges repeat the rows
+already imported, and the fuzzy duplicate detection is slow and gets
+same day, same amount UPI payments wrong. Every row of a statement has
+a (date, amount, balance) key and consecutive keys form a sequence that
+practically never repeats. The importer records the balance of each row
+in a statement_balance metadata, StatementTails takes the last rows of
+the account from the existing entries given to extract and join_point()
+finds where a new statement continues them, with the Knuth-Morris-Pratt
+prefix function in time linear in the rows, so the rows before the join
+point can be dropped before duplicate detection runs. Nothing is kept
+outside the ledger, so an extract that is previewed or thrown away
+changes nothing.
+
+Usage in import_XXX.py:
+  icici.IciciBankImporter(..., overlap=overlap.StatementTails())
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+from beancount.core import data
+
+# Metadata with the running balance after the row of a transaction.
+BALANCE_KEY = "statement_balance"
+
+# Rows of the ledger matched against a new statement.
+TAIL_ROWS = 64
+
+
+def _paise(number):
+    return int((number * 100).to_integral_value())
+
+
+def _key(row):
+    date, amount, balance = row
+    return date, _paise(amount), _paise(balance)
+
+
+def prefix_function(sequence):
+    """KMP prefix function: for each i, the length of the longest proper
+    prefix of sequence[:i + 1] that is also its suffix."""
+    pi = [0] * len(sequence)
+    k = 0
+    for i in range(1, len(sequence)):
+        while k and sequence[i] != sequence[k]:
+            k = pi[k - 1]
+        if sequence[i] == sequence[k]:
+            k += 1
+        pi[i] = k
+    return pi
+
+
+def join_point(tail, rows):
+    """Number of leading rows of a statement already in the last import.
+
+    Args:
+      tail: Keys of the last rows imported, in chronological order.
+      rows: Keys of the rows of the new statement, in chronological order.
+    Returns:
+      If the whole tail appears in rows, the index just after its last
+      occurrence. Otherwise the length of the longest prefix of rows
+      that is a suffix of the tail, 0 when they do not overlap.
+    """
+    if not tail or not rows:
+        return 0
+    separator = object()
+
+    # Occurrences of the tail within the rows.
+    pi = prefix_function(tail + [separator] + rows)
+    found = [i for i, k in enumerate(pi) if k == len(tail)]
+    if found:
+        return found[-1] - len(tail)
+
+    # The rows start inside the tail.
+    pi = prefix_function(rows + [separator] + tail)
+    return pi[-1]
+
+
+class StatementTails:
+    """Last rows of an account in the ledger, from the balance metadata.
+
+    Args:
+      tail_rows: Number of rows matched against a new statement.
+    """
+
+    def __init__(self, tail_rows=TAIL_ROWS):
+        self.tail_rows = tail_rows
+
+    def tail(self, account, existing, until=None):
+        """Keys of the last rows of account in the existing entries.
+
+        Args:
+          until: Leave out the rows after this date, so that an older
+            statement is matched against the rows of its own period.
+        """
+        keys = []
+        for entry in existing:
+            if not isinstance(entry, data.Transaction) or BALANCE_KEY not in entry.meta:
+                continue
+            if until is not None and entry.date > until:
+                continue
+            for posting in entry.postings:
+                if posting.account == account and posting.units is not None:
+                    keys.append((entry.date, posting.units.number, entry.meta[BALANCE_KEY]))
+                    break
+        # Stable, the rows of a day stay in ledger order.
+        keys.sort(key=lambda key: key[0])
+        return keys[-self.tail_rows:]
+
+    def trim(self, account, keys, existing):
+        """Count the leading rows of a statement already in the ledger.
+
+        Args:
+          keys: (date, amount, balance) of each row, chronological.
+          existing: The existing entries given to extract.
+        Returns:
+          The number of leading rows to drop.
+        """
+        keys = list(keys)
+        if not keys or not existing:
+            return 0
+        tail = self.tail(account, existing, keys[-1][0])
+        return join_point(list(map(_key, tail)), list(map(_key, keys)))
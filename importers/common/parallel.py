@@ -0,0 +1,156 @@
+"""Parallel identify and extract for the extract command.
+
+beangulp identifies and extracts the documents one after the other.
+Identification mostly waits on reading the files and runs on a thread
+pool; extraction is CPU bound and runs on a pool of forked worker
+processes, which inherit the importers and the existing entries instead
+of having them pickled. Results are handed back in the order of the
+documents, so the output is the same as a serial run, and an error is
+reported against the document it happened in.
+
+The predictors wrapping the identified importers, listed in their
+predictors attribute as importers.common.predictors does, are trained
+first on the same pool, and each document is only sent for extraction
+once the predictors of its importer have saved their models. Workers
+read files in one process, chunked.py does not start a pool of its own
+inside them.
+
+Importers keep any state changed while extracting in the worker, so
+parallel extraction is opt-in with ingest --jobs.
+
+Forking is only available on Unix, elsewhere documents are extracted
+serially.
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import collections
+import concurrent.futures
+import multiprocessing
+import os
+import traceback
+from beangulp import exceptions, extract, identify
+
+# Set in each worker process by _init().
+_importers = None
+_existing_entries = None
+
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+
+def can_fork():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _failure(exc):
+    """Picklable description of an exception raised in a worker."""
+    if isinstance(exc, exceptions.Error):
+        return str(exc)
+    return "Exception in importer code.\n" + "".join(
+        traceback.format_exception(type(exc), exc, exc.__traceback__)).rstrip()
+
+
+def _identify(importers, filename):
+    try:
+        return identify.identify(importers, filename), None
+    except Exception as exc:
+        return None, _failure(exc)
+
+
+def identify_all(importers, filenames, threads=None):
+    """Identify the documents on a thread pool.
+
+    Returns:
+      A list of (filename, importer or None, error message or None), in
+      the order of filenames.
+    """
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        results = pool.map(lambda filename: _identify(importers, filename), filenames)
+        return [(filename, importer, error)
+                for filename, (importer, error) in zip(filenames, results)]
+
+
+def _init(importers, existing_entries):
+    global _importers, _existing_entries
+    _importers = importers
+    _existing_entries = existing_entries
+    # No nested pools for large files.
+    for importer in importers:
+        if hasattr(importer, "read_jobs"):
+            importer.read_jobs = 1
+
+
+def _extract(filename, index):
+    """Extract one document in a worker process."""
+    try:
+        importer = _importers[index]
+        entries = extract.extract_from_file(importer, filename, _existing_entries)
+        return entries, importer.account(filename), None
+    except Exception as exc:
+        return None, None, _failure(exc)
+
+
+def _train(index, position):
+    """Train one predictor of an importer in a worker process."""
+    try:
+        _importers[index].predictors[position].train(_existing_entries)
+        return None
+    except Exception as exc:
+        return _failure(exc)
+
+
+def extract_all(importers, documents, existing_entries, jobs, train=()):
+    """Extract the documents on a process pool.
+
+    Args:
+      importers: The list of importers, inherited by the workers.
+      documents: An iterable of (filename, importer).
+      existing_entries: Entries of the existing ledger.
+      jobs: Number of worker processes.
+      train: Importers whose predictors are trained on the pool first.
+        Each predictor is given the future of its training and waits
+        for it before the documents of its importer are extracted.
+    Yields:
+      (filename, entries, account, importer, error message or None) in
+      the order of documents. At most 2 * jobs documents are in flight,
+      so a consumer writing out each document bounds the memory used.
+    """
+    positions = {id(importer): index for index, importer in enumerate(importers)}
+    documents = iter(documents)
+    pending = collections.deque()
+
+    context = multiprocessing.get_context("fork")
+    with concurrent.futures.ProcessPoolExecutor(
+            jobs, mp_context=context, initializer=_init,
+            initargs=(importers, existing_entries)) as pool:
+
+        for importer in set(train):
+            for position, predictor in enumerate(getattr(importer, "predictors", ())):
+                predictor.submitted(pool.submit(_train, positions[id(importer)], position))
+
+        def submit():
+            for filename, importer in documents:
+                # Workers load the models the predictors saved.
+                for predictor in getattr(importer, "predictors", ()):
+                    predictor.wait()
+                future = pool.submit(_extract, filename, positions[id(importer)])
+                pending.append((filename, importer, future))
+                return
+
+        for _ in range(2 * jobs):
+            submit()
+        try:
+            while pending:
+                filename, importer, future = pending.popleft()
+                submit()
+                try:
+                    entries, account, error = future.result()
+                except Exception as exc:
+                    entries, account, error = None, None, _failure(exc)
+                yield filename, entries, account, importer, error
+        finally:
+            for _, _, future in pending:
+                future.cancel()
@@ -0,0 +1,245 @@
+"""smart_importer predictors trained incrementally between runs.
+
+PredictPayees and PredictPostings fit a CountVectorizer and a linear
+SVC on every transaction of the ledger account each time they run, so
+a month of new transactions costs a retraining on the whole history.
+IncrementalPayees and IncrementalPostings predict the same attributes
+from the same narration, payee and day of month features, hashed by a
+HashingVectorizer so there is no vocabulary to refit, into an
+SGDClassifier with the hinge loss, which is a linear SVM that learns
+with partial_fit. The fitted classifier and a digest of each training
+transaction are kept in a pickle per predictor and importer account,
+and each run fits only the transactions whose digest is new.
+
+The model is rebuilt from all the training data when:
+  - there is no saved model, or it was saved with other features;
+  - a training transaction was removed or recategorized since, which
+    partial_fit cannot unlearn;
+  - a transaction has a payee or postings target never seen before,
+    the classifier has a fixed set of classes;
+  - rebuild_after incremental updates were made since the last
+    rebuild, so the model does not drift towards the recent months.
+
+With more than one extract job, parallel.extract_all() trains the
+predictors of the identified importers on its process pool before
+their documents are extracted, each worker limited to one BLAS
+thread, and a document waits only for the predictors of its own
+importer.
+
+Usage in import_XXX.py:
+  predictors.IncrementalPostings("models").wrap(
+      predictors.IncrementalPayees("models").wrap(importer))
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import collections
+import datetime
+import hashlib
+import os
+import pickle
+import sys
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import FeatureUnion, make_pipeline
+from smart_importer import PredictPayees, PredictPostings
+from smart_importer.hooks import apply_hooks
+from smart_importer.pipelines import NoFitMixin, NumericTxnAttribute, txn_attr_getter
+from threadpoolctl import threadpool_limits
+
+# Bump when the layout of the saved model changes.
+STATE_VERSION = 1
+
+
+class HashedTxnAttribute(BaseEstimator, TransformerMixin, NoFitMixin):
+    """Hashed term counts of a string transaction attribute.
+
+    The same 1 to 3 word terms as the CountVectorizer of smart_importer,
+    without a vocabulary.
+    """
+
+    def __init__(self, attr, tokenizer=None, n_features=2 ** 15):
+        self.attr = attr
+        self.tokenizer = tokenizer
+        self.n_features = n_features
+        self._txn_getter = txn_attr_getter(attr)
+        self._vectorizer = HashingVectorizer(ngram_range=(1, 3), tokenizer=tokenizer,
+                                             n_features=n_features, alternate_sign=False,
+                                             norm=None)
+
+    def transform(self, data, _y=None):
+        return self._vectorizer.transform([self._txn_getter(d) or "" for d in data])
+
+
+def _features(attribute, tokenizer, n_features):
+    if attribute.startswith("date."):
+        return NumericTxnAttribute(attribute)
+    return HashedTxnAttribute(attribute, tokenizer, n_features)
+
+
+def _keys(transactions, targets):
+    """Digest of each training transaction and its target.
+
+    Identical transactions are told apart by their occurrence.
+    """
+    seen = collections.Counter()
+    keys = []
+    for txn, target in zip(transactions, targets):
+        text = f"{txn.date}|{txn.payee}|{txn.narration}|{target}"
+        digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+        seen[digest] += 1
+        keys.append((digest, seen[digest]))
+    return keys
+
+
+class IncrementalTraining:
+    """Mixin for smart_importer predictors keeping the model between runs.
+
+    Args:
+      model_dir: Directory of the saved models.
+      rebuild_after: Incremental updates before the model is rebuilt
+        from all the training data.
+      Other arguments as smart_importer.EntryPredictor.
+    """
+    # Hashed features per attribute, the classifier has a weight per
+    # feature and class.
+    n_features = 2 ** 15
+    rebuild_after = 12
+
+    def __init__(self, model_dir="models", rebuild_after=None, **kwargs):
+        super().__init__(**kwargs)
+        self.model_dir = model_dir
+        if rebuild_after is not None:
+            self.rebuild_after = rebuild_after
+        self.features = None
+        self.state = None
+        self.importer = None
+        # (process id, future) of a training started by parallel.extract_all().
+        self.pending = None
+
+    def wrap(self, importer):
+        """The importer with this predictor applied to its extract.
+
+        The predictor is added to the predictors attribute of the
+        importer, for parallel.extract_all().
+        """
+        importer = apply_hooks(importer, [self])
+        importer.predictors = getattr(importer, "predictors", ()) + (self, )
+        self.importer = importer
+        return importer
+
+    def train(self, existing_entries):
+        """Update the saved model in a worker process of parallel.extract_all()."""
+        self.pending = None
+        self.account = self.importer.account(None)
+        with threadpool_limits(limits=1):
+            self.load_training_data(existing_entries)
+            self.define_pipeline()
+            self.train_pipeline()
+
+    def submitted(self, future):
+        """Record the future of a training started on a process pool."""
+        self.pending = (os.getpid(), future)
+
+    def wait(self):
+        """Wait for the training started on a process pool, if any.
+
+        The model saved by the worker is loaded when next needed.
+        """
+        pending, self.pending = self.pending, None
+        # Forked processes inherit the future, only its owner can wait.
+        if pending is None or pending[0] != os.getpid():
+            return
+        error = pending[1].result()
+        if error is not None:
+            print(f"{self.model_path}: training failed, trained again on extract\n{error}",
+                  file=sys.stderr)
+        self.state = None
+
+    @property
+    def model_path(self):
+        name = type(self).__name__
+        if self.account:
+            name += "-" + self.account.replace(":", "-")
+        return os.path.join(self.model_dir, name + ".pickle")
+
+    def _fingerprint(self):
+        return (STATE_VERSION, type(self).__name__, sorted(self.weights.items()), self.n_features)
+
+    def _load_state(self):
+        try:
+            with open(self.model_path, "rb") as infile:
+                state = pickle.load(infile)
+            if state["fingerprint"] == self._fingerprint():
+                return state
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+        return None
+
+    def _save_state(self):
+        os.makedirs(self.model_dir, exist_ok=True)
+        tmp = self.model_path + ".tmp"
+        with open(tmp, "wb") as outfile:
+            pickle.dump(self.state, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.model_path)
+
+    def define_pipeline(self):
+        transformers = [(attribute, _features(attribute, self.string_tokenizer, self.n_features))
+                        for attribute in self.weights]
+        self.features = FeatureUnion(transformer_list=transformers,
+                                     transformer_weights=self.weights)
+
+    def _rebuild(self, keys, targets):
+        classes = set(targets)
+        classifier = None
+        if len(classes) > 1:
+            classifier = SGDClassifier(loss="hinge", random_state=0)
+            classifier.fit(self.features.transform(self.training_data), targets)
+        self.state = {"fingerprint": self._fingerprint(), "account": self.account,
+                      "keys": set(keys), "classes": classes, "classifier": classifier,
+                      "updates": 0, "built": datetime.date.today()}
+
+    def train_pipeline(self):
+        """Update the saved model with the new training transactions."""
+        self.wait()
+        self.is_fitted = False
+        self.pipeline = None
+        targets = self.targets
+        if not targets:
+            return super().train_pipeline()
+        keys = _keys(self.training_data, targets)
+        if self.state is None or self.state.get("account") != self.account:
+            self.state = self._load_state()
+        state = self.state
+
+        new = []
+        if state is not None:
+            current = set(keys)
+            new = [index for index, key in enumerate(keys) if key not in state["keys"]]
+        if (state is None or state["keys"] - current
+                or state["updates"] >= self.rebuild_after
+                or not {targets[index] for index in new} <= state["classes"]):
+            self._rebuild(keys, targets)
+            self._save_state()
+        elif new:
+            if state["classifier"] is not None:
+                state["classifier"].partial_fit(
+                    self.features.transform([self.training_data[index] for index in new]),
+                    [targets[index] for index in new])
+            state["keys"].update(keys[index] for index in new)
+            state["updates"] += 1
+            self._save_state()
+
+        if self.state["classifier"] is not None:
+            self.pipeline = make_pipeline(self.features, self.state["classifier"])
+        self.is_fitted = True
+
+
+class IncrementalPayees(IncrementalTraining, PredictPayees):
+    """Predicts payees, trained incrementally."""
+
+
+class IncrementalPostings(IncrementalTraining, PredictPostings):
+    """Predicts posting accounts, trained incrementally."""
@@ -0,0 +1,238 @@
+"""Schedule FA (foreign assets) peak and closing values for Indian ITR.
+
+Positions of every foreign holding are built as daily arrays over the
+calendar year from the lots recorded by the E*Trade, KGI and iOCBC
+importers. The arrays are multiplied by daily close prices and daily
+SBI TT buying rates, so the peak, closing and opening INR values of all
+holdings come out of a few numpy operations instead of a day by day
+replay of the ledger.
+
+Days before the first price or rate of the year take the first one
+known, with a warning. A holding without any price or rate is reported
+and its values are left empty.
+
+Usage:
+  python -m importers.common.schedule_fa prabu.beancount 2024 Assets:US:ETrade Assets:TH:KGI Assets:SG
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import collections
+import csv
+import datetime
+import math
+import sys
+import numpy as np
+from beancount.core import data
+
+Holding = collections.namedtuple(
+    "Holding", "account symbol currency opening peak peak_date closing income proceeds")
+
+
+def _day_index(date, start):
+    return (date - start).days
+
+
+def _daily_series(dates, values, days):
+    """Forward fill (dates, values) samples onto the days array.
+
+    Days before the first sample are NaN.
+    """
+    if not dates:
+        return np.full(len(days), np.nan)
+    sample_days = np.array(dates, dtype="datetime64[D]")
+    order = np.argsort(sample_days, kind="stable")
+    sample_days = sample_days[order]
+    sample_values = np.array(values, dtype=np.float64)[order]
+    index = np.searchsorted(sample_days, days, side="right") - 1
+    series = sample_values[np.clip(index, 0, None)]
+    series[index < 0] = np.nan
+    return series
+
+
+def _backfill(series, days, what):
+    """Fill the days before the first known value of series with it."""
+    known = np.flatnonzero(~np.isnan(series))
+    if not len(known):
+        print(f"No {what} in {days[0].item().year}, values left empty", file=sys.stderr)
+    elif known[0]:
+        print(f"No {what} before {days[known[0]].item()}, the first one used for the "
+              f"earlier days", file=sys.stderr)
+        series[:known[0]] = series[known[0]]
+    return series
+
+
+def _under(account_name, roots):
+    return any(account_name == root or account_name.startswith(root + ":") for root in roots)
+
+
+def collect(entries, roots, year):
+    """Collect lot movements, price samples and trade prices.
+
+    Returns:
+      A tuple (movements, prices, trades) where movements maps
+      (account, symbol, currency) to a list of (date, units), prices maps
+      (symbol, currency) to a list of (date, price) from price directives
+      and trades holds the same from the lots themselves, merged with
+      them into one series.
+    """
+    end = datetime.date(year, 12, 31)
+    movements = collections.defaultdict(list)
+    prices = collections.defaultdict(list)
+    trades = collections.defaultdict(list)
+    for entry in entries:
+        if entry.date > end:
+            continue
+        if isinstance(entry, data.Price):
+            prices[(entry.currency, entry.amount.currency)].append(
+                (entry.date, float(entry.amount.number)))
+        elif isinstance(entry, data.Transaction):
+            for posting in entry.postings:
+                if posting.cost is None or posting.units is None:
+                    continue
+                if not _under(posting.account, roots):
+                    continue
+                symbol = posting.units.currency
+                currency = posting.cost.currency
+                if currency is None:
+                    continue
+                movements[(posting.account, symbol, currency)].append(
+                    (entry.date, float(posting.units.number)))
+                trade_price = posting.price.number if posting.price else posting.cost.number
+                if trade_price is not None:
+                    trades[(symbol, currency)].append((entry.date, float(trade_price)))
+    return movements, prices, trades
+
+
+def _income_and_proceeds(entries, income_accounts, holdings, year, fx_of):
+    """Sum INR income and sale proceeds per (account, symbol) in year."""
+    start = datetime.date(year, 1, 1)
+    end = datetime.date(year, 12, 31)
+    by_symbol = collections.defaultdict(list)
+    for key in holdings:
+        by_symbol[key[1]].append(key)
+    income_map = {}
+    for template in income_accounts:
+        for symbol in by_symbol:
+            income_map[template.format(symbol)] = symbol
+    income = collections.Counter()
+    proceeds = collections.Counter()
+    for entry in entries:
+        if not isinstance(entry, data.Transaction) or not start <= entry.date <= end:
+            continue
+        for posting in entry.postings:
+            if posting.units is None or posting.units.number is None:
+                continue
+            symbol = income_map.get(posting.account)
+            if symbol is not None:
+                rate = fx_of(posting.units.currency, entry.date)
+                for key in by_symbol[symbol]:
+                    income[key] -= float(posting.units.number) * rate / len(by_symbol[symbol])
+            key = (posting.account, posting.units.currency)
+            if key in holdings and posting.units.number < 0 and posting.price is not None:
+                rate = fx_of(posting.price.currency, entry.date)
+                proceeds[key] -= float(posting.units.number * posting.price.number) * rate
+    return income, proceeds
+
+
+def schedule_fa(entries, rates, year, roots, income_accounts=()):
+    """Compute Schedule FA values of all holdings under roots for year.
+
+    Args:
+      entries: Ledger directives, e.g. from beancount.loader.load_file().
+      rates: An importers.common.fxrates.SBIRates instance. Use
+        rule115=False to value each day at its own TT buying rate.
+      year: Calendar year.
+      roots: Account roots of the foreign brokers, e.g. "Assets:US:ETrade".
+      income_accounts: Account templates with a {} placeholder for the
+        symbol, e.g. "Income:US:ETrade:{}:Dividend", whose postings are
+        reported as income of the holding.
+    Returns:
+      A list of Holding tuples with INR values, one per account and symbol
+      held at any time during the year.
+    """
+    start = datetime.date(year, 1, 1)
+    days = np.arange(np.datetime64(start), np.datetime64(datetime.date(year + 1, 1, 1)))
+    ndays = len(days)
+    movements, prices, trades = collect(entries, roots, year)
+
+    fx_cache = {}
+
+    def fx_series(currency):
+        if currency not in fx_cache:
+            if currency == rates.base_currency:
+                fx_cache[currency] = np.ones(ndays)
+            else:
+                values = [rates.rate(currency, day.item()) for day in days]
+                fx_cache[currency] = _backfill(np.array(
+                    [np.nan if value is None else float(value) for value in values]),
+                    days, f"{currency} rate")
+        return fx_cache[currency]
+
+    def fx_of(currency, date):
+        return fx_series(currency)[_day_index(date, start)]
+
+    price_cache = {}
+    results = {}
+    for (account_name, symbol, currency), moves in movements.items():
+        deltas = np.zeros(ndays)
+        opening_units = 0.0
+        for date, units in moves:
+            if date < start:
+                opening_units += units
+            else:
+                deltas[_day_index(date, start)] += units
+        position = opening_units + np.cumsum(deltas)
+        # Round away float noise left by fully closed positions.
+        position[np.abs(position) < 1e-9] = 0.0
+        if not position.any():
+            continue
+
+        key = (symbol, currency)
+        if key not in price_cache:
+            # Trades first, so a price directive of the same day wins.
+            samples = trades.get(key, []) + prices.get(key, [])
+            price_cache[key] = _backfill(_daily_series(
+                [date for date, _ in samples], [price for _, price in samples], days),
+                days, f"{symbol} price in {currency}")
+        value = position * price_cache[key] * fx_series(currency)
+
+        held = np.flatnonzero(position)
+        peak_index = held[np.nanargmax(value[held])] if not np.isnan(value[held]).all() else held[0]
+        results[(account_name, symbol)] = [
+            account_name, symbol, currency,
+            float(value[held[0]]), float(value[peak_index]), days[peak_index].item(),
+            float(value[-1]), 0.0, 0.0]
+
+    income, proceeds = _income_and_proceeds(entries, income_accounts, results, year, fx_of)
+    holdings = []
+    for key, row in sorted(results.items()):
+        row[7] = float(income[key])
+        row[8] = float(proceeds[key])
+        holdings.append(Holding(*row))
+    return holdings
+
+
+def write_csv(holdings, output):
+    """Write holdings as a csv table with values rounded to rupees.
+
+    Values that could not be computed are left empty.
+    """
+    writer = csv.writer(output)
+    writer.writerow(Holding._fields)
+    for holding in holdings:
+        writer.writerow([("" if math.isnan(value) else round(value))
+                         if isinstance(value, float) else value
+                         for value in holding])
+
+
+if __name__ == "__main__":
+    from beancount import loader
+    from importers.common.fxrates import SBIRates
+
+    ledger, year, *roots = sys.argv[1:]
+    entries, _, _ = loader.load_file(ledger)
+    income_accounts = ["Income:US:ETrade:{}:Dividend", "Income:TH:KGI:{}:Dividend"]
+    write_csv(schedule_fa(entries, SBIRates(rule115=False), int(year), roots, income_accounts),
+              sys.stdout)
@@ -0,0 +1,191 @@
+"""Exact duplicate detection for broker trades by their identifiers.
+
+The broker importers stamp the identifiers of each trade as metadata:
+trade_id, order_id and contract_id as the broker reports them, or a
+trade_id derived from the row contents when the broker gives none. A
+transaction aggregating the fills of an order lists their trade ids,
+comma separated, in trade_ids. TradeIdIndex maps those identifiers,
+found in the ledger, to the accounts of the transactions they are on,
+cached next to the ledger and rebuilt only when the contents of one of
+its files changed. The TradeIdDeduplication mixin marks the extracted
+trades with a known identifier on an account of the importer as
+duplicates, so the numbering of one broker does not hide the trades of
+another. Only entries without an identifier go through the fuzzy
+comparison of beangulp.
+
+Usage in import_XXX.py:
+  trade_ids = trade_ids.TradeIdIndex("prabu.beancount")
+  zerodha.ZerodhaImporter(..., trade_ids=trade_ids)
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import hashlib
+import json
+import os
+from beancount.core import data
+from importers.common.ledger_cache import LedgerCache, file_hash
+
+DUPLICATE = "__duplicate__"
+
+# Metadata identifying a transaction, the most specific first: an
+# order may have several trades and a contract note several orders.
+ID_KEYS = ("trade_id", "order_id", "contract_id")
+
+
+def trade_ids(entry):
+    """Broker trade ids of a transaction, from trade_id and trade_ids."""
+    meta = entry.meta
+    ids = [meta["trade_id"]] if meta.get("trade_id") else []
+    if meta.get("trade_ids"):
+        ids.extend(trade_id.strip() for trade_id in meta["trade_ids"].split(",") if trade_id.strip())
+    return ids
+
+
+def entry_ids(entry):
+    """The identifiers a transaction is matched by, e.g. ["trade_id:1234"].
+
+    Each of its trade ids, so that one fill matches an order aggregating
+    it in either direction, or else the most specific other identifier.
+    """
+    ids = trade_ids(entry)
+    if ids:
+        return [f"trade_id:{trade_id}" for trade_id in ids]
+    meta = entry.meta
+    for key in ID_KEYS[1:]:
+        value = meta.get(key)
+        if value:
+            return [f"{key}:{value}"]
+    return []
+
+
+def entry_id(entry):
+    """The main identifier of a transaction, e.g. "trade_id:1234", or None."""
+    ids = entry_ids(entry)
+    return ids[0] if ids else None
+
+
+def _all_ids(entry):
+    meta = entry.meta
+    ids = [f"trade_id:{trade_id}" for trade_id in trade_ids(entry)]
+    return ids + [f"{key}:{meta[key]}" for key in ID_KEYS[1:] if meta.get(key)]
+
+
+def _under(accounts, root):
+    return any(name == root or name.startswith(root + ":") for name in accounts)
+
+
+def derived_id(prefix, fields, seen):
+    """Stable identifier of a row without a broker reference.
+
+    The same row contents give the same identifier in every download.
+    Identical rows in one file are told apart by their occurrence.
+
+    Args:
+      prefix: Broker name.
+      fields: Row values identifying the trade.
+      seen: Dict counting the occurrences in the current file.
+    """
+    digest = hashlib.sha1("|".join(str(field) for field in fields).encode()).hexdigest()[:16]
+    count = seen[digest] = seen.get(digest, 0) + 1
+    return f"{prefix}-{digest}" if count == 1 else f"{prefix}-{digest}-{count}"
+
+
+class TradeIdIndex:
+    """Trade identifiers in a ledger and their accounts, cached by content hash.
+
+    Args:
+      ledger: Path to the main beancount file.
+      cache: Path to the cache file. Defaults to a hidden file next to
+        the ledger.
+    """
+
+    def __init__(self, ledger, cache=None):
+        self.ledger = os.path.abspath(ledger)
+        if cache is None:
+            dirname, basename = os.path.split(self.ledger)
+            cache = os.path.join(dirname, "." + basename + ".trade_ids.json")
+        self.cache = cache
+        self._ids = None
+
+    def _read_cache(self):
+        try:
+            with open(self.cache) as infile:
+                cached = json.load(infile)
+            if {path: file_hash(path) for path in cached["hashes"]} == cached["hashes"]:
+                return {key: set(accounts) for key, accounts in cached["ids"].items()}
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        return None
+
+    def _build(self):
+        entries, _, options_map = LedgerCache(self.ledger).load()
+        ids = {}
+        for entry in entries:
+            if isinstance(entry, data.Transaction):
+                self._add(ids, entry)
+        files = options_map.get("include") or [self.ledger]
+        cached = {"hashes": {path: file_hash(path) for path in files},
+                  "ids": {key: sorted(accounts) for key, accounts in ids.items()}}
+        tmp = self.cache + ".tmp"
+        with open(tmp, "w") as outfile:
+            json.dump(cached, outfile)
+        os.replace(tmp, self.cache)
+        return ids
+
+    @staticmethod
+    def _add(ids, entry):
+        accounts = {posting.account for posting in entry.postings}
+        for key in _all_ids(entry):
+            ids.setdefault(key, set()).update(accounts)
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = self._read_cache()
+            if self._ids is None:
+                self._ids = self._build()
+        return self._ids
+
+    def mark_duplicates(self, entries, account):
+        """Mark the transactions whose identifier is known as duplicates.
+
+        The identifiers of the other transactions are added, so later
+        documents of the same run are checked against them too.
+
+        Args:
+          account: Account root of the importer, an identifier matches
+            only on the transactions with a posting under it.
+        Returns:
+          The entries without an identifier.
+        """
+        ids = self.ids
+        unidentified = []
+        new = []
+        for entry in entries:
+            keys = entry_ids(entry) if isinstance(entry, data.Transaction) else []
+            if not keys:
+                unidentified.append(entry)
+            elif any(key in ids and _under(ids[key], account) for key in keys):
+                entry.meta[DUPLICATE] = True
+            else:
+                new.append(entry)
+        for entry in new:
+            self._add(ids, entry)
+        return unidentified
+
+
+class TradeIdDeduplication:
+    """Importer mixin deduplicating trades by identifier.
+
+    Set trade_ids to a TradeIdIndex to enable it.
+    """
+    trade_ids = None
+
+    def deduplicate(self, entries, existing):
+        if self.trade_ids is None:
+            return super().deduplicate(entries, existing)
+        # Entries are marked in place, the fuzzy match sees only the rest.
+        unidentified = self.trade_ids.mark_duplicates(entries, self.account(None))
+        return super().deduplicate(unidentified, existing)
@@ -8,9 +8,15 @@ __Version__ = "0.4"
 import os
 import re
 from beancount.core import data, amount, account, position
+from beancount.core.number import ZERO
 from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from importers.common.trade_ids import TradeIdDeduplication, derived_id
 
-class ETradeImporter(Importer):
+# Rows of one dividend event joined into a single transaction
+DIVIDEND_TYPES = ("Dividend", "Qualified Dividend")
+RELATED_TYPES = ("Tax", "Tax Withholding", "Fee", "MISC")
+
+class ETradeImporter(TradeIdDeduplication, Importer):
     """An importer for ETrade CSV files."""
 
     # Define columns based on the CSV structure
@@ -27,7 +33,8 @@ class ETradeImporter(Importer):
     price = Amount("Price")
 
     def __init__(self, currency, account_root, account_cash, account_dividends,
-                 account_gains, account_fees, account_withholdingtax, account_external):
+                 account_gains, account_fees, account_withholdingtax, account_external, rates=None,
+                 trade_ids=None):
         super().__init__(account_root, currency)
         self.account_root = account_root
         self.account_cash = account_cash
@@ -36,6 +43,12 @@ class ETradeImporter(Importer):
         self.account_fees = account_fees
         self.account_withholdingtax = account_withholdingtax
         self.account_external = account_external
+        # Optional importers.common.fxrates.SBIRates for INR valuation
+        self.rates = rates
+        # Optional importers.common.trade_ids.TradeIdIndex for exact deduplication
+        self.trade_ids = trade_ids
+        # Occurrences of each derived trade_id in the file being read
+        self._seen = {}
 
     def identify(self, filepath):
         """Identify if the file matches the expected ETrade CSV format."""
@@ -51,8 +64,7 @@ class ETradeImporter(Importer):
     def account(self, filepath):
         return self.account_root
 
-    def read(self, filepath):
-        """Override the read method to compute the amount."""
+    def _rows(self, filepath):
         for row in super().read(filepath):
               # Skip empty rows or rows missing a transaction date
             if len(row) < 6 or not row[0]:  # assuming the 1st column is the date
@@ -60,6 +72,64 @@ class ETradeImporter(Importer):
             # print("Processed row at read method:", row)  # Debug print
             yield row
 
+    def read(self, filepath):
+        """Override the read method to join the rows of one dividend event.
+
+        Dividend, withholding tax and fee rows are hash joined on (date,
+        symbol) in a single pass. A dividend row with related rows is
+        yielded once carrying them in its related attribute, and becomes
+        one transaction in finalize. Rows that do not pair up are yielded
+        on their own, in file order.
+        """
+        groups = {}
+        order = []
+        self._seen = {}
+        for row in self._rows(filepath):
+            if row.symbol and (row.rtype in DIVIDEND_TYPES or row.rtype in RELATED_TYPES):
+                key = (row.date, row.symbol)
+                if key not in groups:
+                    groups[key] = []
+                    order.append((key, None))
+                groups[key].append(row)
+            else:
+                order.append((None, row))
+
+        for key, row in order:
+            if key is None:
+                yield row
+                continue
+            rows = groups[key]
+            anchor = next((row for row in rows if row.rtype in DIVIDEND_TYPES), None)
+            if anchor is None or len(rows) == 1:
+                yield from rows
+                continue
+            anchor.related = [row for row in rows if row is not anchor]
+            yield anchor
+
+    def _joined_postings(self, rows):
+        """Postings of one transaction for a dividend and its related rows.
+
+        The cash legs are summed and every other leg gets the explicit
+        amount that the separate transactions used to interpolate.
+        """
+        cash = ZERO
+        legs = {}
+        for row in rows:
+            if row.amount == 0:
+                continue
+            if row.rtype in DIVIDEND_TYPES:
+                leg_account, delta = self.account_dividends.format(row.symbol), row.amount
+            elif row.rtype in ("Tax", "Tax Withholding"):
+                leg_account, delta = self.account_withholdingtax.format(row.symbol), row.amount
+            else:  # Fee, MISC
+                leg_account, delta = self.account_fees, -row.amount
+            cash += delta
+            legs[leg_account] = legs.get(leg_account, ZERO) - delta
+        postings = [data.Posting(self.account_cash, amount.Amount(cash, self.currency), None, None, None, None)]
+        for leg_account, number in legs.items():
+            postings.append(data.Posting(leg_account, amount.Amount(number, self.currency), None, None, None, None))
+        return postings
+
     def finalize(self, txn, row):
         """Customize transaction creation for different transaction types."""
         # print(f"Processing row: {row}")  # Debug row data
@@ -68,11 +138,20 @@ class ETradeImporter(Importer):
 
         desc = f"({row.rtype}) {row.narration}"  # Combine type and description
         txn = txn._replace(narration=desc)  # Update narration in the transaction
+        # E*Trade has no reference number, derive one from the row
+        txn.meta["trade_id"] = derived_id("etrade", (row.date, row.rtype, row.symbol, row.quantity,
+                                                     row.price, row.amount, row.narration), self._seen)
         postings = []
 
         # Handle different transaction types
+        related = getattr(row, 'related', None)
+
+        if related:
+            postings = self._joined_postings([row] + related)
+            link = f"etrade-{row.symbol}-{row.date:%Y%m%d}"
+            txn = txn._replace(links=txn.links | {link})
 
-        if row.amount == 0:
+        elif row.amount == 0:
             postings = [
                 data.Posting(self.account_cash, None,None, None, None, None),
                 data.Posting("Expenses:FixMe", None,None, None, None, None),
@@ -140,4 +219,6 @@ class ETradeImporter(Importer):
 
         # Replace transaction postings
         txn = txn._replace(postings=postings)
+        if self.rates is not None and postings[0].units is not None:
+            txn = self.rates.stamp(txn, postings[0].units.currency, postings[0].units.number)
         return txn
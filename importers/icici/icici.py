@@ -14,7 +14,8 @@ __license__ = "GNU GPLv3"
 __Version__ = "0.9"
 
 import re
-from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from beangulp.importers.csvbase import Date, Amount, Column
+from importers.common.compiled import CompiledImporter
 
 class CleanColumn(Column):
     def parse(self, value):
@@ -25,7 +26,7 @@ class CleanColumn(Column):
             return " " #Can be None
         return v
 
-class IciciBankImporter(Importer):
+class IciciBankImporter(CompiledImporter):
     """An importer for ICICI Bank CSV files."""
     skiplines = 12  # Skip the first 12 lines before reading the header
     date = Date("Value Date", frmt="%d/%m/%Y")
@@ -33,12 +34,22 @@ class IciciBankImporter(Importer):
     narration = Column("Transaction Remarks")
     withdrawal = Amount("Withdrawal Amount(INR)")
     deposit = Amount("Deposit Amount(INR)")
-    # balance = Amount("Balance (INR )")
+    # Rows are skipped when short or missing the 3rd column, the date
+    min_columns = 10
+    key_column = 2
+    # amount is -withdrawal for withdrawals, deposit for deposits, else 0
+    signed_amount = ('withdrawal', 'deposit')
+    balance = Amount("Balance (INR )")
 
-    def __init__(self, account, account_number, currency="INR", flag='*'):
+    def __init__(self, account, account_number, currency="INR", flag='*', balance_every="month",
+                 overlap=None):
         super().__init__(account, currency)
         self.account_root = account
         self.account_number = account_number
+        # Balance assertion per "day", "week", "month", "year" or None for the last row
+        self.balance_every = balance_every
+        # overlap.StatementTails to drop rows already imported
+        self.overlap = overlap
     def identify(self, filepath):
         if not filepath.lower().endswith('.csv'):
             return False
@@ -59,22 +70,6 @@ class IciciBankImporter(Importer):
     def account(self, filepath):
         return self.account_root
 
-    def read(self, filepath):
-        """Override the read method to compute the amount."""
-        for row in super().read(filepath):
-            # Skip empty rows or rows missing a transaction date
-            if len(row) < 10 or not row[2]:  # assuming the 3rd column is the date
-                continue
-            # Compute the amount: negative for withdrawal, positive for deposit
-            if row.withdrawal != 0:
-                row.amount = -row.withdrawal  # Negative for withdrawals
-            elif row.deposit != 0:
-                row.amount = row.deposit  # Positive for deposits
-            else:
-                row.amount = 0  # Zero for zero-value transactions
-            # print("Processed row:", row)  # Debug print
-            yield row
-
 # if __name__ == '__main__':
 #     importer = IciciBankImporter(
 #         "Assets:IciciBank:Prabu","1585")
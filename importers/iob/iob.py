@@ -10,27 +10,29 @@ __Version__ = "0.2"
 
 import os
 import re
-from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from beangulp.importers.csvbase import Date, Amount, Column
+from importers.common.compiled import CompiledImporter, CleanAmount
 
-class CleanAmount(Amount):
-    def parse(self, value):
-        if value:
-            cleaned = value.replace(',', '')
-            return super().parse(cleaned)
-        return 0  # Or any other default handling for empty values
-
-class IOBImporter(Importer):
+class IOBImporter(CompiledImporter):
     """An importer for IOB CSV files."""
     date = Date("Value Date", frmt="%d-%b-%Y")  # Note the updated date format
     narration = Column("Narration")
     withdrawal = CleanAmount("Debit")
     deposit = CleanAmount("Credit")
+    # Rows are skipped when short or missing the 2nd column, the date
+    min_columns = 7
+    key_column = 1
+    # amount is -withdrawal for withdrawals, deposit for deposits, else 0
+    signed_amount = ('withdrawal', 'deposit')
+    balance = CleanAmount("Balance")
 
-    def __init__(self, account_root, lastfour, currency="INR"):
+    def __init__(self, account_root, lastfour, currency="INR", balance_every="month"):
         # Fix the typo in __init__ method name
         super().__init__(account_root, currency)
         self.account_root = account_root
         self.lastfour = lastfour
+        # Balance assertion per "day", "week", "month", "year" or None for the last row
+        self.balance_every = balance_every
 
     def identify(self, filepath):
         """Identify if the file matches the expected IOB CSV format."""
@@ -39,18 +41,3 @@ class IOBImporter(Importer):
 
     def account(self, filepath):
         return self.account_root
-
-    def read(self, filepath):
-        """Override the read method to compute the amount."""
-        for row in super().read(filepath):
-            # Skip empty rows or rows missing a transaction date
-            if len(row) < 7 or not row[1]:  # assuming the 2nd column is the date
-                continue
-            # Compute the amount: negative for withdrawal, positive for deposit
-            if row.withdrawal != 0:
-                row.amount = -row.withdrawal  # Negative for withdrawals
-            elif row.deposit != 0:
-                row.amount = row.deposit  # Positive for deposits
-            else:
-                row.amount = 0  # Zero for zero-value transactions
-            yield row
@@ -7,8 +7,10 @@ __Version__ = "0.2"
 
 import os
 import re
+import sys
 from beancount.core import data, amount, account, position
 from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from importers.common.trade_ids import TradeIdDeduplication
 
 class CleanAmount(Amount):
     """Amount column that handles empty values and commas gracefully."""
@@ -19,7 +21,25 @@ class CleanAmount(Amount):
         cleaned = str(value).replace(',', '')
         return super().parse(cleaned)
 
-class IocbcImporter(Importer):
+class TradeMeta:
+    """Second line of an iOCBC record: account, exchange, security type and currency."""
+    __slots__ = ("account", "exchange", "security_type", "currency")
+
+    def __init__(self, account, exchange, security_type, currency):
+        self.account = account
+        self.exchange = exchange
+        self.security_type = security_type
+        self.currency = currency
+
+    @classmethod
+    def from_row(cls, row):
+        def field(index):
+            return row[index].strip() if len(row) > index else ''
+        return cls(field(1), field(2), field(3), field(6))
+
+EMPTY_META = TradeMeta('', '', '', '')
+
+class IocbcImporter(TradeIdDeduplication, Importer):
     """An importer for IOCBC transaction history file"""
 
     # Define columns based on the CSV structure
@@ -34,7 +54,7 @@ class IocbcImporter(Importer):
     amount = CleanAmount("Nett amount")  # csvbase expects 'amount' attribute
     narration = Column("Contract/Reference")
 
-    def __init__(self, currency, account_root, account_cash, srs_account_gains, cpfis_account_gains, cdp_account_gains, account_fees):
+    def __init__(self, currency, account_root, account_cash, srs_account_gains, cpfis_account_gains, cdp_account_gains, account_fees, rates=None, trade_ids=None):
         super().__init__(account_root, currency)
         self.account_root = account_root
         self.account_cash = account_cash
@@ -43,6 +63,10 @@ class IocbcImporter(Importer):
         self.cpfis_account_gains = cpfis_account_gains
         self.cdp_account_gains = cdp_account_gains
         self.account_fees = account_fees
+        # Optional importers.common.fxrates.SBIRates for INR valuation
+        self.rates = rates
+        # Optional importers.common.trade_ids.TradeIdIndex for exact deduplication
+        self.trade_ids = trade_ids
 
     def identify(self, filepath):
         """Identify if this is an IOCBC CSV file."""
@@ -56,34 +80,41 @@ class IocbcImporter(Importer):
         """Return account associated with this importer."""
         return self.account_root
 
-    def read(self, filepath):
-        """Override the read method to handle multi-line CSV records."""
-        rows = list(super().read(filepath))
-
-        # Process rows in pairs (transaction + metadata)
-        for i in range(0, len(rows), 2):
-            if i + 1 >= len(rows):
-                break  # Skip if we don't have a complete pair
+    @staticmethod
+    def _is_trade_row(row):
+        """The first line of a record carries the date and the action."""
+        return len(row) >= 8 and bool(row[0]) and bool(row[4])
 
-            main_row = rows[i]
-            meta_row = rows[i + 1]
-
-            # Skip if main row doesn't have essential data
-            if len(main_row) < 8 or not main_row[0] or not main_row[4]:
-                continue
-
-            # Skip if not a buy/sell transaction
-            if main_row[4].strip().lower() not in ['buy', 'sell']:
+    def read(self, filepath):
+        """Pair each trade row with the metadata row that follows it.
+
+        Rows are streamed with a one row lookahead. A metadata row with no
+        trade row before it is skipped, and a trade row followed directly
+        by another trade row is yielded with empty metadata so that one
+        missing line does not shift every record after it.
+        """
+        rows = super().read(filepath)
+        row = next(rows, None)
+        while row is not None:
+            following = next(rows, None)
+            if not self._is_trade_row(row):
+                print(f"Skipped orphan metadata row: {row}", file=sys.stderr)
+                row = following
                 continue
 
-            # Store metadata as attributes on the main row object for later use
-            # We'll access these in finalize method
-            main_row._meta_account = meta_row[1] if len(meta_row) > 1 else ''
-            main_row._meta_exchange = meta_row[2] if len(meta_row) > 2 else ''
-            main_row._meta_security_type = meta_row[3] if len(meta_row) > 3 else ''
-            main_row._meta_currency = meta_row[6] if len(meta_row) > 6 else ''
+            if following is None or self._is_trade_row(following):
+                print(f"Trade row without metadata row: {row}", file=sys.stderr)
+                meta = EMPTY_META
+                next_row = following
+            else:
+                meta = TradeMeta.from_row(following)
+                next_row = next(rows, None)
 
-            yield main_row
+            # Skip if not a buy/sell transaction
+            if row[4].strip().lower() in ('buy', 'sell'):
+                row.meta = meta
+                yield row
+            row = next_row
 
     def finalize(self, txn, row):
         """Customize transaction creation for buy/sell transactions."""
@@ -97,11 +128,10 @@ class IocbcImporter(Importer):
         nett_amount_val = row.amount
         f_account = row.account_col
 
-        # Extract additional metadata that we stored in the read method
-        account_num = getattr(row, '_meta_account', '')
-        exchange = getattr(row, '_meta_exchange', '')
-        security_type = getattr(row, '_meta_security_type', '')
-        transaction_currency = getattr(row, '_meta_currency', '') or self.currency
+        # Metadata from the second line of the record, paired in the read method
+        exchange = row.meta.exchange
+        security_type = row.meta.security_type
+        transaction_currency = row.meta.currency or self.currency
 
         if not action or not symbol:
             print(f"Missing essential data in row: {row}")
@@ -109,6 +139,7 @@ class IocbcImporter(Importer):
 
         desc = f"({row.action}) @{exchange} {security_type} {symbol} {company_name} Contract No:{row.narration}"  # Combine type and description
         txn = txn._replace(narration=desc)
+        txn.meta["contract_id"] = row.narration.strip()
 
         # Create amounts - use transaction currency if different from base currency
         units_inst = amount.Amount(quantity_val, symbol)
@@ -180,4 +211,6 @@ class IocbcImporter(Importer):
 
         # Replace transaction postings
         txn = txn._replace(postings=postings)
+        if self.rates is not None and postings[0].units is not None:
+            txn = self.rates.stamp(txn, postings[0].units.currency, postings[0].units.number)
         return txn
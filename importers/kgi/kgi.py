@@ -8,6 +8,7 @@ import os
 import re
 from beancount.core import data, amount, account, position
 from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from importers.common.trade_ids import TradeIdDeduplication, derived_id
 
 class CleanAmount(Amount):
     """Amount column that handles empty values and commas gracefully."""
@@ -18,7 +19,7 @@ class CleanAmount(Amount):
         cleaned = str(value).replace(',', '')
         return super().parse(cleaned)
 
-class KGIImporter(Importer):
+class KGIImporter(TradeIdDeduplication, Importer):
     """An importer for KGI CSV files."""
 
     # Define columns based on the CSV structure
@@ -35,7 +36,7 @@ class KGIImporter(Importer):
 
     def __init__(self, currency, account_root, account_cash, account_dividends,
                  account_gains, account_fees, account_withholdingtax, account_interest,
-                 account_external, account_fxdividend):
+                 account_external, account_fxdividend, rates=None, trade_ids=None):
         super().__init__(account_root, currency)
         self.account_root = account_root
         self.account_cash = account_cash
@@ -46,6 +47,12 @@ class KGIImporter(Importer):
         self.account_fxdividend = account_fxdividend
         self.account_withholdingtax = account_withholdingtax
         self.account_interest = account_interest
+        # Optional importers.common.fxrates.SBIRates for INR valuation
+        self.rates = rates
+        # Optional importers.common.trade_ids.TradeIdIndex for exact deduplication
+        self.trade_ids = trade_ids
+        # Occurrences of each derived trade_id in the file being read
+        self._seen = {}
 
     def identify(self, filepath):
         """Identify if this is a KGI CSV file."""
@@ -61,6 +68,7 @@ class KGIImporter(Importer):
 
     def read(self, filepath):
         """Override the read method to handle empty rows and validate data."""
+        self._seen = {}
         for row in super().read(filepath):
             # Skip empty rows or rows missing essential data
             if not hasattr(row, 'date') or not row.date:
@@ -75,6 +83,9 @@ class KGIImporter(Importer):
         """Customize transaction creation for different transaction types."""
         desc = f"({row.transaction_type}) ({row.symbol}) {row.narration}"  # Combine type and description
         txn = txn._replace(narration=desc)  # Update narration in the transaction
+        # The csv is typed in by hand without references, derive one from the row
+        txn.meta["trade_id"] = derived_id("kgi", (row.date, row.transaction_type, row.symbol, row.quantity,
+                                                  row.price, row.amount, row.narration), self._seen)
         postings = []
 
         # Helper for safe amounts
@@ -144,4 +155,6 @@ class KGIImporter(Importer):
 
         # Replace transaction postings
         txn = txn._replace(postings=postings)
+        if self.rates is not None and postings[0].units is not None:
+            txn = self.rates.stamp(txn, postings[0].units.currency, postings[0].units.number)
         return txn
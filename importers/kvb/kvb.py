@@ -6,27 +6,29 @@ __license__ = "GNU GPLv3"
 __Version__ = "0.4"
 
 import re
-from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from beangulp.importers.csvbase import Date, Amount, Column
+from importers.common.compiled import CompiledImporter, CleanAmount
 
-class CleanAmount(Amount):
-    def parse(self, value):
-        if value:
-            cleaned = value.replace(',', '')
-            return super().parse(cleaned)
-        return 0  # Or any other default handling for empty values
-
-class KVBImporter(Importer):
+class KVBImporter(CompiledImporter):
     """An importer for KVB files downloaded in csv format from internet banking."""
     skiplines = 13  # Skip the first 12 lines for savings before reading the header
     date = Date("Value Date", frmt="%d-%m-%Y")
     narration = Column("Description")
     withdrawal = CleanAmount("Debit")
     deposit = CleanAmount("Credit")
+    # Rows are skipped when short or missing the 2nd column, the date
+    min_columns = 7
+    key_column = 1
+    # amount is -withdrawal for withdrawals, deposit for deposits, else 0
+    signed_amount = ('withdrawal', 'deposit')
+    balance = CleanAmount("Balance")
 
-    def __init__(self, account, account_number, currency="INR"):
+    def __init__(self, account, account_number, currency="INR", balance_every="month"):
         super().__init__(account, currency)
         self.account_root = account
         self.account_number=account_number
+        # Balance assertion per "day", "week", "month", "year" or None for the last row
+        self.balance_every = balance_every
 
     def identify(self, filepath):
         if not filepath.lower().endswith('.csv'):
@@ -46,18 +48,3 @@ class KVBImporter(Importer):
 
     def account(self, filepath):
         return self.account_root
-
-    def read(self, filepath):
-        """Override the read method to compute the amount."""
-        for row in super().read(filepath):
-            # Skip empty rows or rows missing a transaction date
-            if len(row) < 7 or not row[1]:  # assuming the 3rd column is the date
-                continue
-            # Compute the amount: negative for withdrawal, positive for deposit
-            if row.withdrawal != 0:
-                row.amount = -row.withdrawal  # Negative for withdrawals
-            elif row.deposit != 0:
-                row.amount = row.deposit  # Positive for deposits
-            else:
-                row.amount = 0  # Zero for zero-value transactions
-            yield row
@@ -1,29 +1,51 @@
-"""Importer for Indian Stock broker rksv. This can be used to import transactions from Tradebook provided by the broker.
-This is entirely based on the Example importer utrade_csv.py written for example broker UTrade by Beancount author Martin Blais.    
+"""Beangulp based beancount importer for Indian Stock broker rksv. This can be used to import transactions from Tradebook provided by the broker.
+This is entirely based on the Example importer utrade_csv.py written for example broker UTrade by Beancount author Martin Blais.
+v0.2 - ported to beangulp with a streaming reader, fixed format dates and optional aggregation of trades by order
 """
-__copyright__ = "Copyright (C) 2020  Prabu Anand K"
+__copyright__ = "Copyright (C) 2020-2025  Prabu Anand K"
 __license__ = "GNU GPLv3"
-__Version__ = "0.1"
+__Version__ = "0.2"
 
 import csv
 import datetime
-import re
+import decimal
 import logging
+import re
 from os import path
 
-from dateutil.parser import parse
-
-from beancount.core.number import D
-from beancount.core.number import ZERO
+import beangulp
 from beancount.core import data
 from beancount.core import account
 from beancount.core import amount
 from beancount.core import position
-from beancount.ingest import importer
+from importers.common.trade_ids import TradeIdDeduplication, derived_id
+
+
+class Trade:
+    """One tradebook row, or the sum of the rows of an order."""
+    __slots__ = ("lineno", "date", "rtype", "symbol", "order_id",
+                 "quantity", "price", "amount", "fees")
 
+    def __init__(self, lineno, date, rtype, symbol, order_id, quantity, price, amount, fees):
+        self.lineno = lineno
+        self.date = date
+        self.rtype = rtype
+        self.symbol = symbol
+        self.order_id = order_id
+        self.quantity = quantity
+        self.price = price
+        self.amount = amount
+        self.fees = fees
 
-class RKSVImporter(importer.ImporterProtocol):
-    """An importer for RKSV CSV files (an Indian stock broker)."""
+
+class RKSVImporter(TradeIdDeduplication, beangulp.Importer):
+    """An importer for RKSV CSV files (an Indian stock broker).
+
+    Args:
+      date_format: strptime format of the trade_date column.
+      aggregate_orders: If True, the trades of the same order are summed
+        into one transaction at their average price.
+    """
 
     def __init__(self, currency,
                  account_root,
@@ -31,7 +53,11 @@ class RKSVImporter(importer.ImporterProtocol):
                  account_dividends,
                  account_gains,
                  account_fees,
-                 account_external):
+                 account_external,
+                 date_format="%Y-%m-%d",
+                 aggregate_orders=False,
+                 flag='*',
+                 trade_ids=None):
         self.currency = currency
         self.account_root = account_root
         self.account_cash = account_cash
@@ -39,74 +65,138 @@ class RKSVImporter(importer.ImporterProtocol):
         self.account_gains = account_gains
         self.account_fees = account_fees
         self.account_external = account_external
+        self.date_format = date_format
+        self.aggregate_orders = aggregate_orders
+        self.flag = flag
+        # Optional importers.common.trade_ids.TradeIdIndex for exact deduplication
+        self.trade_ids = trade_ids
 
-    def identify(self, file):
+    def identify(self, filepath):
         # Match if the filename is as downloaded and the header has the unique
         # fields combination we're looking for.
-        return (re.match(r"rksv\d\d\d\d\d\d\d\d\.csv", path.basename(file.name)) and
-                re.match("trade_date,tradingsymbol,", file.head()))
+        if not re.match(r"rksv\d\d\d\d\d\d\d\d\.csv", path.basename(filepath)):
+            return False
+        with open(filepath) as infile:
+            return infile.readline().startswith("trade_date,tradingsymbol,")
 
-    def extract(self, file):
-        # Open the CSV file and create directives.
-        entries = []
-        index = 0
-        with open(file.name) as infile:
-            for index, row in enumerate(csv.DictReader(infile)):
-                meta = data.new_metadata(file.name, index)
-                date = parse(row['trade_date']).date()
-                rtype = row['trade_type']
-#               link = "{0[order_id]}".format(row)
-                desc = "{0[trade_type]} {0[tradingsymbol]} with TradeRef {0[order_id]}".format(row)
-                units = amount.Amount(D(row['amount']), self.currency)
-                fees = amount.Amount(D(row['fees']), self.currency)
-                b_value = amount.add(units, fees)
-                s_value = amount.add(units, -fees)
-                instrument = row['tradingsymbol']
-                rate = D(row['price'])
-
-                if rtype in ('buy', 'sell'):
-
-                    account_inst = account.join(self.account_root, instrument)
-                    units_inst = amount.Amount(D(row['quantity']), instrument)
-                    account_gains_inst = account.join(self.account_gains, instrument) 
-
-                    if rtype == 'buy':
-                        cost = position.Cost(rate, self.currency, None, None)
-                        txn = data.Transaction(
-                            meta, date, self.FLAG, None, desc, data.EMPTY_SET,data.EMPTY_SET, [
-                                data.Posting(account_inst, units_inst, cost, None, None,
-                                             None),
-                                data.Posting(self.account_fees, fees, None, None, None,
-                                             None),
-                                data.Posting(self.account_cash, None, None, None, None,
-                                             None),
-                                
-                            ])
-
-                    elif rtype == 'sell':
-                        # here the profit or loss goes to PnL account as configured in config.py
-                        cost_number = None
-                        cost = position.Cost(cost_number, self.currency, None, None)
-                        price = amount.Amount(rate, self.currency)
-                        account_gains = self.account_gains.format(instrument)
-                        txn = data.Transaction(
-                            meta, date, self.FLAG, None, desc, data.EMPTY_SET,data.EMPTY_SET, [
-                                data.Posting(account_inst, -units_inst, cost, price, None,
-                                             None),
-                                data.Posting(self.account_fees, fees, None, None, None,
-                                             None),                                
-                                data.Posting(self.account_cash, s_value, None, None, None,
-                                             None),
-                                data.Posting(account_gains_inst, None, None, None, None,
-                                             None),                     
-                                ])
-
-                else:
-                    logging.error("Unknown row type: %s; skipping", rtype)
+    def account(self, filepath):
+        return self.account_root
+
+    def date(self, filepath):
+        return max((trade.date for trade in self.read(filepath)), default=None)
+
+    def read(self, filepath):
+        """Stream the tradebook rows as Trade records.
+
+        Columns are resolved from the header once and dates are parsed
+        with the fixed date_format, memoized per distinct date string.
+        """
+        dates = {}
+        Decimal = decimal.Decimal
+        with open(filepath, newline='') as infile:
+            reader = csv.reader(infile)
+            header = next(reader, None)
+            if header is None:
+                return
+            col = {name.strip(): index for index, name in enumerate(header)}
+            i_date, i_type, i_symbol, i_order = (col['trade_date'], col['trade_type'],
+                                                 col['tradingsymbol'], col['order_id'])
+            i_quantity, i_price, i_amount, i_fees = (col['quantity'], col['price'],
+                                                     col['amount'], col['fees'])
+            for lineno, row in enumerate(reader, 2):
+                if not row:
                     continue
+                value = row[i_date]
+                date = dates.get(value)
+                if date is None:
+                    date = dates[value] = datetime.datetime.strptime(value.strip(), self.date_format).date()
+                yield Trade(lineno, date, row[i_type], row[i_symbol], row[i_order],
+                            Decimal(row[i_quantity]), Decimal(row[i_price]),
+                            Decimal(row[i_amount]), Decimal(row[i_fees]))
+
+    @staticmethod
+    def _aggregate(trades):
+        """Sum the trades of the same order, side and day.
+
+        The fills of an order need not be consecutive. The sum takes the
+        place of the first fill, at the average price rounded to the
+        decimals of the tradebook prices.
+        """
+        orders = {}
+        exponents = {}
+        for trade in trades:
+            key = (trade.order_id, trade.rtype, trade.date)
+            exponent = trade.price.as_tuple().exponent
+            current = orders.get(key)
+            if current is None:
+                orders[key] = trade
+                exponents[key] = exponent
+                continue
+            current.quantity += trade.quantity
+            current.amount += trade.amount
+            current.fees += trade.fees
+            exponents[key] = min(exponents[key], exponent)
+        for key, trade in orders.items():
+            if trade.quantity:
+                trade.price = (trade.amount / trade.quantity).quantize(
+                    decimal.Decimal(1).scaleb(exponents[key]))
+            yield trade
+
+    def _gains_account(self, instrument):
+        if '{}' in self.account_gains:
+            return self.account_gains.format(instrument)
+        return account.join(self.account_gains, instrument)
+
+    def extract(self, filepath, existing):
+        # Read the CSV file and create directives.
+        entries = []
+        seen = {}
+        trades = self.read(filepath)
+        if self.aggregate_orders:
+            trades = self._aggregate(trades)
+        for trade in trades:
+            rtype = trade.rtype
+            if rtype not in ('buy', 'sell'):
+                logging.error("Unknown row type: %s; skipping", rtype)
+                continue
+
+            instrument = trade.symbol
+            meta = data.new_metadata(filepath, trade.lineno)
+            meta['order_id'] = trade.order_id
+            if not self.aggregate_orders:
+                # One transaction per fill, several share the order_id
+                meta['trade_id'] = derived_id("rksv", (trade.order_id, trade.date, rtype, instrument,
+                                                       trade.quantity, trade.price), seen)
+            desc = "{} {} with TradeRef {}".format(rtype, instrument, trade.order_id)
+            fees = amount.Amount(trade.fees, self.currency)
+            account_inst = account.join(self.account_root, instrument)
+            units_inst = amount.Amount(trade.quantity, instrument)
 
-                entries.append(txn)
+            if rtype == 'buy':
+                # The cost is the amount paid, the rounded average price of
+                # an order may not multiply back to it.
+                cost_number = trade.price
+                if trade.quantity and trade.price * trade.quantity != trade.amount:
+                    cost_number = trade.amount / trade.quantity
+                cost = position.Cost(cost_number, self.currency, None, None)
+                cash = amount.Amount(-(trade.amount + trade.fees), self.currency)
+                postings = [
+                    data.Posting(account_inst, units_inst, cost, None, None, None),
+                    data.Posting(self.account_fees, fees, None, None, None, None),
+                    data.Posting(self.account_cash, cash, None, None, None, None),
+                ]
+            else:
+                # here the profit or loss goes to PnL account as configured in import_XXX.py
+                cost = position.Cost(None, self.currency, None, None)
+                price = amount.Amount(trade.price, self.currency)
+                s_value = amount.Amount(trade.amount - trade.fees, self.currency)
+                postings = [
+                    data.Posting(account_inst, -units_inst, cost, price, None, None),
+                    data.Posting(self.account_fees, fees, None, None, None, None),
+                    data.Posting(self.account_cash, s_value, None, None, None, None),
+                    data.Posting(self._gains_account(instrument), None, None, None, None, None),
+                ]
 
-        # Insert a final balance check.
-        
+            entries.append(data.Transaction(meta, trade.date, self.flag, None, desc,
+                                            data.EMPTY_SET, data.EMPTY_SET, postings))
         return entries
@@ -10,27 +10,31 @@ __license__ = "GNU GPLv3"
 __Version__ = "0.4"
 
 import re
-from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from beangulp.importers.csvbase import Date, Amount, Column
+from importers.common.compiled import CompiledImporter, CleanAmount
 
-class CleanAmount(Amount):
-    def parse(self, value):
-        if value:
-            cleaned = value.replace(',', '')
-            return super().parse(cleaned)
-        return 0  # Or any other default handling for empty values
-
-class SBIImporter(Importer):
+class SBIImporter(CompiledImporter):
     """An importer for SBI Bank xls file downloaded and converted to csv by tsv2csv.sh script in tools folder"""
     skiplines = 20  # Skip the first 20 lines for savings, 18 for PPF before reading the header
     date = Date("Value Date", frmt="%d %b %Y")
     narration = Column("Description")
     withdrawal = CleanAmount("Debit")
     deposit = CleanAmount("Credit")
+    # Rows are skipped when short or missing the 2nd column, the date
+    min_columns = 7
+    key_column = 1
+    # amount is -withdrawal for withdrawals, deposit for deposits, else 0
+    signed_amount = ('withdrawal', 'deposit')
+    balance = CleanAmount("Balance")
 
-    def __init__(self, account, account_number, currency="INR"):
+    def __init__(self, account, account_number, currency="INR", balance_every="month", overlap=None):
         super().__init__(account, currency)
         self.account_root = account
         self.account_number=account_number
+        # Balance assertion per "day", "week", "month", "year" or None for the last row
+        self.balance_every = balance_every
+        # overlap.StatementTails to drop rows already imported
+        self.overlap = overlap
 
     def identify(self, filepath):
         if not filepath.lower().endswith('.csv'):
@@ -50,18 +54,3 @@ class SBIImporter(Importer):
 
     def account(self, filepath):
         return self.account_root
-
-    def read(self, filepath):
-        """Override the read method to compute the amount."""
-        for row in super().read(filepath):
-            # Skip empty rows or rows missing a transaction date
-            if len(row) < 7 or not row[1]:  # assuming the 3rd column is the date
-                continue
-            # Compute the amount: negative for withdrawal, positive for deposit
-            if row.withdrawal != 0:
-                row.amount = -row.withdrawal  # Negative for withdrawals
-            elif row.deposit != 0:
-                row.amount = row.deposit  # Positive for deposits
-            else:
-                row.amount = 0  # Zero for zero-value transactions
-            yield row
@@ -0,0 +1,315 @@
+"""Zerodha charges of a batch of trades from the published charge schedule.
+
+The tradebook has no charges, only trades. The charges are computed per
+order from a table of rates by segment and effective date: brokerage,
+STT, exchange transaction charges, SEBI turnover fees, stamp duty, GST
+and the DP charge of delivery sells, as on the contract notes. An
+order is intraday when the same symbol is bought and sold on its day,
+derivatives are told apart from shares by their tradebook segment or
+exchange, and by their symbol only when neither tells.
+
+New rates are added as a new row of SCHEDULE with the date they apply
+from. check_contract_note() compares the computed charges with the
+subtotals of a contract note xml, to find a stale or missing rate.
+
+Usage:
+  python -m importers.zerodha.charges contract_note.xml
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+__Version__ = "0.1"
+
+import bisect
+import collections
+import datetime
+import functools
+import re
+import sys
+import xml.etree.ElementTree as ET
+from decimal import ROUND_HALF_UP
+from beancount.core import account
+from beancount.core.number import D, ZERO
+
+EQUITY_DELIVERY = "equity delivery"
+EQUITY_INTRADAY = "equity intraday"
+FUTURES = "futures"
+OPTIONS = "options"
+
+BROKERAGE = "Brokerage"
+STT = "Securities transaction tax"
+EXCHANGE = "Exchange transaction charges"
+SEBI = "SEBI turnover fees"
+STAMP = "Stamp duty"
+GST = "Integrated GST"
+DP = "DP charges"
+
+# Fractions of turnover, brokerage_cap and brokerage_flat in rupees per
+# order, exchange charges per exchange. GST applies to brokerage,
+# exchange charges, SEBI fees and DP charges.
+Rates = collections.namedtuple("Rates", "brokerage brokerage_cap brokerage_flat stt_buy stt_sell "
+                                        "exchange sebi stamp_buy gst dp")
+
+_DELIVERY = Rates(brokerage=ZERO, brokerage_cap=None, brokerage_flat=None,
+                  stt_buy=D("0.001"), stt_sell=D("0.001"),
+                  exchange={"NSE": D("0.0000345"), "BSE": D("0.0000375")},
+                  sebi=D("0.000001"), stamp_buy=D("0.00015"), gst=D("0.18"), dp=D("13.50"))
+_INTRADAY = _DELIVERY._replace(brokerage=D("0.0003"), brokerage_cap=D("20"),
+                               stt_buy=ZERO, stt_sell=D("0.00025"),
+                               stamp_buy=D("0.00003"), dp=ZERO)
+_FUTURES = _INTRADAY._replace(stt_sell=D("0.0001"), exchange={"NSE": D("0.00002"), "BSE": ZERO},
+                              stamp_buy=D("0.00002"))
+_OPTIONS = _INTRADAY._replace(brokerage=None, brokerage_cap=None, brokerage_flat=D("20"),
+                              stt_sell=D("0.0005"),
+                              exchange={"NSE": D("0.00053"), "BSE": D("0.000325")},
+                              stamp_buy=D("0.00003"))
+
+# Rates of each segment from the date they are effective, oldest first.
+SCHEDULE = {
+    EQUITY_DELIVERY: [
+        (datetime.date(2020, 7, 1), _DELIVERY),
+        (datetime.date(2024, 10, 1), _DELIVERY._replace(
+            exchange={"NSE": D("0.0000297"), "BSE": D("0.0000375")})),
+    ],
+    EQUITY_INTRADAY: [
+        (datetime.date(2020, 7, 1), _INTRADAY),
+        (datetime.date(2024, 10, 1), _INTRADAY._replace(
+            exchange={"NSE": D("0.0000297"), "BSE": D("0.0000375")})),
+    ],
+    FUTURES: [
+        (datetime.date(2020, 7, 1), _FUTURES),
+        (datetime.date(2023, 4, 1), _FUTURES._replace(stt_sell=D("0.000125"))),
+        (datetime.date(2024, 10, 1), _FUTURES._replace(
+            stt_sell=D("0.0002"), exchange={"NSE": D("0.0000173"), "BSE": ZERO})),
+    ],
+    OPTIONS: [
+        (datetime.date(2020, 7, 1), _OPTIONS),
+        (datetime.date(2023, 4, 1), _OPTIONS._replace(stt_sell=D("0.000625"))),
+        (datetime.date(2024, 10, 1), _OPTIONS._replace(
+            stt_sell=D("0.001"), exchange={"NSE": D("0.0003503"), "BSE": D("0.000325")})),
+    ],
+}
+
+# Derivative exchange segments and the exchange they belong to.
+EXCHANGES = {"NFO": "NSE", "BFO": "BSE", "NSE": "NSE", "BSE": "BSE"}
+
+PAISA = D("0.01")
+
+# Tradebook segments of shares and of futures and options.
+EQUITY_SEGMENT = "EQ"
+DERIVATIVE_SEGMENT = "FO"
+
+# Futures and monthly options, e.g. NIFTY24NOVFUT or RELIANCE24NOV1300CE.
+DERIVATIVE_SYMBOL = re.compile(r"\d{2}[A-Z]{3}(FUT|\d+(CE|PE))$")
+
+# One trade. segment is EQ, FO or None when not known, side is "buy" or "sell".
+Fill = collections.namedtuple("Fill", "date order_id symbol exchange segment side quantity price")
+
+
+def rates(segment, date):
+    """The Rates of a segment effective on date."""
+    table = SCHEDULE[segment]
+    index = bisect.bisect_right([start for start, _ in table], date) - 1
+    if index < 0:
+        raise ValueError(f"No {segment} charges before {table[0][0]}")
+    return table[index][1]
+
+
+@functools.lru_cache(maxsize=None)
+def charge_account(account_fees, charge_name):
+    """The fees account for a charge named as on a contract note."""
+    cname = charge_name.lower()
+    if 'brokerage' in cname:
+        return account.join(account_fees, 'Brokerage')
+    elif 'exchange transaction' in cname:
+        return account.join(account_fees, 'Exchange')
+    elif 'stt' in cname or 'securities transaction tax' in cname:
+        return account.join(account_fees, 'STT')
+    elif 'stamp' in cname:
+        return account.join(account_fees, 'StampDuty')
+    elif 'igst' in cname or 'integrated gst' in cname:
+        return account.join(account_fees, 'IGST')
+    elif 'cgst' in cname:
+        return account.join(account_fees, 'CGST')
+    elif 'sgst' in cname:
+        return account.join(account_fees, 'SGST')
+    elif 'sebi' in cname:
+        return account.join(account_fees, 'SEBI')
+    elif 'dp charge' in cname or 'demat' in cname:
+        return account.join(account_fees, 'Demat')
+    else:
+        return account.join(account_fees, 'Other')
+
+
+def is_derivative(symbol, exchange, segment=None):
+    """Whether a trade is of futures or options.
+
+    The tradebook segment decides, else the NFO and BFO exchanges, and
+    the symbol only when neither is known, so that shares such as
+    RELIANCE are not taken for options.
+    """
+    segment = (segment or "").strip().upper()
+    if segment in (EQUITY_SEGMENT, DERIVATIVE_SEGMENT):
+        return segment == DERIVATIVE_SEGMENT
+    if exchange in ("NFO", "BFO"):
+        return True
+    return DERIVATIVE_SYMBOL.search(symbol) is not None
+
+
+def _segment(fill, intraday):
+    if is_derivative(fill.symbol, fill.exchange, fill.segment):
+        return FUTURES if fill.symbol.endswith("FUT") else OPTIONS
+    if (fill.date, fill.symbol) in intraday:
+        return EQUITY_INTRADAY
+    return EQUITY_DELIVERY
+
+
+def _order_charges(exchange, side, turnover, rate):
+    charges = collections.OrderedDict()
+    if rate.brokerage_flat is not None:
+        brokerage = rate.brokerage_flat
+    else:
+        brokerage = turnover * rate.brokerage
+        if rate.brokerage_cap is not None:
+            brokerage = min(brokerage, rate.brokerage_cap)
+    charges[BROKERAGE] = brokerage
+    charges[STT] = turnover * (rate.stt_buy if side == "buy" else rate.stt_sell)
+    charges[EXCHANGE] = turnover * rate.exchange.get(EXCHANGES.get(exchange, exchange), ZERO)
+    charges[SEBI] = turnover * rate.sebi
+    charges[STAMP] = turnover * rate.stamp_buy if side == "buy" else ZERO
+    return charges
+
+
+def order_charges(fills, dp=True):
+    """Charges of each order of a batch of trades.
+
+    Args:
+      fills: Iterable of Fill, all the trades of the days concerned so
+        that intraday orders are recognized.
+      dp: Whether to add the DP charge of delivery sells, which the
+        contract notes leave out.
+    Returns:
+      A dict of (date, order_id, side) to an OrderedDict of charge name
+      to amount rounded to the paisa, zero charges left out. Orders
+      older than the schedule are left out.
+    """
+    fills = list(fills)
+    sides = collections.defaultdict(set)
+    for fill in fills:
+        sides[(fill.date, fill.symbol)].add(fill.side)
+    intraday = {key for key, seen in sides.items() if len(seen) > 1}
+
+    orders = collections.OrderedDict()
+    for fill in fills:
+        key = (fill.date, fill.order_id, fill.side)
+        if key not in orders:
+            orders[key] = [fill, ZERO]
+        orders[key][1] += abs(fill.quantity * fill.price)
+
+    result = {}
+    dp_charged = set()
+    for key, (fill, turnover) in orders.items():
+        segment = _segment(fill, intraday)
+        try:
+            rate = rates(segment, fill.date)
+        except ValueError:
+            continue
+        charges = _order_charges(fill.exchange, fill.side, turnover, rate)
+        if dp and fill.side == "sell" and rate.dp and (fill.date, fill.symbol) not in dp_charged:
+            # Once per scrip and day, whatever the number of orders.
+            dp_charged.add((fill.date, fill.symbol))
+            charges[DP] = rate.dp
+        charges[GST] = rate.gst * (charges[BROKERAGE] + charges[EXCHANGE] + charges[SEBI]
+                                   + charges.get(DP, ZERO))
+        result[key] = collections.OrderedDict(
+            (name, value.quantize(PAISA, ROUND_HALF_UP))
+            for name, value in charges.items() if value.quantize(PAISA, ROUND_HALF_UP))
+    return result
+
+
+def allocate(charges, weights):
+    """Split the charges of an order over its trades pro rata.
+
+    The rounding remainder goes to the last trade, so the parts add up
+    to the order charges exactly.
+
+    Returns:
+      A list of OrderedDict of charge name to amount, one per weight.
+    """
+    total = sum(weights)
+    parts = [collections.OrderedDict() for _ in weights]
+    for name, value in charges.items():
+        left = value
+        for index, weight in enumerate(weights):
+            if index == len(weights) - 1:
+                share = left
+            else:
+                share = (value * weight / total).quantize(PAISA, ROUND_HALF_UP) if total else ZERO
+            left -= share
+            if share:
+                parts[index][name] = share
+    return parts
+
+
+def _contract_fills(contract, date):
+    fills = []
+    for trade in contract.findall('.//trade'):
+        def text(tag):
+            child = trade.find(tag)
+            return child.text.strip() if child is not None and child.text else ""
+        instrument = trade.get('instrument_id', '')
+        symbol, _, segment = instrument.split(":")[-1].partition(" - ")
+        quantity, price = D(text('quantity') or 0), D(text('average_price') or 0)
+        if not quantity or not price:
+            continue
+        fills.append(Fill(date, text('order_id'), symbol, text('exchange'), segment.strip(),
+                          "buy" if text('type') == 'B' else "sell", quantity, price))
+    return fills
+
+
+def check_contract_note(filepath, tolerance=D("0.05")):
+    """Compare the computed charges with the subtotals of a contract note xml.
+
+    Charges are compared by the fees account they are booked to, with
+    CGST, SGST and IGST summed as GST.
+
+    Returns:
+      A list of (contract id, charge, note amount, computed amount) that
+      differ by more than the tolerance.
+    """
+    def leaf(name):
+        name = charge_account("", name).split(":")[-1]
+        return "GST" if name.endswith("GST") else name
+
+    differences = []
+    root = ET.parse(filepath).getroot()
+    for contract in root.findall('.//contract'):
+        contract_id = (contract.findtext('id') or 'Unknown').strip()
+        timestamp = (contract.findtext('timestamp') or '').strip()
+        try:
+            date = datetime.datetime.strptime(timestamp[:10], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        noted = collections.defaultdict(lambda: ZERO)
+        for charge in contract.findall('.//subtotals/charges/charge'):
+            name = (charge.findtext('name') or '').strip()
+            if not name or 'PAY IN / PAY OUT OBLIGATION' in name or 'Net amount Receivable' in name:
+                continue
+            noted[leaf(name)] += abs(D((charge.findtext('value') or '0').strip()))
+        computed = collections.defaultdict(lambda: ZERO)
+        for charges in order_charges(_contract_fills(contract, date), dp=False).values():
+            for name, value in charges.items():
+                computed[leaf(name)] += value
+        for name in sorted(set(noted) | set(computed)):
+            if abs(noted[name] - computed[name]) > tolerance:
+                differences.append((contract_id, name, noted[name], computed[name]))
+    return differences
+
+
+if __name__ == "__main__":
+    status = 0
+    for filepath in sys.argv[1:]:
+        for contract_id, name, noted, computed in check_contract_note(filepath):
+            print(f"{filepath}: contract {contract_id}: {name} {noted} on the note, "
+                  f"{computed} computed")
+            status = 1
+    sys.exit(status)
@@ -10,11 +10,57 @@ __Version__ = "0.5"
 
 import os
 import re
+import sys
 from beancount.core import data, amount, account, position
 from beancount.core.number import D
 from beangulp.importers.csvbase import Importer, Date, Amount, Column
+from importers.common.chunked import ChunkedReader
+from importers.common.trade_ids import TradeIdDeduplication
+from importers.zerodha import charges
 
-class ZerodhaImporter(Importer):
+class Trade:
+    """One tradebook row, decoded once, with its share of the order charges."""
+    __slots__ = ("date", "symbol", "exchange", "segment", "transaction_type", "quantity", "price",
+                 "trade_id", "order_id", "charges")
+
+    def __init__(self, row):
+        self.date = row.date
+        self.symbol = row.symbol
+        self.exchange = row.exchange
+        self.segment = row.segment
+        self.transaction_type = row.transaction_type
+        self.quantity = row.quantity
+        self.price = row.price
+        self.trade_id = row.trade_id
+        self.order_id = row.order_id
+        self.charges = None
+
+    # The fields csvbase.Importer.extract() reads.
+    @property
+    def narration(self):
+        return self.trade_id
+
+    @property
+    def amount(self):
+        return self.price
+
+
+def _add_charges(trades):
+    """Set the charges of the trades of one day, split over the trades of each order."""
+    fills = [charges.Fill(trade.date, trade.order_id, trade.symbol, trade.exchange, trade.segment,
+                          trade.transaction_type, trade.quantity, trade.price) for trade in trades]
+    orders = {}
+    for trade in trades:
+        orders.setdefault((trade.date, trade.order_id, trade.transaction_type), []).append(trade)
+    for key, order_charges in charges.order_charges(fills).items():
+        order_trades = orders[key]
+        parts = charges.allocate(order_charges, [trade.quantity * trade.price for trade in order_trades])
+        for trade, part in zip(order_trades, parts):
+            trade.charges = part
+    return trades
+
+
+class ZerodhaImporter(TradeIdDeduplication, ChunkedReader, Importer):
     """An importer for Zerodha CSV files."""
 
     # Define columns based on the current CSV structure
@@ -35,7 +81,7 @@ class ZerodhaImporter(Importer):
     # execution_time = Column("order_execution_time")
 
     def __init__(self, currency, account_root, account_cash, account_dividends,
-                 account_gains, account_fees, account_external):
+                 account_gains, account_fees, account_external, trade_ids=None):
         super().__init__(account_root, currency)
         self.currency = currency
         self.account_root = account_root
@@ -44,6 +90,8 @@ class ZerodhaImporter(Importer):
         self.account_gains = account_gains
         self.account_fees = account_fees
         self.account_external = account_external
+        # Optional importers.common.trade_ids.TradeIdIndex for exact deduplication
+        self.trade_ids = trade_ids
 
     # def identify(self, filepath):
     #     """Identify if this is a Zerodha CSV file."""
@@ -70,7 +118,46 @@ class ZerodhaImporter(Importer):
         return self.account_root
 
     def read(self, filepath):
-        """Override the read method to handle empty rows and validate data."""
+        """Rows as Trade records with their charges.
+
+        The charges of an order depend on the other trades of its day,
+        so the trades are held one trade date at a time, the tradebook
+        lists them in date order.
+        """
+        day = []
+        done = set()
+        warned = False
+        for row in self._valid_rows(filepath):
+            trade = Trade(row)
+            if day and trade.date != day[0].date:
+                done.add(day[0].date)
+                yield from _add_charges(day)
+                day = []
+            if not day and not warned and trade.date in done:
+                print(f"{filepath}: trades not in date order, the charges of orders "
+                      f"split over the file are computed in parts", file=sys.stderr)
+                warned = True
+            day.append(trade)
+        yield from _add_charges(day)
+
+    def _fee_postings(self, row):
+        """Total charges of a trade and their postings.
+
+        Trades older than the charge schedule get the former estimate
+        of 0.1% of the trade value.
+        """
+        trade_charges = row.charges
+        if trade_charges is None:
+            fees = (row.quantity * row.price * D(0.001)).quantize(D('0.01'))
+            return fees, [data.Posting(self.account_fees, amount.Amount(fees, self.currency),
+                                       None, None, None, None)]
+        postings = [data.Posting(charges.charge_account(self.account_fees, name),
+                                 amount.Amount(value, self.currency), None, None, None, None)
+                    for name, value in trade_charges.items()]
+        return sum(trade_charges.values(), D(0)), postings
+
+    def _valid_rows(self, filepath):
+        """Skip empty rows and validate data."""
         for row in super().read(filepath):
             # print(f"processing row:{row}")
             # Skip empty rows or rows missing essential data
@@ -87,12 +174,12 @@ class ZerodhaImporter(Importer):
         # use quantize method to fix the number of decimals
         desc = f"{row.transaction_type} {row.symbol} with OrderID {row.order_id} and Trade Id {row.trade_id}"
         txn = txn._replace(narration=desc)  # Update narration in the transaction
+        txn.meta["trade_id"] = row.trade_id
+        txn.meta["order_id"] = row.order_id
         postings = []
 
-        gross_cost = row.quantity * row.price
-        fees = row.quantity * row.price * D(0.001)
-        gross_cost = gross_cost.quantize(D('0.01'))
-        fees = fees.quantize(D('0.01'))
+        gross_cost = (row.quantity * row.price).quantize(D('0.01'))
+        fees, fee_postings = self._fee_postings(row)
         if row.transaction_type == 'buy':
             account_inst = account.join(self.account_root, row.symbol)
             # units_inst = amount.Amount(row.quantity, row.symbol)
@@ -100,10 +187,9 @@ class ZerodhaImporter(Importer):
             # Cost object for buys: this locks in cost basis
             cost = position.Cost(row.price.quantize(D('0.01')), self.currency, None, None)
             total_cost = amount.Amount(gross_cost + fees, self.currency)
-            fees = amount.Amount(fees, self.currency)
             postings = [
                 data.Posting(self.account_cash, -total_cost, None, None, None, None),
-                data.Posting(self.account_fees, fees, None, None, None, None),
+                *fee_postings,
                 data.Posting(account_inst, units_inst, cost, None, None, None),
             ]
 
@@ -115,10 +201,9 @@ class ZerodhaImporter(Importer):
             # Empty Cost object for sells
             cost = position.Cost(None, None, None, None)
             account_gains = self.account_gains.format(row.symbol)
-            fees = amount.Amount(fees, self.currency)
             postings = [
                 data.Posting(self.account_cash, net_proceeds, None, None, None, None),
-                data.Posting(self.account_fees, fees, None, None, None, None),
+                *fee_postings,
                 data.Posting(account_inst, -units_inst, cost, price_amount, None, None),
                 data.Posting(account_gains, None, None, None, None, None),
             ]
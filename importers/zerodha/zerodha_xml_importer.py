@@ -3,6 +3,8 @@ XML contract notes. This imports transactions from contract notes XML files
 provided by the broker.
 """
 
+import re
+import sys
 import xml.etree.ElementTree as ET
 from decimal import Decimal
 from datetime import datetime
@@ -10,19 +12,115 @@ from typing import Optional, Dict, List
 from beancount.core import data, amount, account, position
 from beancount.core.number import D
 from beangulp import Importer
+from importers.common.trade_ids import TradeIdDeduplication
+from importers.zerodha import charges
 
 
-class ZerodhaXMLImporter(Importer):
+def _strip(text):
+    return text.strip() if text else ""
+
+
+class Trade:
+    """One trade of a contract note."""
+    __slots__ = ('id', 'order_id', 'timestamp', 'exchange', 'type', 'quantity', 'price',
+                 'value', 'instrument')
+
+    def __init__(self, id, order_id, timestamp, exchange, type, quantity, price, value,
+                 instrument):
+        self.id = id
+        self.order_id = order_id
+        self.timestamp = timestamp
+        self.exchange = exchange
+        self.type = type
+        self.quantity = quantity
+        self.price = price
+        self.value = value
+        self.instrument = instrument
+
+
+class Instrument:
+    """Commodity, accounts and details of an instrument_id, shared by its trades."""
+    __slots__ = ('symbol', 'account', 'gains_account', 'exchange', 'segment', 'isin')
+
+    def __init__(self, symbol, account, gains_account, exchange, segment, isin=None):
+        self.symbol = symbol
+        self.account = account
+        self.gains_account = gains_account
+        self.exchange = exchange
+        self.segment = segment
+        self.isin = isin
+
+
+class InstrumentRegistry:
+    """Instruments by instrument_id, e.g. "NSE:INFY - EQ", parsed once.
+
+    Symbols are made valid beancount commodities and the account names
+    are interned, so every trade of an instrument shares one object.
+    """
+
+    def __init__(self, account_root, account_gains, account_fees):
+        self.account_root = account_root
+        self.account_gains = account_gains
+        self.account_fees = account_fees
+        self._instruments = {}
+        self._isins = {}
+        self._charge_accounts = {}
+
+    @staticmethod
+    def commodity(name):
+        """A valid beancount commodity for a ticker symbol, e.g. M&M -> M-M."""
+        symbol = re.sub(r"[^A-Z0-9'._-]", "-", name.upper())
+        if not symbol[:1].isalpha():
+            symbol = "X" + symbol
+        return symbol[:24].rstrip("'._-") or "UNKNOWN"
+
+    def load(self, root: ET.Element):
+        """Remember the ISIN of the instruments listed in a contract note, if any."""
+        for elem in root.iter('instrument'):
+            instrument_id = elem.get('id') or elem.get('instrument_id')
+            isin = elem.get('isin') or _strip(elem.findtext('isin'))
+            if instrument_id and isin:
+                self._isins[instrument_id] = isin
+
+    def get(self, instrument_id: str) -> Instrument:
+        instrument = self._instruments.get(instrument_id)
+        if instrument is None:
+            exchange, _, name = instrument_id.rpartition(":")
+            name, _, segment = name.partition(" - ")
+            symbol = self.commodity(name) if instrument_id and ":" in instrument_id else "UNKNOWN"
+            # The " - EQ" of the instrument_id, else the exchange or symbol.
+            segment = (charges.DERIVATIVE_SEGMENT if charges.is_derivative(symbol, exchange, segment)
+                       else charges.EQUITY_SEGMENT)
+            gains = (self.account_gains.format(symbol) if '{}' in self.account_gains
+                     else self.account_gains)
+            component = re.sub(r"[^A-Za-z0-9-]", "-", symbol)
+            instrument = self._instruments[instrument_id] = Instrument(
+                sys.intern(symbol), sys.intern(account.join(self.account_root, component)),
+                sys.intern(gains), exchange, segment, self._isins.get(instrument_id))
+        return instrument
+
+    def charge_account(self, charge_name: str) -> str:
+        name = self._charge_accounts.get(charge_name)
+        if name is None:
+            name = self._charge_accounts[charge_name] = sys.intern(
+                charges.charge_account(self.account_fees, charge_name))
+        return name
+
+
+class ZerodhaXMLImporter(TradeIdDeduplication, Importer):
     """An importer for Zerodha XML contract note files."""
 
     def __init__(self, currency: str, account_root: str, account_cash: str,
-                 account_gains: str, account_fees: str):
+                 account_gains: str, account_fees: str, trade_ids=None):
         self.currency = currency
         self.account_root = account_root
         self.account_cash = account_cash
         self.account_gains = account_gains
         self.account_fees = account_fees
         self.demat_charge_per_sell = D("13.50")
+        self.instruments = InstrumentRegistry(account_root, account_gains, account_fees)
+        # Optional importers.common.trade_ids.TradeIdIndex for exact deduplication
+        self.trade_ids = trade_ids
 
     def identify(self, filepath: str) -> bool:
         if not filepath.endswith('.xml'):
@@ -47,6 +145,7 @@ class ZerodhaXMLImporter(Importer):
         try:
             tree = ET.parse(filepath)
             root = tree.getroot()
+            self.instruments.load(root)
             for contract in root.findall('.//contract'):
                 entries.extend(self._process_contract(contract, filepath))
         except ET.ParseError as e:
@@ -73,11 +172,6 @@ class ZerodhaXMLImporter(Importer):
         child = elem.find(tag)
         return child.text.strip() if child is not None and child.text else default
 
-    def _extract_symbol(self, instrument_id: str) -> str:
-        if not instrument_id:
-            return "UNKNOWN"
-        return instrument_id.split(":")[1].split(" - ")[0]
-
     # -------------------
     # Charges
     # -------------------
@@ -102,11 +196,9 @@ class ZerodhaXMLImporter(Importer):
             total += abs(value)
         return total
 
-    def _allocate_contract_charges(self, contract_elem: ET.Element,
+    def _allocate_contract_charges(self, xml_charges: Dict[str, Decimal], total_value: Decimal,
                                    order_value: Decimal) -> Dict[str, Decimal]:
         """Allocate contract-level charges proportionally to order value."""
-        xml_charges = self._extract_contract_charges(contract_elem)
-        total_value = self._get_total_contract_value(contract_elem)
         if total_value == 0:
             return {}
         ratio = abs(order_value) / total_value
@@ -117,25 +209,23 @@ class ZerodhaXMLImporter(Importer):
     # Processing
     # -------------------
 
-    def _group_trades_by_order(self, contract_elem: ET.Element) -> Dict[tuple, List[Dict]]:
+    def _group_trades_by_order(self, contract_elem: ET.Element) -> Dict[tuple, List[Trade]]:
         orders = {}
         for trade_elem in contract_elem.findall('.//trade'):
-            tr = {
-                'id': self._get_text(trade_elem, 'id'),
-                'order_id': self._get_text(trade_elem, 'order_id'),
-                'timestamp': self._get_text(trade_elem, 'timestamp'),
-                'exchange': self._get_text(trade_elem, 'exchange'),
-                'type': self._get_text(trade_elem, 'type'),
-                'quantity': self._parse_decimal(self._get_text(trade_elem, 'quantity')),
-                'price': self._parse_decimal(self._get_text(trade_elem, 'average_price')),
-                'value': self._parse_decimal(self._get_text(trade_elem, 'value')),
-                'instrument_id': trade_elem.get('instrument_id', 'Unknown'),
-            }
-            if not tr['quantity'] or not tr['price']:
+            # One pass over the children instead of a find() per field.
+            fields = {child.tag: child.text for child in trade_elem}
+            quantity = self._parse_decimal(fields.get('quantity'))
+            price = self._parse_decimal(fields.get('average_price'))
+            if not quantity or not price:
                 continue
-            tr['symbol'] = self._extract_symbol(tr['instrument_id'])
-            key = (tr['order_id'], tr['type'])
-            orders.setdefault(key, []).append(tr)
+            # Order id, timestamp, exchange and type repeat across trades.
+            tr = Trade(_strip(fields.get('id')), sys.intern(_strip(fields.get('order_id'))),
+                       sys.intern(_strip(fields.get('timestamp'))),
+                       sys.intern(_strip(fields.get('exchange'))),
+                       sys.intern(_strip(fields.get('type'))), quantity, price,
+                       self._parse_decimal(fields.get('value')),
+                       self.instruments.get(trade_elem.get('instrument_id', 'Unknown')))
+            orders.setdefault((tr.order_id, tr.type), []).append(tr)
         return orders
 
     def _process_contract(self, contract_elem: ET.Element, filepath: str):
@@ -149,9 +239,13 @@ class ZerodhaXMLImporter(Importer):
         if not orders:
             return []
 
+        # Read once per contract, not once per order.
+        contract_charges = (self._extract_contract_charges(contract_elem),
+                            self._get_total_contract_value(contract_elem))
+
         entries = []
         for (order_id, ttype), order_trades in orders.items():
-            txn = self._create_order_transaction(order_trades, contract_elem,
+            txn = self._create_order_transaction(order_trades, contract_charges,
                                                  contract_date, contract_id,
                                                  filepath)
             entries.append(txn)
@@ -161,25 +255,32 @@ class ZerodhaXMLImporter(Importer):
     # Transaction builder
     # -------------------
 
-    def _create_order_transaction(self, order_trades: List[Dict],
-                              contract_elem: ET.Element,
+    def _create_order_transaction(self, order_trades: List[Trade],
+                              contract_charges: tuple,
                               contract_date: datetime.date,
                               contract_id: str,
                               filepath: str) -> data.Transaction:
 
-        total_qty = sum(abs(t['quantity']) for t in order_trades)
-        total_val = sum(abs(t['value']) for t in order_trades)
+        total_qty = sum(abs(t.quantity) for t in order_trades)
+        total_val = sum(abs(t.value) for t in order_trades)
         avg_price = total_val / total_qty if total_qty else D('0')
 
         first_trade = order_trades[0]
-        symbol = first_trade['symbol']
-        trade_type_char = first_trade['type']
+        instrument = first_trade.instrument
+        symbol = instrument.symbol
+        trade_type_char = first_trade.type
 
         # Allocate XML charges
-        allocated_charges = self._allocate_contract_charges(contract_elem, total_val)
+        allocated_charges = self._allocate_contract_charges(*contract_charges, total_val)
 
         narration = f"{'Buy' if trade_type_char == 'B' else 'Sell'} {total_qty} {symbol} @ {avg_price:.2f} {contract_id}"
         meta = data.new_metadata(filepath, 0)
+        meta['order_id'] = first_trade.order_id
+        meta['contract_id'] = contract_id
+        meta['trade_ids'] = ",".join(t.id for t in order_trades)
+        meta['segment'] = instrument.segment
+        if instrument.isin:
+            meta['isin'] = instrument.isin
         postings = []
 
         # Common proceeds and charges
@@ -189,7 +290,7 @@ class ZerodhaXMLImporter(Importer):
             charges_total += self.demat_charge_per_sell
 
         if trade_type_char == 'B':
-            stock_account = account.join(self.account_root, symbol)
+            stock_account = instrument.account
             stock_units = amount.Amount(total_qty, symbol)
             cost = position.Cost(avg_price, self.currency, None, None)
             cash_flow = (proceeds + charges_total).quantize(D("0.001"))  # outflow
@@ -199,7 +300,7 @@ class ZerodhaXMLImporter(Importer):
                                          None, None, None, None))
 
         elif trade_type_char == 'S':
-            stock_account = account.join(self.account_root, symbol)
+            stock_account = instrument.account
             stock_units = amount.Amount(total_qty, symbol)
             price_amount = amount.Amount(avg_price, self.currency)
             cost = position.Cost(None, None, None, None)
@@ -209,18 +310,17 @@ class ZerodhaXMLImporter(Importer):
                                          amount.Amount(cash_flow, self.currency),
                                          None, None, None, None))
             # PnL autoposting
-            gains_account = self.account_gains.format(symbol) if '{}' in self.account_gains else self.account_gains
-            postings.append(data.Posting(gains_account, None, None, None, None, None))
+            postings.append(data.Posting(instrument.gains_account, None, None, None, None, None))
             # Demat (only as expense, not baked into cash again)
             if self.demat_charge_per_sell:
-                postings.append(data.Posting(account.join(self.account_fees, 'Demat'),
+                postings.append(data.Posting(self.instruments.charge_account('Demat'),
                                              amount.Amount(self.demat_charge_per_sell, self.currency),
                                              None, None, None, None))
 
         # Charge postings (only once!)
         for cname, cval in allocated_charges.items():
                 if cval > 0:
-                    postings.append(data.Posting(self._map_charge_to_account(cname),
+                    postings.append(data.Posting(self.instruments.charge_account(cname),
                                                  amount.Amount(cval, self.currency),
                                                  None, None, None, None))
 
@@ -234,22 +334,4 @@ class ZerodhaXMLImporter(Importer):
     # -------------------
 
     def _map_charge_to_account(self, charge_name: str) -> str:
-        cname = charge_name.lower()
-        if 'brokerage' in cname:
-            return account.join(self.account_fees, 'Brokerage')
-        elif 'exchange transaction' in cname:
-            return account.join(self.account_fees, 'Exchange')
-        elif 'stt' in cname or 'securities transaction tax' in cname:
-            return account.join(self.account_fees, 'STT')
-        elif 'stamp' in cname:
-            return account.join(self.account_fees, 'StampDuty')
-        elif 'igst' in cname or 'integrated gst' in cname:
-            return account.join(self.account_fees, 'IGST')
-        elif 'cgst' in cname:
-            return account.join(self.account_fees, 'CGST')
-        elif 'sgst' in cname:
-            return account.join(self.account_fees, 'SGST')
-        elif 'sebi' in cname:
-            return account.join(self.account_fees, 'SEBI')
-        else:
-            return account.join(self.account_fees, 'Other')
\ No newline at end of file
+        return self.instruments.charge_account(charge_name)
@@ -17,35 +17,59 @@ from importers.zerodha import zerodha_xml_importer
 from importers.kgi import kgi
 from importers.kvb import kvb
 from importers.iocbc import iocbc
+from importers.common import fxrates
+from importers.common import overlap
+from importers.common import lots
+from importers.common import accounts
+from importers.common import trade_ids
+from importers.common import predictors
+from importers.common.ingest import Ingest
+from importers.common import hooks as entry_hooks
 from beancount.core import data
 import beangulp
-from smart_importer import PredictPayees, PredictPostings
 from collections import Counter
 import sys
+import os
+
+# SBI TT buying rates used to stamp INR values on foreign transactions
+rates = fxrates.SBIRates()
+
+# Ledger whose open accounts and trade ids are indexed
+LEDGER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prabu.beancount")
+
+# Trade identifiers in the ledger, to drop re-imported trades exactly
+trade_index = trade_ids.TradeIdIndex(LEDGER)
+
+# Payee and postings models, updated with the new ledger transactions
+MODELS = "models"
+
+# Last rows imported per bank account, to drop overlapping statement rows
+tails = overlap.StatementTails("statement_tails")
 
 importers = [
-    PredictPostings().wrap(
-        PredictPayees().wrap(
-            icici.IciciBankImporter("Assets:IN:ICICIBank:Savings","XXXXXXXXXXX")
+    predictors.IncrementalPostings(MODELS).wrap(
+        predictors.IncrementalPayees(MODELS).wrap(
+            icici.IciciBankImporter("Assets:IN:ICICIBank:Savings","XXXXXXXXXXX",
+                                    overlap=tails)
         )
     ),
-    PredictPostings().wrap(
-        PredictPayees().wrap(
-            sbi.SBIImporter("Assets:IN:SBI:Savings","XXXXXXXXXXX")
+    predictors.IncrementalPostings(MODELS).wrap(
+        predictors.IncrementalPayees(MODELS).wrap(
+            sbi.SBIImporter("Assets:IN:SBI:Savings","XXXXXXXXXXX", overlap=tails)
         )
     ),
-    PredictPostings().wrap(
-        PredictPayees().wrap(
+    predictors.IncrementalPostings(MODELS).wrap(
+        predictors.IncrementalPayees(MODELS).wrap(
             iob.IOBImporter("Assets:IN:IOB:Savings","NNNN")
         )
     ),
-    PredictPostings().wrap(
-        PredictPayees().wrap(
+    predictors.IncrementalPostings(MODELS).wrap(
+        predictors.IncrementalPayees(MODELS).wrap(
             kvb.KVBImporter("Assets:IN:KVB:Savings","XXXXXXXXXXX")
         )
     ),
-    PredictPostings().wrap(
-        PredictPayees().wrap(
+    predictors.IncrementalPostings(MODELS).wrap(
+        predictors.IncrementalPayees(MODELS).wrap(
             etrade.ETradeImporter("USD",
                         "Assets:US:ETrade",
                         "Assets:US:ETrade:Cash",
@@ -53,7 +77,8 @@ importers = [
                         "Income:US:ETrade:{}:PnL",
                         "Expenses:Financial:Fees:ETrade",
                         "Expenses:US:WithholdingTax:{}",
-                        "Income:US:Interest:ETrade")
+                        "Income:US:Interest:ETrade",
+                        rates=rates, trade_ids=trade_index)
         )
     ),
     zerodha.ZerodhaImporter("INR",
@@ -62,13 +87,15 @@ importers = [
                             "Income:IN:Zerodha:{}:Dividend",
                             "Income:IN:Zerodha:{}:PnL",
                             "Expenses:Financial:Fees:Zerodha",
-                            "Assets:IN:ICICIBank:Savings"
+                            "Assets:IN:ICICIBank:Savings",
+                            trade_ids=trade_index
                             ),
     zerodha_xml_importer.ZerodhaXMLImporter('INR',
                                             'Assets:IN:Zerodha',
                                             'Assets:IN:Zerodha:Cash',
                                             'Income:IN:Zerodha:{}:PnL',
-                                            'Expenses:Financial:Fees:Zerodha'
+                                            'Expenses:Financial:Fees:Zerodha',
+                                            trade_ids=trade_index
                                             ),
     kgi.KGIImporter("THB",
                     "Assets:TH:KGI",
@@ -79,7 +106,8 @@ importers = [
                     "Expenses:TH:WithholdingTax:{}",
                     "Income:TH:Interest:KGI",
                     "Assets:TH:KGI:Cash",
-                    "Assets:SG:XYZ:Savings:Prabu"
+                    "Assets:SG:XYZ:Savings:Prabu",
+                    rates=rates, trade_ids=trade_index
                     ),
     iocbc.IocbcImporter('SGD',
         'Assets:SG',
@@ -87,51 +115,38 @@ importers = [
         'Income:SG:SRS:{}:PnL',
         'Income:SG:CPFIS:{}:PnL',
         'Income:SG:CDP:{}:PnL',
-        'Expenses:Financial:Fees:IOCBC'
+        'Expenses:Financial:Fees:IOCBC',
+        rates=rates, trade_ids=trade_index
     ),
 ]
 
 HOOKS = [
   ]
 
-def clean_up_descriptions(extracted_entries):
+def clean_up_description(entry):
     """Example filter function; clean up cruft from narrations.
 
     Args:
-      extracted_entries: A list of directives.
+      entry: A directive.
     Returns:
-      A new list of directives with possibly modified payees and narration
-      fields.
+      The directive with possibly modified payee and narration fields,
+      or the very same directive when there is nothing to clean up.
     """
-    clean_entries = []
-    for entry in extracted_entries:
-        if isinstance(entry, data.Transaction):
-            if entry.narration and " / " in entry.narration:
-                left_part, _ = entry.narration.split(" / ")
-                entry = entry._replace(narration=left_part)
-            if entry.payee and " / " in entry.payee:
-                left_part, _ = entry.payee.split(" / ")
-                entry = entry._replace(payee=left_part)
-        clean_entries.append(entry)
-    return clean_entries
+    if isinstance(entry, data.Transaction):
+        if entry.narration and " / " in entry.narration:
+            entry = entry._replace(narration=entry.narration.partition(" / ")[0])
+        if entry.payee and " / " in entry.payee:
+            entry = entry._replace(payee=entry.payee.partition(" / ")[0])
+    return entry
 
-def process_extracted_entries(extracted_entries_list, ledger_entries):
-    """Example filter function; clean up cruft from narrations.
+# Per entry filters fused into one pass over the extracted entries, with
+# the time and number of changed entries of each reported after extract.
+process_extracted_entries = entry_hooks.Pipeline(clean_up_description)
 
-    Args:
-      extracted_entries_list: A list of (filename, entries) pairs, where
-        'entries' are the directives extract from 'filename'.
-      ledger_entries: If provided, a list of directives from the existing
-        ledger of the user. This is non-None if the user provided their
-        ledger file as an option.
-    Returns:
-      A possibly different version of extracted_entries_list, a list of
-      (filename, entries), to be printed.
-    """
-    return [(filename, clean_up_descriptions(entries), account, importer)
-            for filename, entries, account, importer in extracted_entries_list]
+# Open lots carried between runs to resolve sells and split STCG/LTCG
+lot_book = lots.LotBook("lots.pickle", {"Assets:IN:Zerodha": lots.EQUITY})
 
-hooks = [process_extracted_entries]
+hooks = [lot_book, accounts.AccountIndex(LEDGER), process_extracted_entries]
 if __name__ == '__main__':
-    ingest = beangulp.Ingest(importers, hooks)
+    ingest = Ingest(importers, hooks)
     ingest()
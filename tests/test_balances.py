@@ -0,0 +1,37 @@
+import datetime
+from beancount.core.number import D
+from importers.common import balances
+
+
+def _dates(*days):
+    return [datetime.date(2024, 1, 1) + datetime.timedelta(days=day) for day in days]
+
+
+def test_check_chain_points_at_the_break():
+    amounts = [D("100.00"), D("-20.50"), D("10.00"), D("5.00")]
+    chain = [D("100.00"), D("79.50"), D("89.50"), D("94.50")]
+    assert list(balances.check_chain(amounts, chain)) == []
+    # A row of 10.00 missing before the fourth one.
+    broken = chain[:3] + [D("104.50")]
+    assert list(balances.check_chain(amounts, broken)) == [3]
+    assert list(balances.check_chain(amounts[:1], chain[:1])) == []
+
+
+def test_period_ends():
+    dates = _dates(0, 5, 31, 40, 70)
+    assert list(balances.period_ends(dates, "month")) == [1, 3, 4]
+    assert list(balances.period_ends(dates, None)) == [4]
+    assert list(balances.period_ends([], "month")) == []
+
+
+def test_fill_missing():
+    amounts = [D("10"), D("5"), D("-3"), D("2")]
+    assert balances.fill_missing(amounts, [None, D("15"), None, D("14")]) == \
+        [D("10"), D("15"), D("12"), D("14")]
+    assert balances.fill_missing(amounts, [None] * 4) is None
+
+
+def test_report_breaks_uses_stderr(capsys):
+    balances.report_breaks("bank.csv", [2, 3], [1], [D("1"), D("2")], [D("1"), D("5")])
+    out, err = capsys.readouterr()
+    assert out == "" and "bank.csv:3: balance 5 does not follow from 1 + 2 = 3" in err
@@ -0,0 +1,88 @@
+import csv
+import io
+from itertools import islice
+import pytest
+from importers.common import chunked, parallel
+from importers.iob import iob
+
+HEADER = "Date,Narration,Amount\n"
+
+
+def _text(rows):
+    lines = []
+    for index in range(rows):
+        if index % 7 == 0:
+            narration = f'"UPI\nline {index}, with ""quotes"""'
+        elif index % 5 == 0:
+            narration = f'"a, b {index}"'
+        else:
+            narration = f"plain {index}"
+        lines.append(f"2024-01-{index % 28 + 1:02d},{narration},{index}.50\n")
+    return "skipped line\n" + HEADER + "".join(lines)
+
+
+def _expected(text):
+    return list(csv.reader(io.StringIO(text.split("\n", 2)[2], newline="")))
+
+
+@pytest.mark.parametrize("chunks", [1, 2, 3, 7, 50, 1000])
+def test_bounds_keep_quoted_newlines_whole(tmp_path, chunks):
+    text = _text(200)
+    path = tmp_path / "statement.csv"
+    path.write_text(text)
+    chunked_file = chunked.ChunkedFile(str(path), skiplines=1)
+    try:
+        assert chunked_file.headers == ["Date", "Narration", "Amount"]
+        bounds = chunked_file.bounds(chunks)
+        assert bounds[0][0] == chunked_file.start and bounds[-1][1] == chunked_file.size
+        assert all(end == start for (_, end), (start, _) in zip(bounds, bounds[1:]))
+        rows = []
+        for start, end in bounds:
+            rows.extend(chunked._parse(chunked_file.mm, start, end, "utf-8", "excel", None, None))
+        assert rows == _expected(text)
+    finally:
+        chunked_file.close()
+
+
+@pytest.mark.skipif(not parallel.can_fork(), reason="needs fork")
+def test_rows_on_worker_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunked, "MIN_BYTES", 0)
+    text = _text(300)
+    path = tmp_path / "statement.csv"
+    path.write_text(text)
+    chunked_file = chunked.ChunkedFile(str(path), skiplines=1)
+    try:
+        assert list(chunked_file.rows(decode=lambda fields: fields[2], jobs=2)) == \
+            [row[2] for row in _expected(text)]
+    finally:
+        chunked_file.close()
+
+
+def test_comment_lines_are_skipped(tmp_path):
+    path = tmp_path / "statement.csv"
+    path.write_text("# exported\n" + HEADER + "2024-01-01,a,1\n# note\n2024-01-02,b,2\n")
+    chunked_file = chunked.ChunkedFile(str(path), comments="#")
+    try:
+        assert chunked_file.headers == ["Date", "Narration", "Amount"]
+        assert list(chunked_file.rows(jobs=1)) == [["2024-01-01", "a", "1"], ["2024-01-02", "b", "2"]]
+    finally:
+        chunked_file.close()
+
+
+@pytest.mark.skipif(not parallel.can_fork(), reason="needs fork")
+def test_crlf_fields_read_as_serial_csvbase(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunked, "MIN_BYTES", 0)
+    rows = ['01-Jan-2024,01-Jan-2024,,"UPI/1\r\nSHOP","250.00","","750.00"',
+            '02-Jan-2024,02-Jan-2024,,UPI/2/SHOP,"","50.00","800.00"',
+            '03-Jan-2024,03-Jan-2024,,"NEFT\r\nline 2","100.00","","700.00"']
+    path = tmp_path / "iob1234.csv"
+    path.write_bytes("\r\n".join(["Txn Date,Value Date,Cheque No,Narration,Debit,Credit,Balance"] + rows + [""])
+                     .encode("utf-8"))
+    # csvbase reads the file in text mode.
+    with open(path, encoding="utf-8") as infile:
+        serial = [row[3] for row in islice(csv.reader(infile), 1, None)]
+    assert serial == ["UPI/1\nSHOP", "UPI/2/SHOP", "NEFT\nline 2"]
+    for jobs in (1, 2):
+        importer = iob.IOBImporter("Assets:IN:IOB:Savings", "1234")
+        importer.read_jobs = jobs
+        assert [row.narration for row in importer.read(str(path))] == serial
@@ -0,0 +1,30 @@
+from beancount.core import data
+from beancount.core.number import D
+from importers.iob import iob
+
+STATEMENT = """Txn Date,Value Date,Cheque No,Narration,Debit,Credit,Balance
+01-Jan-2024,01-Jan-2024,,UPI/1/SHOP,"","1,000.00","1,000.00"
+02-Jan-2024,02-Jan-2024,,UPI/2/SHOP,"250.00","",—
+03-Jan-2024,03-Jan-2024,,UPI/3/SHOP,"100.00","",""
+04-Jan-2024,04-Jan-2024,,UPI/4/SHOP,"","50.00","700.00"
+"""
+
+
+def _extract(tmp_path, text, **kwargs):
+    path = tmp_path / "iob1234.csv"
+    path.write_text(text, encoding="utf-8")
+    return iob.IOBImporter("Assets:IN:IOB:Savings", "1234", **kwargs).extract(str(path), [])
+
+
+def test_decoded_amounts(tmp_path):
+    entries = _extract(tmp_path, STATEMENT)
+    txns = [entry for entry in entries if isinstance(entry, data.Transaction)]
+    assert [txn.postings[0].units.number for txn in txns] == [
+        D("1000.00"), D("-250.00"), D("-100.00"), D("50.00")]
+
+
+def test_bad_or_blank_balances_do_not_fail(tmp_path, capsys):
+    entries = _extract(tmp_path, STATEMENT, balance_every=None)
+    [balance] = [entry for entry in entries if isinstance(entry, data.Balance)]
+    assert balance.amount.number == D("700.00")
+    assert "does not follow" not in capsys.readouterr().err
@@ -0,0 +1,30 @@
+from decimal import Decimal
+from beancount.core.number import D
+from importers.etrade import etrade
+
+
+class Row:
+    def __init__(self, rtype, amount, symbol="ACME"):
+        self.rtype = rtype
+        self.amount = amount
+        self.symbol = symbol
+
+
+def _importer():
+    return etrade.ETradeImporter("USD", "Assets:US:ETrade", "Assets:US:ETrade:Cash",
+                                 "Income:US:ETrade:{}:Dividend", "Income:US:ETrade:{}:PnL",
+                                 "Expenses:Financial:Fees:ETrade",
+                                 "Expenses:US:WithholdingTax:{}", "Income:US:Interest:ETrade")
+
+
+def test_joined_postings_sum_cash():
+    dividend = next(iter(etrade.DIVIDEND_TYPES))
+    postings = _importer()._joined_postings([Row(dividend, D("10.00")), Row("Tax", D("-2.50"))])
+    assert postings[0].units.number == D("7.50")
+    assert sum(posting.units.number for posting in postings[1:]) == D("-7.50")
+
+
+def test_all_zero_group_gives_decimal_zero():
+    dividend = next(iter(etrade.DIVIDEND_TYPES))
+    [cash] = _importer()._joined_postings([Row(dividend, D("0")), Row("Tax", D("0"))])
+    assert isinstance(cash.units.number, Decimal)
@@ -0,0 +1,37 @@
+import datetime
+import os
+from beancount.core import data
+from beancount.core.number import D
+from importers.common import fxrates
+
+RATES = "DATE,PDF FILE,TT BUY,TT SELL\n2024-01-31 09:00,x,82.50,83.50\n2024-02-29 09:00,x,82.80,83.80\n"
+
+
+def _txn(date):
+    return data.Transaction({}, date, "*", None, "Buy", frozenset(), frozenset(), [])
+
+
+def test_rule115_uses_previous_month_end(tmp_path):
+    (tmp_path / "USD.csv").write_text(RATES)
+    rates = fxrates.SBIRates(str(tmp_path / "{}.csv"))
+    assert rates.rate("USD", datetime.date(2024, 3, 15)) == D("82.80")
+    assert rates.rate("USD", datetime.date(2024, 2, 15)) == D("82.50")
+    assert rates.rate("USD", datetime.date(2024, 1, 15)) is None
+
+
+def test_failed_download_skips_stamp(tmp_path, capsys):
+    rates = fxrates.SBIRates("http://127.0.0.1:9/{}.csv", cache_dir=str(tmp_path))
+    txn = _txn(datetime.date(2024, 3, 15))
+    assert rates.stamp(txn, "USD", D("10")) is txn
+    assert "download failed" in capsys.readouterr().err
+
+
+def test_failed_download_uses_stale_cache(tmp_path):
+    cached = tmp_path / "USD.csv"
+    cached.write_text(RATES)
+    old = datetime.datetime(2024, 1, 1).timestamp()
+    os.utime(cached, (old, old))
+    rates = fxrates.SBIRates("http://127.0.0.1:9/{}.csv", cache_dir=str(tmp_path))
+    stamped = rates.stamp(_txn(datetime.date(2024, 3, 15)), "USD", D("-10"))
+    assert stamped.meta["inr_rate"] == D("82.80")
+    assert stamped.meta["inr_value"] == D("828.00")
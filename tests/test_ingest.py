@@ -0,0 +1,41 @@
+import datetime
+import beangulp
+import pytest
+from click.testing import CliRunner
+from beancount.core import data
+from beancount.core.number import D
+from importers.common import columnar, hooks, ingest
+
+
+class Importer(beangulp.Importer):
+    """Extracts one transaction per file, dated by its name."""
+
+    def identify(self, filepath):
+        return filepath.endswith(".txt")
+
+    def account(self, filepath):
+        return "Assets:Bank"
+
+    def extract(self, filepath, existing):
+        postings = [data.Posting("Assets:Bank", data.Amount(D("-5"), "INR"), None, None, None, None),
+                    data.Posting("Expenses:Food", data.Amount(D("5"), "INR"), None, None, None, None)]
+        date = datetime.date(2024, len(filepath) % 12 + 1, 1)
+        return [data.Transaction(data.new_metadata(filepath, 1), date, "*", None, filepath,
+                                 frozenset(), frozenset(), postings)]
+
+
+@pytest.mark.parametrize("mode", [[], ["--stream"]])
+def test_columnar_keeps_the_ledger_output(tmp_path, mode):
+    documents = tmp_path / "docs"
+    documents.mkdir()
+    for name in ("a.txt", "bb.txt"):
+        (documents / name).write_text(name)
+    # Pipeline hands on generators that can be iterated once.
+    app = ingest.Ingest([Importer()], [hooks.Pipeline(lambda entry: entry)])
+    out = tmp_path / "postings"
+    result = CliRunner().invoke(app.cli, ["extract", "--serial", "--columnar", str(out)] + mode
+                                + [str(documents)], obj=app)
+    assert result.exit_code == 0, result.output
+    assert result.output.count("Expenses:Food") == 2
+    assert len(list(out.iterdir())) == (2 if mode else 1)
+    assert list(columnar.read(str(out))["account"]) == ["Assets:Bank", "Expenses:Food"] * 2
@@ -0,0 +1,49 @@
+from beancount.core import data
+from importers.iocbc import iocbc
+
+HEADER = "Generated on 01/04/2024\nDate,Account,Code,Name,Action,Quantity,Price,Nett amount,Contract/Reference\n"
+META = ",CDP,SGX,Equity,,,SGD,,\n"
+
+
+def _importer():
+    return iocbc.IocbcImporter("SGD", "Assets:SG:IOCBC", "Assets:SG:IOCBC:Cash",
+                               "Income:SG:SRS:{}:PnL", "Income:SG:CPFIS:{}:PnL",
+                               "Income:SG:IOCBC:{}:PnL", "Expenses:SG:IOCBC:Fees")
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "iocbc20240401.csv"
+    path.write_text(HEADER + text)
+    return str(path)
+
+
+def test_trade_rows_paired_with_their_metadata(tmp_path, capsys):
+    path = _write(tmp_path,
+                  "01/03/2024,CDP,D05,DBS,Buy,100,35.50,3560.00,C001\n" + META
+                  + "02/03/2024,CDP,O39,OCBC,Dividend,100,0.50,50.00,C002\n" + META
+                  + "03/03/2024,CDP,U11,UOB,Sell,10,28.00,275.00,C003\n" + META)
+    rows = list(_importer().read(path))
+    assert [row.narration for row in rows] == ["C001", "C003"]
+    assert [(row.meta.exchange, row.meta.currency) for row in rows] == [("SGX", "SGD")] * 2
+    out, err = capsys.readouterr()
+    assert out == "" and err == ""
+
+
+def test_missing_and_orphan_metadata_rows_do_not_shift_records(tmp_path, capsys):
+    path = _write(tmp_path,
+                  META
+                  + "01/03/2024,CDP,D05,DBS,Buy,100,35.50,3560.00,C001\n"
+                  + "03/03/2024,CDP,U11,UOB,Buy,10,28.00,285.00,C003\n" + META
+                  + META
+                  + "04/03/2024,CDP,Z74,SINGTEL,Buy,10,2.40,30.00,C004\n")
+    rows = list(_importer().read(path))
+    assert [row.narration for row in rows] == ["C001", "C003", "C004"]
+    assert [row.meta.exchange for row in rows] == ["", "SGX", ""]
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert err.count("Skipped orphan metadata row") == 2
+    assert err.count("Trade row without metadata row") == 2
+
+    entries = _importer().extract(path, [])
+    assert [entry.meta["contract_id"] for entry in entries
+            if isinstance(entry, data.Transaction)] == ["C001", "C003", "C004"]
@@ -0,0 +1,54 @@
+import datetime
+import os
+import stat
+from beancount.core import data
+from beancount.core.number import D
+from importers.common import ledger_files
+
+EXISTING = """2024-01-05 * "First"
+  Assets:Bank  -10.00 INR
+  Expenses:Food
+
+2024-03-01 * "Third"
+  Assets:Bank  -30.00 INR
+  Expenses:Food
+"""
+
+
+def _txn(date, narration, meta=None):
+    postings = [data.Posting("Assets:Bank", data.Amount(D("-20.00"), "INR"), None, None, None, None)]
+    return data.Transaction(meta or {}, date, "*", None, narration, frozenset(), frozenset(),
+                            postings)
+
+
+def test_merge_keeps_date_order_and_mode(tmp_path):
+    path = tmp_path / "2024.beancount"
+    path.write_text(EXISTING)
+    os.chmod(path, 0o644)
+    ledger_files.merge_into_file(str(path), [_txn(datetime.date(2024, 2, 1), "Second"),
+                                             _txn(datetime.date(2024, 3, 1), "Fourth")])
+    text = path.read_text()
+    order = [text.index(name) for name in ("First", "Second", "Third", "Fourth")]
+    assert order == sorted(order)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_tree_writes_year_files_and_includes(tmp_path):
+    main = tmp_path / "main.beancount"
+    main.write_text('option "title" "Test"')
+    os.chmod(main, 0o640)
+    tree = ledger_files.LedgerTree(str(tmp_path / "ledger"), str(main))
+    extracted = [("statement.csv", [_txn(datetime.date(2023, 12, 31), "Old"),
+                                    _txn(datetime.date(2024, 1, 1), "New"),
+                                    _txn(datetime.date(2024, 1, 2), "Dup", {"__duplicate__": True})],
+                  "Assets:Bank", None)]
+    written = tree.write(extracted)
+    assert [(os.path.relpath(path, tmp_path), count) for path, count in written] == [
+        ("ledger/Assets/Bank/2023.beancount", 1), ("ledger/Assets/Bank/2024.beancount", 1)]
+    lines = main.read_text().splitlines()
+    assert lines == ['option "title" "Test"', 'include "ledger/Assets/Bank/2023.beancount"',
+                     'include "ledger/Assets/Bank/2024.beancount"']
+    assert stat.S_IMODE(os.stat(main).st_mode) == 0o640
+    # Includes are only added once.
+    tree.write(extracted)
+    assert main.read_text().splitlines() == lines
@@ -0,0 +1,169 @@
+import datetime
+from beancount import loader
+from beancount.core import data, position
+from beancount.core.number import D, MISSING
+from beancount.parser import parser
+from importers.common import lots
+
+LEDGER = """
+2015-01-01 open Assets:IN:Zerodha
+2015-01-01 open Assets:IN:Zerodha:Cash
+2015-01-01 open Income:IN:Zerodha:PnL
+
+2023-01-10 * "Buy INFY"
+  Assets:IN:Zerodha       10 INFY {1000.00 INR}
+  Assets:IN:Zerodha:Cash
+
+2023-06-10 * "Buy INFY"
+  Assets:IN:Zerodha       10 INFY {1200.00 INR}
+  Assets:IN:Zerodha:Cash
+"""
+
+SELL = """
+2024-03-01 * "Sell INFY"
+  Assets:IN:Zerodha       -{units} INFY {{}} @ 1500.00 INR
+  Assets:IN:Zerodha:Cash   {cash} INR
+  Income:IN:Zerodha:PnL
+"""
+
+
+def _ledger():
+    entries, errors, _ = loader.load_string(LEDGER)
+    assert not errors
+    return entries
+
+
+def _sell(units):
+    entries, errors, _ = parser.parse_string(SELL.format(units=units, cash=units * 1500))
+    assert not errors
+    # As the broker importers write sells.
+    empty = position.Cost(None, None, None, None)
+    return [entry._replace(postings=[
+        posting._replace(cost=empty if posting.cost else None,
+                         units=None if posting.units is MISSING else posting.units)
+        for posting in entry.postings]) for entry in entries if isinstance(entry, data.Transaction)]
+
+
+def _extract(book, entries, ledger):
+    [(_, result, _, _)] = book([("statement.csv", entries, None, None)], ledger)
+    return [entry for entry in result if isinstance(entry, data.Transaction)]
+
+
+def test_holding_periods():
+    assert lots.is_long_term(lots.EQUITY, datetime.date(2023, 1, 10), datetime.date(2024, 3, 1))
+    assert not lots.is_long_term(lots.EQUITY, datetime.date(2023, 6, 10),
+                                 datetime.date(2024, 3, 1))
+    assert lots.holding_months(lots.FOREIGN, datetime.date(2024, 7, 22)) == 36
+    assert lots.holding_months(lots.FOREIGN, datetime.date(2024, 7, 23)) == 24
+
+
+def test_grandfathered_cost():
+    book = lots.LotBook(fmv_2018={"INFY": D("1100")})
+    lot = lots.Lot(datetime.date(2017, 5, 1), D(1), D("900"), "INR")
+    assert book._taxable_cost(lots.EQUITY, "INFY", lot, D("1500")) == D("1100")
+    assert book._taxable_cost(lots.EQUITY, "INFY", lot, D("1000")) == D("1000")
+    assert book._taxable_cost(lots.FOREIGN, "INFY", lot, D("1500")) == D("900")
+
+
+def test_fifo_sell_splits_gains():
+    book = lots.LotBook(asset_classes={"Assets:IN:Zerodha": lots.EQUITY})
+    [sell] = _extract(book, _sell(15), _ledger())
+    sold = [posting for posting in sell.postings if posting.account == "Assets:IN:Zerodha"]
+    assert [(posting.units.number, posting.cost.number) for posting in sold] == [
+        (D(-10), D("1000.00")), (D(-5), D("1200.00"))]
+    assert sell.meta["ltcg"] == D("5000.00")
+    assert sell.meta["stcg"] == D("1500.00")
+    gains = [posting for posting in sell.postings if posting.account.startswith("Income")]
+    assert gains[0].units.number == D("-6500.00")
+
+
+def test_extract_again_gives_the_same_result(tmp_path):
+    path = str(tmp_path / "lots.pickle")
+    ledger = _ledger()
+    first = _extract(lots.LotBook(path), _sell(5), ledger)
+    second = _extract(lots.LotBook(path), _sell(5), ledger)
+    assert first == second
+    assert "ltcg" in second[0].meta
+
+
+def test_partially_matched_sell_is_not_resolved():
+    book = lots.LotBook()
+    [sell] = _extract(book, _sell(25), _ledger())
+    assert "ltcg" not in sell.meta
+    assert any(posting.units is None for posting in sell.postings)
+
+
+def test_identical_trades_have_distinct_keys():
+    ledger = _ledger()
+    buys = [entry for entry in ledger if isinstance(entry, data.Transaction)]
+    twice = [buys[0], buys[0]]
+    keys = lots.trade_keys(twice)
+    assert keys[0] != keys[1]
+
+
+def test_ledger_trades_added_later_update_the_cache(tmp_path):
+    path = str(tmp_path / "lots.pickle")
+    ledger = _ledger()
+    book = lots.LotBook(path)
+    book.sync(ledger[:-1])
+    assert sum(lot.units for lot in book.books["Assets:IN:Zerodha"]) == 10
+    book = lots.LotBook(path)
+    book.sync(ledger)
+    assert sum(lot.units for lot in book.books["Assets:IN:Zerodha"]) == 20
+    # A trade removed from the ledger rebuilds the book.
+    book = lots.LotBook(path)
+    book.sync(ledger[:-2])
+    assert not book.books["Assets:IN:Zerodha"]
+
+
+FOREIGN_LEDGER = """
+2015-01-01 open Assets:US:ETrade
+2015-01-01 open Assets:US:ETrade:Cash
+2015-01-01 open Income:US:ETrade:PnL
+
+2023-01-10 * "Buy ACME"
+  Assets:US:ETrade       10 ACME {100.00 USD}
+  Assets:US:ETrade:Cash
+"""
+
+FOREIGN_SELL = """
+2024-03-01 * "Sell ACME"
+  Assets:US:ETrade       -10 ACME {} @ 150.00 USD
+  Assets:US:ETrade:Cash   1500.00 USD
+  Income:US:ETrade:PnL
+"""
+
+
+class Rates:
+    base_currency = "INR"
+
+    def rate(self, currency, date):
+        return D(80) if date.year == 2023 else D(83)
+
+
+def _foreign(book):
+    ledger, errors, _ = loader.load_string(FOREIGN_LEDGER)
+    assert not errors
+    entries, errors, _ = parser.parse_string(FOREIGN_SELL)
+    empty = position.Cost(None, None, None, None)
+    sells = [entry._replace(postings=[
+        posting._replace(cost=empty if posting.cost else None,
+                         units=None if posting.units is MISSING else posting.units)
+        for posting in entry.postings]) for entry in entries]
+    [sell] = _extract(book, sells, ledger)
+    return sell
+
+
+def test_foreign_gains_converted_to_inr():
+    sell = _foreign(lots.LotBook(rates=Rates()))
+    # Held under 24 months, short term.
+    assert sell.meta["stcg"] == D("44500.00") and sell.meta["ltcg"] == 0
+    # The gains posting stays in the currency of the lots.
+    gains = [posting for posting in sell.postings if posting.account.startswith("Income")]
+    assert gains[0].units == data.Amount(D("-500.00"), "USD")
+
+
+def test_foreign_gains_left_out_without_rates(capsys):
+    sell = _foreign(lots.LotBook())
+    assert "ltcg" not in sell.meta and "stcg" not in sell.meta
+    assert "No INR rate" in capsys.readouterr().err
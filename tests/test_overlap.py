@@ -0,0 +1,75 @@
+import datetime
+from beancount.core import data
+from beancount.core.number import D
+from beancount.parser import parser, printer
+from importers.common import overlap
+from importers.iob import iob
+
+HEADER = "Txn Date,Value Date,Cheque No,Narration,Debit,Credit,Balance\n"
+ROWS = ['01-Jan-2024,01-Jan-2024,,UPI/1/SHOP,"","1,000.00","1,000.00"\n',
+        '02-Jan-2024,02-Jan-2024,,UPI/2/SHOP,"250.00","","750.00"\n',
+        '03-Jan-2024,03-Jan-2024,,UPI/3/SHOP,"100.00","","650.00"\n',
+        '04-Jan-2024,04-Jan-2024,,UPI/4/SHOP,"","50.00","700.00"\n']
+
+
+def _keys(*amounts):
+    """(date, amount, balance) keys of rows with a running balance."""
+    keys, balance = [], D("0")
+    for day, amount in enumerate(amounts):
+        balance += D(amount)
+        keys.append((datetime.date(2024, 1, 1) + datetime.timedelta(days=day), D(amount), balance))
+    return keys
+
+
+def test_prefix_function():
+    assert overlap.prefix_function(list("abacabab")) == [0, 0, 1, 0, 1, 2, 3, 2]
+
+
+def test_join_point():
+    assert overlap.join_point([1, 2, 3], [1, 2, 3, 4, 5]) == 3
+    # Tail repeated in the rows, the last occurrence counts.
+    assert overlap.join_point([1, 2], [1, 2, 1, 2, 7]) == 4
+    # Rows start inside the tail.
+    assert overlap.join_point([1, 2, 3, 4], [3, 4, 5]) == 2
+    assert overlap.join_point([1, 2, 3], [7, 8]) == 0
+    assert overlap.join_point([], [1]) == 0
+
+
+def _ledger(*keys):
+    """Transactions of Assets:Bank as imported with their balances."""
+    return [data.Transaction({overlap.BALANCE_KEY: balance}, date, "*", None, "", set(), set(),
+                             [data.Posting("Assets:Bank", data.Amount(amount, "INR"), None, None, None, None)])
+            for date, amount, balance in keys]
+
+
+def test_trim_against_the_ledger():
+    tails = overlap.StatementTails()
+    rows = _keys("10", "-3", "5", "7", "-2")
+    assert tails.trim("Assets:Bank", rows[1:], []) == 0
+    assert tails.trim("Assets:Bank", rows[1:], _ledger(*rows[:3])) == 2
+    # An unrelated account has no tail.
+    assert tails.trim("Assets:Other", rows[1:], _ledger(*rows[:3])) == 0
+    # An older statement is matched against the rows of its period.
+    assert tails.trim("Assets:Bank", rows[:2], _ledger(*rows)) == 2
+
+
+def _extract(tmp_path, rows, existing):
+    path = tmp_path / "iob1234.csv"
+    path.write_text(HEADER + "".join(rows), encoding="utf-8")
+    importer = iob.IOBImporter("Assets:Bank", "1234", balance_every=None)
+    importer.overlap = overlap.StatementTails()
+    return [entry for entry in importer.extract(str(path), existing) if isinstance(entry, data.Transaction)]
+
+
+def test_extract_drops_only_rows_in_the_ledger(tmp_path):
+    first = _extract(tmp_path, ROWS[:3], [])
+    # The entries as they are after being appended to the ledger.
+    ledger, errors, _ = parser.parse_string("".join(map(printer.format_entry, first)))
+    assert not errors
+    assert [txn.meta[overlap.BALANCE_KEY] for txn in ledger] == [D("1000.00"), D("750.00"), D("650.00")]
+
+    # A previewed statement does not hide its rows from the next one.
+    _extract(tmp_path, ROWS[:3], ledger[:1])
+    assert [txn.narration for txn in _extract(tmp_path, ROWS[1:], ledger[:1])] == [
+        "UPI/2/SHOP", "UPI/3/SHOP", "UPI/4/SHOP"]
+    assert [txn.narration for txn in _extract(tmp_path, ROWS[1:], ledger)] == ["UPI/4/SHOP"]
@@ -0,0 +1,36 @@
+import datetime
+import beangulp
+import pytest
+from beancount.core import data
+from importers.common import parallel
+
+pytestmark = pytest.mark.skipif(not parallel.can_fork(), reason="needs fork")
+
+
+class Importer(beangulp.Importer):
+    """Extracts one note per file, recording read_jobs in the worker."""
+    read_jobs = None
+
+    def identify(self, filepath):
+        return filepath.endswith(".txt")
+
+    def account(self, filepath):
+        return "Assets:Bank"
+
+    def extract(self, filepath, existing):
+        meta = data.new_metadata(filepath, 1)
+        return [data.Note(meta, datetime.date(2024, 1, 1), "Assets:Bank",
+                          f"{filepath} read_jobs={self.read_jobs}", None, None)]
+
+
+def test_extract_all_in_document_order_without_nested_pools(tmp_path):
+    importer = Importer()
+    documents = [(str(tmp_path / f"{index}.txt"), importer) for index in range(6)]
+    results = list(parallel.extract_all([importer], documents, [], 3))
+    assert [filename for filename, *_ in results] == [filename for filename, _ in documents]
+    for filename, entries, account, _, error in results:
+        assert error is None
+        assert account == "Assets:Bank"
+        assert entries[0].comment == f"{filename} read_jobs=1"
+    # The parent's importer is untouched.
+    assert importer.read_jobs is None
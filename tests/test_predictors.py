@@ -0,0 +1,65 @@
+import concurrent.futures
+from beancount.parser import parser
+from importers.common import predictors
+
+OPEN = """2024-01-01 open Assets:Bank
+2024-01-01 open Expenses:Food
+"""
+
+
+def _entries(payees):
+    text = OPEN + "".join(f"""2024-02-{day + 1:02d} * "{payee}" "upi {payee} {day}"
+  Assets:Bank  -10 INR
+  Expenses:Food
+""" for day, payee in enumerate(payees))
+    entries, errors, _ = parser.parse_string(text)
+    assert not errors
+    return entries
+
+
+def _train(tmp_path, payees, rebuild_after=None):
+    predictor = predictors.IncrementalPayees(str(tmp_path / "models"), rebuild_after=rebuild_after)
+    predictor.account = "Assets:Bank"
+    predictor.load_training_data(_entries(payees))
+    predictor.define_pipeline()
+    predictor.train_pipeline()
+    return predictor
+
+
+def test_new_transactions_are_fitted_incrementally(tmp_path):
+    payees = ["Shop", "Cafe", "Shop", "Cafe"]
+    first = _train(tmp_path, payees)
+    assert first.state["updates"] == 0 and first.is_fitted
+    updated = _train(tmp_path, payees + ["Shop"])
+    assert updated.state["updates"] == 1
+    assert len(updated.state["keys"]) == 5
+    # Nothing new, the saved model is used as it is.
+    assert _train(tmp_path, payees + ["Shop"]).state["updates"] == 1
+
+
+def test_rebuilt_on_new_class_removal_or_after_updates(tmp_path):
+    payees = ["Shop", "Cafe", "Shop", "Cafe"]
+    _train(tmp_path, payees)
+    assert _train(tmp_path, payees + ["Shop"]).state["updates"] == 1
+    # A payee never seen before.
+    assert _train(tmp_path, payees + ["Shop", "Bakery"]).state["updates"] == 0
+    assert _train(tmp_path, payees + ["Shop", "Bakery", "Cafe"]).state["updates"] == 1
+    # A transaction removed, partial_fit cannot unlearn it.
+    assert _train(tmp_path, payees[1:] + ["Shop", "Bakery", "Cafe"]).state["updates"] == 0
+    # After rebuild_after updates.
+    assert _train(tmp_path, payees[1:] + ["Shop", "Bakery", "Cafe", "Shop"],
+                  rebuild_after=1).state["updates"] == 1
+    assert _train(tmp_path, payees[1:] + ["Shop", "Bakery", "Cafe", "Shop", "Cafe"],
+                  rebuild_after=1).state["updates"] == 0
+
+
+def test_failed_training_reported_on_stderr(tmp_path, capsys):
+    predictor = predictors.IncrementalPayees(str(tmp_path / "models"))
+    predictor.account = "Assets:Bank"
+    future = concurrent.futures.Future()
+    future.set_result("Traceback: boom")
+    predictor.submitted(future)
+    predictor.wait()
+    out, err = capsys.readouterr()
+    assert out == "" and "training failed" in err and "boom" in err
+    assert predictor.pending is None and predictor.state is None
@@ -0,0 +1,64 @@
+from beancount.core import data
+from beancount.parser import parser, printer
+from importers.aniruth.purse import AniruthPurseImporter
+
+HEADER = "Date,Description,(Income) / Expense\n"
+ROWS = ["2024-01-01,Milk,40\n",
+        "2024-01-02,Skipped,\n",
+        "2024-01-03,Bread,30\n"]
+
+
+def _importer():
+    return AniruthPurseImporter("Assets:Cash:Purse")
+
+
+def _extract(importer, path, existing=()):
+    return [entry for entry in importer.extract(str(path), list(existing))
+            if isinstance(entry, data.Transaction)]
+
+
+def _ledger(entries):
+    """The entries as they are after being appended to the ledger."""
+    loaded, errors, _ = parser.parse_string("".join(map(printer.format_entry, entries)))
+    assert not errors
+    return loaded
+
+
+def test_only_rows_after_the_ledger_with_line_numbers(tmp_path, capsys):
+    path = tmp_path / "purse.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    importer = _importer()
+    ledger = _ledger(_extract(importer, path))
+
+    with open(path, "a") as outfile:
+        outfile.write("2024-01-04,Eggs,60\n")
+    new = _extract(importer, path, ledger)
+    assert [txn.narration for txn in new] == ["Eggs"]
+    # Same line number as a full read, the skipped row does not count.
+    full = _extract(AniruthPurseImporter("Assets:Cash:Purse", incremental=False), path)
+    assert new[0].meta["lineno"] == full[-1].meta["lineno"]
+    assert new[0].meta["purse_row"] == full[-1].meta["purse_row"]
+    assert "Skipping" in capsys.readouterr().out
+
+
+def test_discarded_extract_loses_nothing(tmp_path):
+    path = tmp_path / "purse.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    importer = _importer()
+    ledger = _ledger(_extract(importer, path))
+    with open(path, "a") as outfile:
+        outfile.write("2024-01-04,Eggs,60\n")
+    # A preview, never appended to the ledger.
+    _extract(importer, path, ledger)
+    with open(path, "a") as outfile:
+        outfile.write("2024-01-05,Tea,20\n")
+    assert [txn.narration for txn in _extract(importer, path, ledger)] == ["Eggs", "Tea"]
+
+
+def test_edited_last_row_reads_everything(tmp_path):
+    path = tmp_path / "purse.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    importer = _importer()
+    ledger = _ledger(_extract(importer, path))
+    path.write_text(HEADER + "".join(ROWS[:2]) + "2024-01-03,Butter,30\n2024-01-04,Eggs,60\n")
+    assert [txn.narration for txn in _extract(importer, path, ledger)] == ["Milk", "Butter", "Eggs"]
@@ -0,0 +1,48 @@
+from beancount import loader
+from beancount.parser import printer
+from beancount.core.number import D
+from importers.rksv import rksv
+
+TRADEBOOK = """trade_date,tradingsymbol,trade_type,order_id,quantity,price,amount,fees
+2024-03-01,INFY,buy,1001,1,1500.10,1500.10,0.50
+2024-03-01,TCS,buy,1002,1,3500.00,3500.00,0.50
+2024-03-01,INFY,buy,1001,2,1500.25,3000.50,0.60
+"""
+
+
+def test_interleaved_fills_of_an_order_are_aggregated(tmp_path):
+    path = tmp_path / "rksv20240301.csv"
+    path.write_text(TRADEBOOK)
+    importer = rksv.RKSVImporter("INR", "Assets:IN:RKSV", "Assets:IN:RKSV:Cash",
+                                 "Income:IN:RKSV:{}:Dividend", "Income:IN:RKSV:{}:PnL",
+                                 "Expenses:Financial:Fees:RKSV", "Assets:IN:Bank",
+                                 aggregate_orders=True)
+    entries = importer.extract(str(path), [])
+    assert [entry.meta["order_id"] for entry in entries] == ["1001", "1002"]
+    infy = entries[0].postings[0]
+    assert infy.units.number == D(3)
+    assert infy.cost.number == D("1500.20")
+    assert entries[0].postings[1].units.number == D("1.10")
+
+
+def test_uneven_fills_book_the_tradebook_amount(tmp_path):
+    path = tmp_path / "rksv20240301.csv"
+    path.write_text("trade_date,tradingsymbol,trade_type,order_id,quantity,price,amount,fees\n"
+                    "2024-03-01,ACME,buy,2001,1,100.01,100.01,0.50\n"
+                    "2024-03-01,ACME,buy,2001,2,100.02,200.04,0.60\n")
+    importer = rksv.RKSVImporter("INR", "Assets:IN:RKSV", "Assets:IN:RKSV:Cash",
+                                 "Income:IN:RKSV:{}:Dividend", "Income:IN:RKSV:{}:PnL",
+                                 "Expenses:Financial:Fees:RKSV", "Assets:IN:Bank",
+                                 aggregate_orders=True)
+    [entry] = importer.extract(str(path), [])
+    cash = entry.postings[2]
+    assert cash.account == "Assets:IN:RKSV:Cash"
+    assert cash.units.number == D("-301.15")
+    # The cost adds up to the 300.05 paid, not 3 x 100.02.
+    stock = entry.postings[0]
+    assert abs(stock.units.number * stock.cost.number - D("300.05")) < D("0.000001")
+    text = printer.format_entry(entry)
+    ledger = ("2024-01-01 open Assets:IN:RKSV:ACME\n2024-01-01 open Assets:IN:RKSV:Cash\n"
+              "2024-01-01 open Expenses:Financial:Fees:RKSV\n" + text)
+    _, errors, _ = loader.load_string(ledger)
+    assert not errors
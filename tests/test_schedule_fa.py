@@ -0,0 +1,55 @@
+import datetime
+import io
+from beancount import loader
+from importers.common import schedule_fa
+
+LEDGER = """
+2023-01-01 open Assets:US:ETrade
+2023-01-01 open Assets:US:ETrade:Cash
+2024-06-03 price ACME 12.00 USD
+2024-02-01 * "Buy"
+  Assets:US:ETrade       10 ACME {10.00 USD}
+  Assets:US:ETrade:Cash
+"""
+
+
+class Rates:
+    """USD rates published from 1 March only."""
+    base_currency = "INR"
+
+    def rate(self, currency, date):
+        return 80 if date >= datetime.date(2024, 3, 1) else None
+
+
+class NoRates:
+    base_currency = "INR"
+
+    def rate(self, currency, date):
+        return None
+
+
+def _entries():
+    entries, errors, _ = loader.load_string(LEDGER)
+    assert not errors
+    return entries
+
+
+def test_missing_early_prices_and_rates_are_backfilled(capsys):
+    holdings = schedule_fa.schedule_fa(_entries(), Rates(), 2024, ["Assets:US:ETrade"])
+    [holding] = holdings
+    # Bought at 10, the price directive applies from June only.
+    assert holding.opening == 10 * 10 * 80
+    assert holding.peak == 10 * 12 * 80
+    assert holding.peak_date == datetime.date(2024, 6, 3)
+    assert holding.closing == 10 * 12 * 80
+    assert "No USD rate before 2024-03-01" in capsys.readouterr().err
+    output = io.StringIO()
+    schedule_fa.write_csv(holdings, output)
+    assert output.getvalue().splitlines()[1].startswith("Assets:US:ETrade,ACME,USD,8000,9600")
+
+
+def test_values_without_rates_are_left_empty():
+    holdings = schedule_fa.schedule_fa(_entries(), NoRates(), 2024, ["Assets:US:ETrade"])
+    output = io.StringIO()
+    schedule_fa.write_csv(holdings, output)
+    assert output.getvalue().splitlines()[1].startswith("Assets:US:ETrade,ACME,USD,,,")
@@ -0,0 +1,59 @@
+import datetime
+from beancount.core import data
+from beancount.core.number import D
+from importers.common import trade_ids
+
+
+def _txn(account, **meta):
+    postings = [data.Posting(account, data.Amount(D("1"), "INFY"), None, None, None, None),
+                data.Posting("Expenses:Brokerage", data.Amount(D("10"), "INR"), None, None, None, None)]
+    return data.Transaction(dict(meta), datetime.date(2024, 1, 1), "*", None, "", frozenset(),
+                            frozenset(), postings)
+
+
+class Index(trade_ids.TradeIdIndex):
+    """Index over given ledger entries, without a ledger file."""
+
+    def __init__(self, entries):
+        self._ids = {}
+        for entry in entries:
+            self._add(self._ids, entry)
+
+
+def _duplicates(index, entries, account):
+    index.mark_duplicates(entries, account)
+    return [trade_ids.DUPLICATE in entry.meta for entry in entries]
+
+
+def test_entry_ids():
+    fill = _txn("Assets:Zerodha:INFY", trade_id="T1", order_id="O1")
+    order = _txn("Assets:Zerodha:INFY", order_id="O1", contract_id="C1", trade_ids="T1, T2")
+    assert trade_ids.entry_ids(fill) == ["trade_id:T1"]
+    assert trade_ids.entry_ids(order) == ["trade_id:T1", "trade_id:T2"]
+    assert trade_ids.entry_id(_txn("Assets:Rksv:INFY", order_id="O1", contract_id="C1")) == "order_id:O1"
+    assert trade_ids.entry_id(_txn("Assets:Rksv:INFY")) is None
+
+
+def test_fill_and_order_match_both_ways():
+    fill = _txn("Assets:Zerodha:INFY", trade_id="T2", order_id="O1")
+    order = _txn("Assets:Zerodha:INFY", order_id="O1", contract_id="C1", trade_ids="T1,T2")
+    assert _duplicates(Index([fill]), [order], "Assets:Zerodha") == [True]
+    order = _txn("Assets:Zerodha:INFY", order_id="O1", contract_id="C1", trade_ids="T1,T2")
+    fill = _txn("Assets:Zerodha:INFY", trade_id="T2", order_id="O1")
+    assert _duplicates(Index([order]), [fill], "Assets:Zerodha") == [True]
+
+
+def test_ids_of_other_brokers_do_not_match():
+    index = Index([_txn("Assets:Rksv:INFY", order_id="O1")])
+    assert _duplicates(index, [_txn("Assets:Zerodha:INFY", trade_id="T1", order_id="O1")],
+                       "Assets:Zerodha") == [False]
+    assert _duplicates(index, [_txn("Assets:Rksv:INFY", order_id="O1")], "Assets:Rksv") == [True]
+
+
+def test_fills_of_one_order_are_not_duplicates_of_each_other():
+    index = Index([])
+    fills = [_txn("Assets:Zerodha:INFY", trade_id=trade_id, order_id="O1") for trade_id in ("T1", "T2")]
+    assert _duplicates(index, fills, "Assets:Zerodha") == [False, False]
+    # A later document of the same run sees them.
+    again = [_txn("Assets:Zerodha:INFY", trade_id="T2", order_id="O1")]
+    assert _duplicates(index, again, "Assets:Zerodha") == [True]
@@ -0,0 +1,137 @@
+import datetime
+from beancount.core.number import D
+from importers.zerodha import charges, zerodha, zerodha_xml_importer
+
+DAY = datetime.date(2024, 11, 5)
+
+# A delivery buy of INFY and an intraday round trip of TCS in two
+# fills, with the subtotals the schedule of November 2024 gives.
+NOTE = """<contract_note>
+  <contracts>
+    <contract>
+      <id>CNT-24/25-1234</id>
+      <timestamp>2024-11-05</timestamp>
+      <trades>
+        <trade instrument_id="NSE:INFY - EQ">
+          <id>101</id><order_id>1</order_id><exchange>NSE</exchange><type>B</type>
+          <quantity>10</quantity><average_price>1800.00</average_price>
+        </trade>
+        <trade instrument_id="NSE:TCS - EQ">
+          <id>102</id><order_id>2</order_id><exchange>NSE</exchange><type>B</type>
+          <quantity>5</quantity><average_price>4000.00</average_price>
+        </trade>
+        <trade instrument_id="NSE:TCS - EQ">
+          <id>103</id><order_id>3</order_id><exchange>NSE</exchange><type>S</type>
+          <quantity>2</quantity><average_price>4010.00</average_price>
+        </trade>
+        <trade instrument_id="NSE:TCS - EQ">
+          <id>104</id><order_id>3</order_id><exchange>NSE</exchange><type>S</type>
+          <quantity>3</quantity><average_price>4010.00</average_price>
+        </trade>
+      </trades>
+      <subtotals>
+        <charges>
+          <charge><name>PAY IN / PAY OUT OBLIGATION</name><value>-18000.00</value></charge>
+          <charge><name>Brokerage</name><value>-12.02</value></charge>
+          <charge><name>Exchange transaction charges</name><value>-1.72</value></charge>
+          <charge><name>Securities transaction tax</name><value>-{stt}</value></charge>
+          <charge><name>SEBI turnover fees</name><value>-0.06</value></charge>
+          <charge><name>Stamp duty</name><value>-3.30</value></charge>
+          <charge><name>Integrated GST</name><value>-2.48</value></charge>
+        </charges>
+      </subtotals>
+    </contract>
+  </contracts>
+</contract_note>
+"""
+
+
+def _fill(order_id, symbol, side, quantity, price, date=DAY, segment="EQ"):
+    return charges.Fill(date, order_id, symbol, "NSE", segment, side, D(quantity), D(price))
+
+
+def test_order_charges_delivery_and_intraday():
+    result = charges.order_charges([
+        _fill("1", "INFY", "buy", "10", "1800"),
+        _fill("2", "TCS", "buy", "5", "4000"),
+        _fill("3", "TCS", "sell", "2", "4010"),
+        _fill("3", "TCS", "sell", "3", "4010"),
+    ])
+    assert dict(result[(DAY, "1", "buy")]) == {
+        charges.STT: D("18.00"), charges.EXCHANGE: D("0.53"), charges.SEBI: D("0.02"),
+        charges.STAMP: D("2.70"), charges.GST: D("0.10")}
+    # Intraday: brokerage at 0.03%, STT on the sell only, no DP charge.
+    assert dict(result[(DAY, "3", "sell")]) == {
+        charges.BROKERAGE: D("6.02"), charges.STT: D("5.01"), charges.EXCHANGE: D("0.60"),
+        charges.SEBI: D("0.02"), charges.GST: D("1.19")}
+
+
+def test_dp_charge_once_per_scrip_and_day():
+    result = charges.order_charges([_fill("1", "INFY", "sell", "1", "1800"),
+                                    _fill("2", "INFY", "sell", "1", "1800")])
+    assert [order.get(charges.DP) for order in result.values()] == [D("13.50"), None]
+    assert charges.order_charges([_fill("1", "INFY", "buy", "1", "1800",
+                                        datetime.date(2019, 1, 1))]) == {}
+
+
+def test_shares_ending_in_ce_or_pe_are_delivery():
+    # RELIANCE and BAJFINANCE end in "CE", they are shares all the same.
+    for segment in ("EQ", None):
+        result = charges.order_charges([
+            _fill("1", "RELIANCE", "buy", "10", "1300", segment=segment),
+            _fill("2", "RELIANCE", "sell", "10", "1320", DAY + datetime.timedelta(days=1), segment)])
+        assert dict(result[(DAY, "1", "buy")]) == {
+            charges.STT: D("13.00"), charges.EXCHANGE: D("0.39"), charges.SEBI: D("0.01"),
+            charges.STAMP: D("1.95"), charges.GST: D("0.07")}
+        sell = result[(DAY + datetime.timedelta(days=1), "2", "sell")]
+        assert charges.BROKERAGE not in sell and sell[charges.STT] == D("13.20")
+        assert sell[charges.DP] == D("13.50")
+    assert not charges.is_derivative("BAJFINANCE", "NSE")
+    assert charges.is_derivative("NIFTY24NOVFUT", "NSE")
+    assert charges.is_derivative("RELIANCE24NOV1300CE", "NSE")
+    assert charges.is_derivative("NIFTY", "NSE", "FO")
+    assert charges.is_derivative("NIFTY", "NFO")
+
+
+def test_allocate_adds_up():
+    parts = charges.allocate({charges.BROKERAGE: D("0.10")}, [D("1"), D("1"), D("1")])
+    assert [part[charges.BROKERAGE] for part in parts] == [D("0.03"), D("0.03"), D("0.04")]
+
+
+def test_check_contract_note(tmp_path):
+    path = tmp_path / "contract_note.xml"
+    path.write_text(NOTE.format(stt="23.01"))
+    assert charges.check_contract_note(str(path)) == []
+    # A stale STT rate shows on its subtotal.
+    path.write_text(NOTE.format(stt="20.50"))
+    assert charges.check_contract_note(str(path)) == [
+        ("CNT-24/25-1234", "STT", D("20.50"), D("23.01"))]
+
+
+def test_tradebook_charges_per_trade(tmp_path):
+    path = tmp_path / "zerodha20241105.csv"
+    path.write_text(
+        "symbol,isin,trade_date,exchange,segment,series,trade_type,auction,quantity,price,"
+        "trade_id,order_id,order_execution_time\n"
+        "TCS,INE467B01029,2024-11-05,NSE,EQ,EQ,buy,false,5,4000.00,102,2,2024-11-05T09:20:00\n"
+        "TCS,INE467B01029,2024-11-05,NSE,EQ,EQ,sell,false,2,4010.00,103,3,2024-11-05T14:20:00\n"
+        "TCS,INE467B01029,2024-11-05,NSE,EQ,EQ,sell,false,3,4010.00,104,3,2024-11-05T14:20:00\n")
+    importer = zerodha.ZerodhaImporter("INR", "Assets:Zerodha", "Assets:Zerodha:Cash",
+                                       "Income:Zerodha:{}:Dividend", "Income:Zerodha:{}:PnL",
+                                       "Expenses:Zerodha:Fees", "Assets:Bank")
+    entries = importer.extract(str(path), [])
+    fees = [sum(posting.units.number for posting in entry.postings
+                if posting.account.startswith("Expenses:Zerodha:Fees")) for entry in entries]
+    # The charges of order 3 are split 2:3 over its trades.
+    assert fees[1] + fees[2] == D("6.02") + D("5.01") + D("0.60") + D("0.02") + D("1.19")
+    assert fees[1] < fees[2]
+
+
+def test_contract_note_segment_metadata(tmp_path):
+    path = tmp_path / "contract_note.xml"
+    path.write_text(NOTE.format(stt="23.01").replace(
+        'instrument_id="NSE:INFY - EQ"', 'instrument_id="NFO:NIFTY24NOVFUT"'))
+    importer = zerodha_xml_importer.ZerodhaXMLImporter(
+        "INR", "Assets:Zerodha", "Assets:Zerodha:Cash", "Income:Zerodha:PnL", "Expenses:Zerodha:Fees")
+    entries = importer.extract(str(path), [])
+    assert [entry.meta["segment"] for entry in entries] == ["FO", "EQ", "EQ"]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Throughput of the importers on synthetic files.
+
+Writes the same number of synthetic rows in the Zerodha and RKSV
+tradebook formats and times extract() of each importer. A synthetic IOB
+statement is extracted with IOBImporter and with the same columns on
+the plain csvbase path it replaced, checking that the output matches,
+and once more read in chunks on one process per CPU.
+
+Usage, from the repository root:
+  python tools/bench_importers.py [rows]
+"""
+__copyright__ = "Copyright (C) 2025  Prabu Anand K"
+__license__ = "GNU GPLv3"
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from importers.zerodha import zerodha
+from importers.rksv import rksv
+from importers.iob import iob
+from importers.common import chunked
+from beangulp.importers.csvbase import Importer
+
+SYMBOLS = ["INFY", "TCS", "HDFCBANK", "ITC", "SBIN"]
+
+
+def write_zerodha(filepath, rows):
+    with open(filepath, "w") as outfile:
+        outfile.write("symbol,isin,trade_date,exchange,segment,series,trade_type,auction,"
+                      "quantity,price,trade_id,order_id,order_execution_time\n")
+        for i in range(rows):
+            # In date order, as the tradebook is.
+            day = i * 336 // rows
+            outfile.write(f"{SYMBOLS[i % 5]},INE000000000,2024-{day // 28 + 1:02d}-{day % 28 + 1:02d},"
+                          f"NSE,EQ,EQ,{'buy' if i // 3 % 2 else 'sell'},false,{i % 50 + 1},"
+                          f"{1000 + i % 100}.50,{i},{i // 3},2024-01-01T09:15:00\n")
+
+
+def write_rksv(filepath, rows):
+    with open(filepath, "w") as outfile:
+        outfile.write("trade_date,tradingsymbol,trade_type,quantity,price,amount,fees,order_id\n")
+        for i in range(rows):
+            quantity = i % 50 + 1
+            price = 1000 + i % 100
+            outfile.write(f"2024-{i // 3 % 12 + 1:02d}-{i // 3 % 28 + 1:02d},{SYMBOLS[i % 5]},"
+                          f"{'buy' if i // 3 % 2 else 'sell'},{quantity},{price}.50,"
+                          f"{quantity * price}.50,1.25,{i // 3}\n")
+
+
+def write_iob(filepath, rows):
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    with open(filepath, "w") as outfile:
+        outfile.write("Txn Date,Value Date,Cheque No,Narration,Debit,Credit,Balance\n")
+        balance = 0
+        for i in range(rows):
+            date = f"{i // 300 % 28 + 1:02d}-{months[i // 9000 % 12]}-2024"
+            if i % 3:
+                debit, credit = "1,250.00", ""
+                balance -= 125000
+            else:
+                debit, credit = "", "10,000.50"
+                balance += 1000050
+            outfile.write(f"{date},{date},,UPI/{i}/PAYEE {i % 97},\"{debit}\",\"{credit}\","
+                          f"\"{balance // 100:,}.{balance % 100:02d}\"\n")
+
+
+class CsvbaseIOBImporter(Importer):
+    """IOBImporter columns on the plain csvbase path, as before CompiledImporter."""
+    date = iob.IOBImporter.columns["date"]
+    narration = iob.IOBImporter.columns["narration"]
+    withdrawal = iob.IOBImporter.columns["withdrawal"]
+    deposit = iob.IOBImporter.columns["deposit"]
+    balance = iob.IOBImporter.columns["balance"]
+
+    def identify(self, filepath):
+        return True
+
+    def read(self, filepath):
+        for row in super().read(filepath):
+            if len(row) < 7 or not row[1]:
+                continue
+            if row.withdrawal != 0:
+                row.amount = -row.withdrawal
+            elif row.deposit != 0:
+                row.amount = row.deposit
+            else:
+                row.amount = 0
+            yield row
+
+
+def bench_read(name, importer, filepath, rows):
+    """Time reading and decoding the fields extract() uses, without building entries."""
+    start = time.perf_counter()
+    for row in importer.read(filepath):
+        row.date, row.narration, row.amount
+    elapsed = time.perf_counter() - start
+    print(f"{name:24s} {'':16s} {elapsed:7.2f}s {rows / elapsed:10.0f} rows/s")
+
+
+def bench(name, importer, filepath, rows):
+    start = time.perf_counter()
+    entries = importer.extract(filepath, [])
+    elapsed = time.perf_counter() - start
+    print(f"{name:24s} {len(entries):8d} entries {elapsed:7.2f}s {rows / elapsed:10.0f} rows/s")
+    return entries
+
+
+def main(rows):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        zerodha_file = os.path.join(tmpdir, "zerodha20242025.csv")
+        rksv_file = os.path.join(tmpdir, "rksv20242025.csv")
+        write_zerodha(zerodha_file, rows)
+        write_rksv(rksv_file, rows)
+        accounts = ("Assets:IN:Broker", "Assets:IN:Broker:Cash", "Income:IN:Broker:{}:Dividend",
+                    "Income:IN:Broker:{}:PnL", "Expenses:Financial:Fees:Broker", "Assets:IN:Bank")
+        bench("zerodha tradebook", zerodha.ZerodhaImporter("INR", *accounts), zerodha_file, rows)
+        bench("rksv", rksv.RKSVImporter("INR", *accounts), rksv_file, rows)
+        bench("rksv aggregate_orders", rksv.RKSVImporter("INR", *accounts, aggregate_orders=True),
+              rksv_file, rows)
+
+        iob_file = os.path.join(tmpdir, "iob1234.csv")
+        write_iob(iob_file, rows)
+        csvbase_importer = CsvbaseIOBImporter("Assets:IN:IOB:Savings", "INR")
+        # The single closing assertion, as on the csvbase path.
+        compiled_importer = iob.IOBImporter("Assets:IN:IOB:Savings", "1234", balance_every=None)
+        bench_read("iob csvbase read", csvbase_importer, iob_file, rows)
+        bench_read("iob compiled read", compiled_importer, iob_file, rows)
+        before = bench("iob csvbase", csvbase_importer, iob_file, rows)
+        after = bench("iob compiled", compiled_importer, iob_file, rows)
+        print("iob output identical:", before == after)
+        bench("iob compiled monthly", iob.IOBImporter("Assets:IN:IOB:Savings", "1234"), iob_file, rows)
+
+        # Chunked whatever the file size, on one process per CPU.
+        chunked.MIN_BYTES = 0
+        chunked_importer = iob.IOBImporter("Assets:IN:IOB:Savings", "1234", balance_every=None)
+        chunked_importer.read_jobs = max(2, os.cpu_count() or 1)
+        after_chunked = bench("iob compiled chunked", chunked_importer, iob_file, rows)
+        print("iob chunked output identical:", after == after_chunked)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)